@@ -0,0 +1,116 @@
+"""V1.0
+Benchmark of the sensor acquisition process used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+acquisition.AcquisitionProcess polls URM09 (20 Hz) and TF-Luna (50 Hz) on the
+fake bus, once as a thread of the control process (like main.py) and once as
+an own process (ACQUISITION_PROCESS). The control process runs a main loop at
+LOOP_RATE which reads the samples and executes CPU_WORK of python code per
+iteration, every BURST_INTERVAL a longer BURST_WORK (slow print, logging).
+Reported are histograms of the sampling jitter (|capture interval - period|)
+of both sensors and the cost of reading a sample from the shared memory ring.
+Start with: python3 bench_acquisition.py
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import fake_bus
+import acquisition
+import shm_ring
+
+
+#################### variables section ####################
+
+DURATION = 5   # duration of run per mode [s]
+LOOP_RATE = 50   # iterations per second of the control loop
+CPU_WORK = 0.008   # python work per iteration of the control loop [s]
+BURST_WORK = 0.03   # python work every BURST_INTERVAL [s]
+BURST_INTERVAL = 0.5
+READS = 100000   # reads of the ring for the cost per read
+
+
+#################### Function section ####################
+
+def work(duration):
+    """ python code (holds the GIL) for duration """
+    t_end = time.monotonic() + duration
+    x = 0
+    while time.monotonic() < t_end:
+        for n in range(100):
+            x = x + n * n
+    return x
+
+
+def run(process):
+    """ acquisition as thread or process with loaded control loop, returns SamplingJitter """
+    devices = {0x10: fake_bus.FakeTfLuna(), 0x11: fake_bus.FakeURM09(conversion=0.03)}
+    acq = acquisition.AcquisitionProcess(bus_class=fake_bus.fake_bus_class(devices))
+    if process:
+        acq.start()
+    else:   # same code as thread of this process
+        thread = threading.Thread(target=acq.run, daemon=True)
+        thread.start()
+
+    period = 1 / LOOP_RATE
+    t_start = time.monotonic()
+    t_next = t_start
+    t_burst = t_start + BURST_INTERVAL
+    while time.monotonic() - t_start < DURATION:
+        acq.sensor_1.sample
+        acq.sensor_2.sample
+        work(CPU_WORK)
+        if time.monotonic() >= t_burst:
+            work(BURST_WORK)
+            t_burst = t_burst + BURST_INTERVAL
+        t_next = t_next + period
+        time.sleep(max(0, t_next - time.monotonic()))
+
+    if process:
+        acq.stop()
+        return acq.jitter
+    acq.stopped.set()
+    thread.join()
+    jitter, _ = acq.conn.recv()
+    for ring in acq.rings:
+        ring.close()
+    return jitter
+
+
+def read_cost():
+    """ duration of one read of the latest sample [s]: new sample (Sample object) and unchanged """
+    ring = shm_ring.SampleRing()
+    reader = shm_ring.RingSensor(ring)
+    t_start = time.perf_counter()
+    for n in range(READS):
+        ring.write(n, n * 0.02, n + 1, 1000, 0)
+        reader.sample
+    t_new = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    for n in range(READS):
+        ring.write(n, n * 0.02, n + 1, 1000, 0)
+    t_write = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    for n in range(READS):
+        reader.sample
+    t_cached = time.perf_counter() - t_start
+    ring.close()
+    return (t_new - t_write) / READS, t_write / READS, t_cached / READS
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{DURATION} s per mode, control loop {LOOP_RATE} Hz with {CPU_WORK * 1000:.0f} ms python work, "
+          f"{BURST_WORK * 1000:.0f} ms burst every {BURST_INTERVAL} s")
+    for name, process in (("acquisition thread (GIL shared)", False), ("acquisition process", True)):
+        print(name)
+        for line in run(process).lines():
+            print(f"  {line}")
+    t_read, t_write, t_cached = read_cost()
+    print(f"shared memory ring: write {t_write * 1e6:.2f} us, read of a new sample {t_read * 1e6:.2f} us, "
+          f"read without new sample {t_cached * 1e6:.2f} us")
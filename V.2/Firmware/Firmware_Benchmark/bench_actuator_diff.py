@@ -0,0 +1,92 @@
+"""V1.0
+Benchmark of the change-driven set_actuator used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A main loop at LOOP_RATE calls set_actuator() on two fake DRV2605L behind the
+TCA9548A: first with a constant stage (steady state), then with a stage change
+every STAGE_TIME. Reported are i2c-transactions per second and register
+writes per second of the DRVs, split into pulses of the pattern engine (GO)
+and configuration writes, with and without register shadow.
+Start with: python3 bench_actuator_diff.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+DURATION = 3   # duration of run per case [s]
+LOOP_RATE = 100   # main loop iterations per second
+STAGE_TIME = 0.5   # time between stage changes [s]
+ACTUATOR_NO = [0, 1]
+STAGE_VALUES = [100, 300, 500, 700, 900, 5]   # sensor values of stage 1, 2, 3, 4, 5, 0
+
+
+class CountingDRV2605(fake_bus.FakeDRV2605):
+    """ fake DRV2605L, counts pulses (GO bit set) separately """
+
+    def __init__(self):
+        fake_bus.FakeDRV2605.__init__(self)
+        self.go_writes = 0
+
+    def write(self, register, value):
+        fake_bus.FakeDRV2605.write(self, register, value)
+        if register == 0x0C:
+            self.go_writes = self.go_writes + 1
+
+
+#################### Function section ####################
+
+def run(shadow, changing):
+    """ main loop for DURATION, return transactions/s, config writes/s and pulses/s per DRV """
+    devices = [CountingDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO})
+    act = actuator.Actuator(ACTUATOR_NO, bus, shadow=shadow)
+    with contextlib.redirect_stdout(io.StringIO()):
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+        act.set_actuator(STAGE_VALUES[2])   # settle in stage 3 before counting
+
+        bus.transactions = 0
+        writes = sum(d.writes for d in devices)
+        go_writes = sum(d.go_writes for d in devices)
+        t_start = time.monotonic()
+        t_next = t_start
+        loops = 0
+        while t_next < t_start + DURATION:
+            if changing:
+                value = STAGE_VALUES[int((t_next - t_start) / STAGE_TIME) % len(STAGE_VALUES)]
+            else:
+                value = STAGE_VALUES[2]
+            act.set_actuator(value)
+            loops = loops + 1
+            t_next = t_next + 1 / LOOP_RATE
+            time.sleep(max(0, t_next - time.monotonic()))
+        duration = time.monotonic() - t_start
+        act.close()
+
+    go_writes = sum(d.go_writes for d in devices) - go_writes
+    config_writes = sum(d.writes for d in devices) - writes - go_writes
+    n = len(devices)
+    return bus.transactions / duration, config_writes / duration / n, go_writes / duration / n
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"main loop {LOOP_RATE} Hz, {DURATION} s per case, rates per DRV")
+    print(f"{'case':<28}{'transactions/s':>16}{'config writes/s':>17}{'pulses/s':>10}")
+    for changing in (False, True):
+        for shadow in (False, True):
+            name = f"{'stage change' if changing else 'steady state'}, shadow {'on' if shadow else 'off'}"
+            transactions, config_writes, pulses = run(shadow, changing)
+            print(f"{name:<28}{transactions:>16.1f}{config_writes:>17.1f}{pulses:>10.1f}")
@@ -0,0 +1,207 @@
+"""V1.0
+Benchmark of the asyncio runtime against the threads of main.py used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The firmware runs for DURATION on the fake hardware (fake bus with URM09,
+TF-Luna and two DRV2605L behind the TCA9548A, FakeGPIO for buttons and
+turning switch). An obstacle moves between 30 and 200 cm, button 0 is pressed
+shortly every PRESS_INTERVAL and the turning switch is changed once.
+1. threads like main.py: bus scheduler, pattern engine thread, event-driven
+   main loop (wakeup), buttons by button.Button like main.py (delayed feedback
+   by the pattern engine)
+2. async_runtime: tasks of one event loop, i2c in an executor with one worker
+Reported are event-to-wakeup latency of the main loop, worst-case sample age,
+context switches of the process (getrusage), cpu load and number of threads.
+Start with: python3 bench_async_runtime.py
+"""
+
+
+#################### import section ####################
+
+import asyncio
+import contextlib
+import io
+import math
+import resource
+import threading
+import time
+
+import fake_bus
+import actuator
+import async_runtime
+import bus_scheduler
+import button
+import data_procession
+import i2c_bus
+import sensors
+import wakeup
+
+
+#################### variables section ####################
+
+DURATION = 5   # duration of run per case [s]
+BUS_LATENCY = 0.0005   # duration of one i2c-transaction [s]
+ACTUATOR_NO = [0, 1]
+BUTTON_PIN = [17, 27]
+SWITCH_PIN = [23, 24, 25]
+PRESS_INTERVAL = 2.0   # short press of button 0 every PRESS_INTERVAL [s]
+PRESS_TIME = 0.2   # duration of a short press [s]
+MOVE_PERIOD = 3.0   # period of the moving obstacle 30 -> 200 -> 30 cm [s]
+SENSOR_DEADLINE = 0.01
+
+
+#################### Function section ####################
+
+def fake_hardware():
+    """ return fake gpio, sensor bus and actuator bus with their devices """
+    gpio = fake_bus.FakeGPIO({pin: 1 for pin in BUTTON_PIN + SWITCH_PIN})
+    gpio.levels[SWITCH_PIN[1]] = 0   # switch-state 1
+    devices = {0x10: fake_bus.FakeTfLuna(distance=100), 0x11: fake_bus.FakeURM09(distance=100, conversion=0.03)}
+    sensor_bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices, BUS_LATENCY))
+    actuator_bus = fake_bus.FakeI2C(channels={n: {0x5A: fake_bus.FakeDRV2605()} for n in ACTUATOR_NO},
+                                    latency=BUS_LATENCY)
+    return gpio, devices, sensor_bus, actuator_bus
+
+
+def user(gpio, devices, running):
+    """ moving obstacle, short presses of button 0, one change of the turning switch """
+    t_start = time.monotonic()
+    t_press = t_start + PRESS_INTERVAL / 2
+    switched = False
+    while running[0]:
+        t = time.monotonic() - t_start
+        distance = int(115 - 85 * math.cos(2 * math.pi * t / MOVE_PERIOD))
+        for device in devices.values():
+            device.distance = distance
+        if time.monotonic() >= t_press:
+            gpio.set_level(BUTTON_PIN[0], 0)
+        if time.monotonic() >= t_press + PRESS_TIME:
+            gpio.set_level(BUTTON_PIN[0], 1)
+            t_press = t_press + PRESS_INTERVAL
+        if not switched and t > DURATION / 2:
+            gpio.set_level(SWITCH_PIN[1], 1)
+            gpio.set_level(SWITCH_PIN[2], 0)
+            switched = True
+        time.sleep(0.005)
+
+
+def run_threads():
+    """ firmware with threads like main.py, returns main loop statistics (Wakeup) and sample age """
+    gpio, devices, sensor_bus, actuator_bus = fake_hardware()
+    scheduler = bus_scheduler.BusScheduler()
+    events = wakeup.Wakeup()
+    button_edge = [[0, 0], [0, 0]]
+    buttons = button.Button()
+
+    def cb_button_time(pin):   # like main.py
+        n = BUTTON_PIN.index(pin)
+        button_edge[n][1 if gpio.input(pin) else 0] = time.monotonic()
+        events.signal("button")
+
+    def cb_switch(pin):
+        events.signal("switch")
+
+    for pin in BUTTON_PIN:
+        gpio.add_event_detect(pin, gpio.BOTH, callback=cb_button_time)
+    for pin in SWITCH_PIN:
+        gpio.add_event_detect(pin, gpio.BOTH, callback=cb_switch)
+
+    scheduler.start()
+    act = actuator.Actuator(ACTUATOR_NO, bus_scheduler.ScheduledI2C(actuator_bus, scheduler), sequencer=True,
+                            broadcast=True)
+    act.config_drv_to_lra()
+    act.set_drv_open_loop()
+    sensor_1 = scheduler.call("ultrasonic", sensors.URM09, bus=sensor_bus)
+    sensor_2 = scheduler.call("lidar", sensors.TfLuna, bus=sensor_bus)
+
+    def collect():
+        sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    def trigger():
+        if sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE) == sensors.STA_OK:
+            scheduler.submit("ultrasonic", collect, priority=bus_scheduler.PRIO_SENSOR,
+                             t_due=time.monotonic() + sensor_1.CONVERSION_TIME)
+
+    def poll():
+        sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    scheduler.add_periodic("ultrasonic", trigger, 0.05, 0.005)
+    scheduler.add_periodic("lidar", poll, 0.02, 0.0)
+    data = data_procession.DataProcession()
+    running = [True]
+    user_thread = threading.Thread(target=user, args=(gpio, devices, running), daemon=True)
+    events.subscribe()
+    user_thread.start()
+    threads = threading.active_count()
+
+    t_start = time.monotonic()
+    while time.monotonic() - t_start < DURATION:
+        value = data.getFeedback(sensor_1.sample, sensor_2.sample)
+        for n, function in enumerate(async_runtime.BUTTON_FUNCTION):   # like main.py
+            if button_edge[n][0] != 0 and button_edge[n][1] != 0:
+                buttons.but_func(n, function, act, button_edge)
+                button_edge[n] = [0, 0]
+        data.setMode(buttons.but_mode[0])
+        switch_state = 0 if gpio.input(SWITCH_PIN[0]) == 0 else 1 if gpio.input(SWITCH_PIN[1]) == 0 else \
+            2 if gpio.input(SWITCH_PIN[2]) == 0 else 1
+        act.set_freq_state(switch_state)
+        act.set_actuator(value)
+        events.wait(data.MAX_AGE)
+
+    running[0] = False
+    events.unsubscribe()
+    act.set_vib_const(0)
+    act.close()
+    scheduler.stop()
+    scheduler.join()
+    return events.wakeups, events.latency_sum, events.latency_max, data.age_max, threads
+
+
+def run_async():
+    """ firmware with async_runtime, returns main loop statistics (AsyncRuntime) and sample age """
+    gpio, devices, sensor_bus, actuator_bus = fake_hardware()
+    runtime = async_runtime.AsyncRuntime(gpio, BUTTON_PIN, SWITCH_PIN)
+    data = data_procession.DataProcession()
+    threads = []
+
+    async def main():
+        runtime.start()
+        act = actuator.Actuator(ACTUATOR_NO, actuator_bus, sequencer=True, broadcast=True,
+                                pattern_engine=runtime.pattern_engine)
+        await runtime.io(act.config_drv_to_lra)
+        await runtime.io(act.set_drv_open_loop)
+        sensor_1 = await runtime.io(lambda: sensors.URM09(bus=sensor_bus))
+        sensor_2 = await runtime.io(lambda: sensors.TfLuna(bus=sensor_bus))
+        running = [True]
+        user_thread = threading.Thread(target=user, args=(gpio, devices, running), daemon=True)
+        user_thread.start()
+        runtime.loop.call_later(1, lambda: threads.append(threading.active_count()))
+        try:
+            await runtime.run(act, data, sensor_1, sensor_2, duration=DURATION)
+        finally:
+            running[0] = False
+            await runtime.shutdown(act)
+
+    asyncio.run(main())
+    return runtime.wakeups, runtime.latency_sum, runtime.latency_max, data.age_max, threads[0]
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{DURATION} s per case, bus latency {BUS_LATENCY * 1000:.1f} ms, button press every {PRESS_INTERVAL} s")
+    print(f"{'runtime':<10}{'wakeups':>9}{'latency mean':>14}{'max':>11}{'age max':>11}"
+          f"{'ctx switches/s':>16}{'cpu':>9}{'threads':>9}")
+    for name, run in (("threads", run_threads), ("asyncio", run_async)):
+        usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        t_start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            wakeups, latency_sum, latency_max, age_max, threads = run()
+        duration = time.monotonic() - t_start
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        switches = (usage.ru_nvcsw + usage.ru_nivcsw) - (usage_start.ru_nvcsw + usage_start.ru_nivcsw)
+        cpu = (usage.ru_utime + usage.ru_stime) - (usage_start.ru_utime + usage_start.ru_stime)
+        latency_mean = latency_sum / wakeups if wakeups else 0.0
+        print(f"{name:<10}{wakeups:>9}{latency_mean * 1000:>11.2f} ms{latency_max * 1000:>8.2f} ms"
+              f"{age_max * 1000:>8.1f} ms{switches / duration:>16.0f}{100 * cpu / duration:>7.1f} %{threads:>9}")
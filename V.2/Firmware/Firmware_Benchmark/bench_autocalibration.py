@@ -0,0 +1,69 @@
+"""V1.0
+Benchmark of the parallel auto-calibration used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Two fake DRV2605L behind the TCA9548A need CALIBRATION seconds for one
+auto-calibration (GO bit set until finished). Boot-to-ready (Actuator object
+until set_drv_open_loop is finished, like in main.py) is measured for:
+1. one actuator after the other (autocalibration called per actuator)
+2. all actuators at the same time
+3. all actuators at the same time, one DRV fails twice (DIAG_RESULT) -> retries
+Start with: python3 bench_autocalibration.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+CALIBRATION = 1.0   # duration of one auto-calibration [s] (AUTO_CAL_TIME 3)
+BUS_LATENCY = 0.0002   # duration of one i2c-transaction [s]
+ACTUATOR_NO = [0, 1]
+ACTUATOR_TYPE = [2414, 2414]
+
+
+#################### Function section ####################
+
+def boot(parallel, failures=0):
+    """ initialization like in main.py, return boot-to-ready time, result and transactions """
+    devices = [fake_bus.FakeDRV2605(CALIBRATION) for _ in ACTUATOR_NO]
+    devices[-1].failures = failures
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO}, latency=BUS_LATENCY)
+    t_start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        act = actuator.Actuator(ACTUATOR_NO, bus)
+        act.config_drv_to_lra()
+        if parallel:
+            result = act.autocalibration(ACTUATOR_TYPE)
+        else:
+            result = {}
+            for j in ACTUATOR_NO:
+                act.act_no = [j]
+                result.update(act.autocalibration(ACTUATOR_TYPE))
+            act.act_no = ACTUATOR_NO
+        act.set_drv_open_loop()
+    t_ready = time.monotonic() - t_start
+    act.close()
+    return t_ready, result, bus.transactions
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{len(ACTUATOR_NO)} actuators, auto-calibration {CALIBRATION} s, "
+          f"bus latency {BUS_LATENCY * 1000} ms/transaction")
+    for name, parallel, failures in (("one after another", False, 0),
+                                     ("parallel", True, 0),
+                                     ("parallel, 2 failures", True, 2)):
+        t_ready, result, transactions = boot(parallel, failures)
+        print(f"{name:<22} boot-to-ready {t_ready:5.2f} s, {transactions} i2c-transactions, "
+              f"calibrated: {result}")
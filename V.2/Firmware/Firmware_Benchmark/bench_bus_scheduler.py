@@ -0,0 +1,90 @@
+"""V1.0
+Benchmark of the i2c-bus scheduler used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The bus scheduler polls URM09 (20 Hz, split-phase) and TF-Luna (50 Hz) on the
+fake bus like main.py, while a second thread writes actuator registers through
+bus_scheduler.ScheduledI2C at the rate of the main loop. Reported are bus
+utilization and queueing delay per client, the sample rate of both sensors and
+the round-trip time of actuator writes. Start with: python3 bench_bus_scheduler.py
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import fake_bus
+import bus_scheduler
+import i2c_bus
+import sensors
+
+
+#################### variables section ####################
+
+DURATION = 5   # duration of run [s]
+BUS_LATENCY = 0.0005   # duration of one i2c-transaction [s]
+LOOP_RATE = 100   # actuator updates per second
+WRITES_PER_UPDATE = 4   # register writes per actuator update
+SENSOR_DEADLINE = 0.01
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    scheduler = bus_scheduler.BusScheduler()
+    devices = {0x10: fake_bus.FakeTfLuna(), 0x11: fake_bus.FakeURM09(conversion=0.03)}
+    sensor_bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices, BUS_LATENCY))
+    actuator_bus = fake_bus.FakeI2C({0x5A: fake_bus.FakeDevice()}, latency=BUS_LATENCY)
+    actuator_i2c = bus_scheduler.ScheduledI2C(actuator_bus, scheduler)
+
+    sensor_1 = sensors.URM09(bus=sensor_bus)
+    sensor_2 = sensors.TfLuna(bus=sensor_bus)
+
+    def collect():
+        sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    def trigger():
+        if sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE) == sensors.STA_OK:
+            scheduler.submit("ultrasonic", collect, priority=bus_scheduler.PRIO_SENSOR,
+                             t_due=time.monotonic() + sensor_1.CONVERSION_TIME)
+
+    def poll():
+        sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    round_trip = []
+    running = [True]
+
+    def main_loop():
+        period = 1 / LOOP_RATE
+        t_next = time.monotonic()
+        while running[0]:
+            for n in range(WRITES_PER_UPDATE):
+                t_start = time.monotonic()
+                actuator_i2c.writeto(0x5A, bytes([0x02, n]))
+                round_trip.append(time.monotonic() - t_start)
+            t_next = t_next + period
+            time.sleep(max(0, t_next - time.monotonic()))
+
+    scheduler.start()
+    scheduler.add_periodic("ultrasonic", trigger, 0.05, 0.005)
+    scheduler.add_periodic("lidar", poll, 0.02, 0.0)
+    loop = threading.Thread(target=main_loop)
+    loop.start()
+    time.sleep(DURATION)
+    running[0] = False
+    loop.join()
+    scheduler.stop()
+    scheduler.join()
+
+    print(f"bus latency {BUS_LATENCY * 1000} ms/transaction, actuator: {LOOP_RATE} updates/s "
+          f"with {WRITES_PER_UPDATE} writes, {DURATION} s")
+    for line in scheduler.report():
+        print(line)
+    print(f"sample rate URM09 {sensor_1.sample.seq / DURATION:.1f} Hz, "
+          f"TF-Luna {sensor_2.sample.seq / DURATION:.1f} Hz")
+    round_trip.sort()
+    print(f"actuator write round trip: mean {1000 * sum(round_trip) / len(round_trip):.2f} ms, "
+          f"p99 {1000 * round_trip[int(0.99 * len(round_trip))]:.2f} ms, max {1000 * round_trip[-1]:.2f} ms")
@@ -0,0 +1,92 @@
+"""V1.0
+Benchmark of the calibration cache used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Boots two fake DRV2605L behind the TCA9548A like main.py (new devices with
+default registers at every boot) and measures time-to-first-feedback: from
+creation of the Actuator object until the first pulse of stage 1.
+1. no cache file -> auto-calibration, results are stored
+2. valid cache -> registers restored with one burst per actuator
+3. cache with implausible LRA_PERIOD -> auto-calibration again
+The cache file is created in a temporary directory.
+Start with: python3 bench_calibration_cache.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+CALIBRATION = 1.0   # duration of one auto-calibration [s] (AUTO_CAL_TIME 3)
+BUS_LATENCY = 0.0002   # duration of one i2c-transaction [s]
+ACTUATOR_NO = [0, 1]
+ACTUATOR_TYPE = [2414, 2414]
+
+
+class RecordingDRV2605(fake_bus.FakeDRV2605):
+    """ fake DRV2605L, records the time of the first pulse (GO bit set, not auto-calibration) """
+
+    def __init__(self):
+        fake_bus.FakeDRV2605.__init__(self, CALIBRATION)
+        self.t_first_pulse = None
+
+    def write(self, register, value):
+        fake_bus.FakeDRV2605.write(self, register, value)
+        if register == 0x0C and value & 0x01 and self.reg[0x01] & 0x07 != 0x07 \
+                and self.t_first_pulse is None:
+            self.t_first_pulse = time.monotonic()
+
+
+#################### Function section ####################
+
+def boot(cache_file):
+    """ boot like main.py, return time-to-first-feedback, calibration result and registers """
+    devices = [RecordingDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO}, latency=BUS_LATENCY)
+    t_start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        act = actuator.Actuator(ACTUATOR_NO, bus)
+        act.config_drv_to_lra()
+        result = act.calibrate(ACTUATOR_TYPE, cache_file)
+        act.set_drv_open_loop()
+        act.set_actuator(100)   # stage 1
+        while devices[0].t_first_pulse is None:
+            time.sleep(0.0001)
+    act.close()
+    return devices[0].t_first_pulse - t_start, result, devices[0].reg[0x16:0x1F]
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    cache_file = os.path.join(tempfile.mkdtemp(), "calibration_cache.json")
+    print(f"{len(ACTUATOR_NO)} actuators, auto-calibration {CALIBRATION} s, "
+          f"bus latency {BUS_LATENCY * 1000} ms/transaction")
+
+    t_feedback, result, registers_calibrated = boot(cache_file)
+    print(f"{'no cache':<24} time-to-first-feedback {t_feedback:5.3f} s, calibrated: {result}")
+
+    t_feedback, result, registers = boot(cache_file)
+    print(f"{'cache':<24} time-to-first-feedback {t_feedback:5.3f} s, calibrated: {result}, "
+          f"registers equal to calibration: {registers == registers_calibrated}")
+
+    with open(cache_file) as f:
+        cache = json.load(f)
+    for entry in cache["actuators"].values():
+        entry["lra_period"] = 1   # resonance frequency far out of range
+    with open(cache_file, "w") as f:
+        json.dump(cache, f)
+    t_feedback, result, registers = boot(cache_file)
+    print(f"{'implausible cache':<24} time-to-first-feedback {t_feedback:5.3f} s, calibrated: {result}")
@@ -0,0 +1,76 @@
+"""V1.0
+Benchmark of the firmware on the simulated hal backend used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+main.py runs unchanged as own process with SMARTCANE_HAL=sim (hal_sim.Simulated):
+bus scheduler with URM09 and TF-Luna, TCA9548A with DRV2605L, buttons and
+switch are in-memory devices, the obstacle moves between 30 and 200 cm. After
+DURATION the process gets SIGINT (like Ctrl-C) and prints its shutdown report.
+Per case the duration of one simulated i2c-transaction (SMARTCANE_SIM_LATENCY)
+is changed. Reported are boot-to-ready, bus utilization, main loop and
+sensor-to-vibration latency, and the hardware modules imported by main.py and
+main_async.py (nothing is opened at import).
+Start with: python3 bench_hal.py
+"""
+
+
+#################### import section ####################
+
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import fake_bus
+
+
+#################### variables section ####################
+
+DURATION = 8   # duration of run per case [s]
+LATENCIES = [0.0001, 0.0005, 0.002]   # duration of one simulated i2c-transaction per case [s]
+MAIN = os.path.join(fake_bus.FIRMWARE_DIR, "main.py")
+HARDWARE_MODULES = ["RPi", "RPi.GPIO", "board", "busio", "smbus", "serial", "adafruit_drv2605", "adafruit_tca9548a"]
+REPORT = ("boot-to-ready", "URM09:", "TfLuna:", "actuator:", "ultrasonic:", "lidar:", "main loop:",
+          "capture-commit:", "stage-commit:")   # lines of the shutdown report
+
+
+#################### Function section ####################
+
+def run(latency):
+    """ main.py on the simulated backend for DURATION, returns lines of its output """
+    env = dict(os.environ, SMARTCANE_HAL="sim", SMARTCANE_SIM_LATENCY=str(latency))
+    with tempfile.TemporaryDirectory() as cwd:   # log files of main.py
+        p = subprocess.Popen([sys.executable, "-u", MAIN], cwd=cwd, env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, text=True)
+        time.sleep(DURATION)
+        p.send_signal(signal.SIGINT)
+        output, _ = p.communicate()
+    return output.splitlines()
+
+
+def hardware_imports():
+    """ hardware modules imported by main.py and main_async.py with the Raspberry Pi backend, \
+        none: the hardware is created by their main program, not at import
+        """
+    code = "import os, sys; os.environ['SMARTCANE_HAL'] = 'pi'; sys.path.insert(0, %r); import main, main_async; " \
+           "print(' '.join(m for m in %r if m in sys.modules))" % (fake_bus.FIRMWARE_DIR, HARDWARE_MODULES)
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:   # hardware opened at import (e.g. RPi.GPIO missing)
+        return [f"import failed ({result.stderr.strip().splitlines()[-1]})"]
+    return result.stdout.split()
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{DURATION} s per case, main.py with SMARTCANE_HAL=sim")
+    for latency in LATENCIES:
+        print(f"i2c-transaction {latency * 1000:.1f} ms")
+        for line in run(latency):
+            if line.startswith(REPORT):
+                print(f"  {line.strip()}")
+    print(f"hardware modules imported by import of main.py and main_async.py: {hardware_imports() or 'none'}")
@@ -0,0 +1,113 @@
+"""V1.0
+Benchmark of shared i2c-bus session used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Compares the bus time per sample of the former drivers (open/close of the bus
+for every sample) with the shared session of i2c_bus.I2CBus, run against
+fake_bus.FakeSMBus. Start with: python3 bench_i2c_bus.py
+"""
+
+
+#################### import section ####################
+
+import time
+
+import fake_bus
+import i2c_bus
+import sensors
+
+
+#################### variables section ####################
+
+SAMPLES = 20000   # number of samples per sensor and run
+TFLUNA_ADDR = 0x10
+URM09_ADDR = 0x11
+
+
+#################### Function section ####################
+
+def legacy_tfluna(bus):
+    """ sample of former TfLuna.getDistance: open, trigger, read, close """
+    bus.open(1)
+    bus.write_byte_data(TFLUNA_ADDR, 0x24, 1)
+    bus.read_i2c_block_data(TFLUNA_ADDR, 0, 6)
+    bus.close()
+
+
+def legacy_urm09(bus):
+    """ sample of former URM09.getDistance: open, trigger, read, close """
+    bus.open(1)
+    bus.write_byte_data(URM09_ADDR, 0x08, 0x01)
+    bus.read_i2c_block_data(URM09_ADDR, 0x03, 2)
+    bus.close()
+
+
+def session_tfluna(bus):
+    """ same transactions as legacy_tfluna on the shared session """
+    bus.write_byte_data(TFLUNA_ADDR, 0x24, 1)
+    bus.read_i2c_block_data(TFLUNA_ADDR, 0, 6)
+
+
+def session_urm09(bus):
+    """ same transactions as legacy_urm09 on the shared session """
+    bus.write_byte_data(URM09_ADDR, 0x08, 0x01)
+    bus.read_i2c_block_data(URM09_ADDR, 0x03, 2)
+
+
+def run_legacy(devices):
+    """ time per sample of both sensors with open/close per sample [s] """
+    bus = fake_bus.FakeSMBus(None, devices)
+    t_start = time.perf_counter()
+    for _ in range(SAMPLES):
+        legacy_tfluna(bus)
+        legacy_urm09(bus)
+    t_total = time.perf_counter() - t_start
+    return t_total / (2 * SAMPLES), bus.opens
+
+
+def run_session(devices):
+    """ time per sample of both sensors with one shared bus session [s] """
+    opens = []
+
+    def bus_class(port):
+        bus = fake_bus.FakeSMBus(port, devices)
+        opens.append(bus)
+        return bus
+
+    bus = i2c_bus.I2CBus(1, bus_class)
+    t_start = time.perf_counter()
+    for _ in range(SAMPLES):
+        session_tfluna(bus)
+        session_urm09(bus)
+    t_total = time.perf_counter() - t_start
+    bus.close()
+    return t_total / (2 * SAMPLES), len(opens)
+
+
+def run_reconnect(devices):
+    """ break the file handle once and check that both drivers recover """
+    bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices))
+    sensor_1 = sensors.URM09(bus=bus)
+    sensor_2 = sensors.TfLuna(bus=bus)
+    bus.bus.close()   # simulate a lost file handle
+    sensor_1.getDistance()
+    sensor_2.getDistance()
+    return sensor_1.distance, sensor_2.distance, bus.reconnects
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    devices = {TFLUNA_ADDR: fake_bus.FakeTfLuna(), URM09_ADDR: fake_bus.FakeURM09()}
+
+    t_legacy, opens_legacy = run_legacy(devices)
+    t_session, opens_session = run_session(devices)
+    distance_1, distance_2, reconnects = run_reconnect(devices)
+
+    print(f"samples per sensor: {SAMPLES}")
+    print(f"open/close per sample: {t_legacy * 1e6:8.2f} us/sample, {opens_legacy} opens")
+    print(f"shared bus session:    {t_session * 1e6:8.2f} us/sample, {opens_session} opens")
+    print(f"speedup: {t_legacy / t_session:.2f}x")
+    print(f"reconnect test: distances = {distance_1} mm, {distance_2} mm "
+          f"after {reconnects} reconnect(s)")
@@ -0,0 +1,189 @@
+"""V1.0
+Benchmark of combined i2c-transfers (I2C_RDWR) used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Counts the syscalls per sensor sample and per actuator register update, with
+fcntl.ioctl, os.write and os.read replaced by counters (no i2c-hardware needed).
+1. sensors: TF-Luna trigger + read and URM09 trigger / collect, alternating devices
+2. actuator: read-modify-write of one DRV2605 register behind the TCA9548A
+The legacy side is modelled after the syscalls of python-smbus (I2C_SLAVE ioctl
+on address change + one I2C_SMBUS ioctl per call) and Adafruit_PureIO used by
+busio on linux (I2C_SLAVE ioctl on address change + write()/read(), I2C_RDWR
+for write-then-read). The mux select stays a separate transfer in both cases:
+the TCA9548A switches the channel only after a STOP condition.
+Start with: python3 bench_i2c_rdwr.py
+"""
+
+
+#################### import section ####################
+
+import fcntl
+import os
+import time
+from unittest import mock
+
+import fake_bus
+import i2c_bus
+import i2c_rdwr
+import sensors
+
+
+#################### variables section ####################
+
+SAMPLES = 1000   # number of samples / register updates per run
+I2C_SLAVE = 0x0703   # ioctl: set slave address of file handle
+I2C_SMBUS = 0x0720   # ioctl: smbus transfer
+TCA_ADDR = 0x70
+DRV_ADDR = 0x5A
+
+syscalls = {"ioctl": 0, "write": 0, "read": 0}
+os_open = os.open   # /dev/i2c-x is replaced by /dev/null
+
+
+#################### Function section ####################
+
+def fake_ioctl(fd, request, arg=0, *args):
+    syscalls["ioctl"] = syscalls["ioctl"] + 1
+    if isinstance(arg, i2c_rdwr.i2c_rdwr_ioctl_data):   # answer every read message with zeros
+        for n in range(arg.nmsgs):
+            msg = arg.msgs[n]
+            if msg.flags & i2c_rdwr.I2C_M_RD:
+                for k in range(msg.len):
+                    msg.buf[k] = 0
+    return 0
+
+
+def fake_write(fd, data):
+    syscalls["write"] = syscalls["write"] + 1
+    return len(data)
+
+
+def fake_read(fd, length):
+    syscalls["read"] = syscalls["read"] + 1
+    return bytes(length)
+
+
+class SMBusModel:
+    """ syscalls of python-smbus (C extension) """
+
+    def __init__(self, port):
+        self.fd = os_open(os.devnull, os.O_RDWR)
+        self.addr = None
+
+    def close(self):
+        os.close(self.fd)
+
+    def _set_addr(self, addr):
+        if addr != self.addr:
+            fcntl.ioctl(self.fd, I2C_SLAVE, addr)
+            self.addr = addr
+
+    def write_quick(self, addr):
+        self._set_addr(addr)
+        fcntl.ioctl(self.fd, I2C_SMBUS, 0)
+
+    def write_byte_data(self, addr, register, value):
+        self._set_addr(addr)
+        fcntl.ioctl(self.fd, I2C_SMBUS, 0)
+
+    def read_i2c_block_data(self, addr, register, length):
+        self._set_addr(addr)
+        fcntl.ioctl(self.fd, I2C_SMBUS, 0)
+        return [0] * length
+
+
+class PureIOModel:
+    """ syscalls of busio.I2C on linux (Adafruit_PureIO.smbus) """
+
+    def __init__(self):
+        self.fd = os_open(os.devnull, os.O_RDWR)
+        self.addr = None
+
+    def _select_device(self, addr):
+        if addr != self.addr:
+            fcntl.ioctl(self.fd, I2C_SLAVE, addr)
+            self.addr = addr
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self._select_device(address)
+        os.write(self.fd, bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        self._select_device(address)
+        end = len(buffer) if end is None else end
+        buffer[start:end] = os.read(self.fd, end - start)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, **kwargs):
+        fcntl.ioctl(self.fd, i2c_rdwr.I2C_RDWR, 0)
+
+
+def count(func):
+    """ execute func SAMPLES times, return syscalls per execution and duration """
+    for key in syscalls:
+        syscalls[key] = 0
+    t_start = time.perf_counter()
+    for _ in range(SAMPLES):
+        func()
+    duration = time.perf_counter() - t_start
+    return {key: value / SAMPLES for key, value in syscalls.items()}, duration
+
+
+def print_result(name, result):
+    calls, duration = result
+    total = sum(calls.values())
+    print(f"{name:<34} {calls['ioctl']:5.2f} ioctl {calls['write']:5.2f} write "
+          f"{calls['read']:5.2f} read = {total:5.2f} syscalls "
+          f"({duration / SAMPLES * 1e6:6.1f} us python overhead)")
+
+
+def sensor_sample(bus):
+    """ one sample of both i2c-sensors, return function for count() """
+    sensor_1 = sensors.URM09(bus=bus)
+    sensor_2 = sensors.TfLuna(bus=bus)
+
+    def sample():
+        sensor_1.triggerDistance()
+        sensor_2.getDistance()
+        sensor_1.collectDistance()
+    return sample
+
+
+def register_update(i2c):
+    """ read-modify-write of one DRV2605 register behind the mux like adafruit_drv2605, \
+        return function for count()
+        """
+    select = bytearray([1 << 1])
+    out = bytearray([0x1A])
+    value = bytearray(1)
+
+    def update():
+        i2c.writeto(TCA_ADDR, select)   # channel select of TCA9548A_Channel.try_lock
+        i2c.writeto_then_readfrom(DRV_ADDR, out, value)   # _read_u8
+        i2c.writeto(TCA_ADDR, select)
+        i2c.writeto(DRV_ADDR, bytes([0x1A, value[0] | 0x80]))   # _write_u8
+    return update
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    with mock.patch("fcntl.ioctl", fake_ioctl), mock.patch("os.write", fake_write), \
+            mock.patch("os.read", fake_read), \
+            mock.patch("os.open", lambda path, flags: os_open(os.devnull, flags)):
+
+        print(f"{SAMPLES} runs, syscalls per run")
+
+        legacy_bus = i2c_bus.I2CBus(1, SMBusModel)
+        rdwr_bus = i2c_bus.I2CBus(1, i2c_rdwr.I2CRdwr)
+        print("sensor sample (URM09 + TF-Luna):")
+        print_result("  python-smbus (model)", count(sensor_sample(legacy_bus)))
+        print_result("  i2c_rdwr.I2CRdwr", count(sensor_sample(rdwr_bus)))
+        legacy_bus.close()
+        rdwr_bus.close()
+
+        rdwr_i2c = i2c_rdwr.I2CRdwr(1)
+        print("actuator register update (via TCA9548A):")
+        print_result("  busio / Adafruit_PureIO (model)", count(register_update(PureIOModel())))
+        print_result("  i2c_rdwr.I2CRdwr", count(register_update(rdwr_i2c)))
+        rdwr_i2c.close()
@@ -0,0 +1,137 @@
+"""V1.0
+Benchmark of the sensor-to-vibration latency trace used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The firmware runs with threads like main.py on the fake bus (BUS_LATENCY per
+transaction): bus scheduler with URM09 (20 Hz) and TF-Luna (50 Hz), two
+DRV2605L through bus_scheduler.ScheduledI2C, sequencer and broadcast. An
+obstacle moves between 30 and 200 cm, so the stage changes continuously.
+The main loop runs
+1. at LOOP_RATE (loop_scheduler.LoopScheduler)
+2. event-driven (wakeup.Wakeup)
+Reported are the percentiles of latency_trace (capture -> fusion -> stage ->
+commit) and the cost of the trace points per main loop iteration.
+Start with: python3 bench_latency_trace.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import math
+import threading
+import time
+
+import fake_bus
+import actuator
+import bus_scheduler
+import data_procession
+import i2c_bus
+import latency_trace
+import loop_scheduler
+import sensors
+import wakeup
+
+
+#################### variables section ####################
+
+DURATION = 10   # duration of run per case [s]
+BUS_LATENCY = 0.0005   # duration of one i2c-transaction [s]
+LOOP_RATE = 50   # iterations per second of the scheduled loop
+MOVE_PERIOD = 4.0   # period of the moving obstacle 30 -> 200 -> 30 cm [s]
+ACTUATOR_NO = [0, 1]
+SENSOR_DEADLINE = 0.01
+CALLS = 100000   # calls of the trace points for the cost
+
+
+#################### Function section ####################
+
+def run(event_driven):
+    """ firmware with threads for DURATION, returns LatencyTrace """
+    scheduler = bus_scheduler.BusScheduler()
+    devices = {0x10: fake_bus.FakeTfLuna(distance=100), 0x11: fake_bus.FakeURM09(distance=100, conversion=0.03)}
+    sensor_bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices, BUS_LATENCY))
+    actuator_bus = fake_bus.FakeI2C(channels={n: {0x5A: fake_bus.FakeDRV2605()} for n in ACTUATOR_NO},
+                                    latency=BUS_LATENCY)
+    trace = latency_trace.LatencyTrace()
+    events = wakeup.Wakeup()
+    loop = loop_scheduler.LoopScheduler(LOOP_RATE)
+    data = data_procession.DataProcession()
+    data.trace = trace
+
+    scheduler.start()
+    act = actuator.Actuator(ACTUATOR_NO, bus_scheduler.ScheduledI2C(actuator_bus, scheduler), sequencer=True,
+                            broadcast=True, trace=trace)
+    act.config_drv_to_lra()
+    act.set_drv_open_loop()
+    sensor_1 = scheduler.call("ultrasonic", sensors.URM09, bus=sensor_bus)
+    sensor_2 = scheduler.call("lidar", sensors.TfLuna, bus=sensor_bus)
+
+    def collect():
+        sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    def trigger():
+        if sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE) == sensors.STA_OK:
+            scheduler.submit("ultrasonic", collect, priority=bus_scheduler.PRIO_SENSOR,
+                             t_due=time.monotonic() + sensor_1.CONVERSION_TIME)
+
+    def poll():
+        sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    running = [True]
+
+    def move():
+        t_start = time.monotonic()
+        while running[0]:
+            distance = int(115 - 85 * math.cos(2 * math.pi * (time.monotonic() - t_start) / MOVE_PERIOD))
+            for device in devices.values():
+                device.distance = distance
+            time.sleep(0.005)
+
+    scheduler.add_periodic("ultrasonic", trigger, 0.05, 0.005)
+    scheduler.add_periodic("lidar", poll, 0.02, 0.0)
+    threading.Thread(target=move, daemon=True).start()
+    if event_driven:
+        events.subscribe()
+    loop.start()
+    while time.monotonic() - loop.t_start < DURATION:
+        act.set_actuator(data.getFeedback(sensor_1.sample, sensor_2.sample))
+        if event_driven:
+            events.wait(data.MAX_AGE)
+        else:
+            loop.wait()
+
+    running[0] = False
+    events.unsubscribe()
+    act.set_vib_const(0)
+    act.close()
+    scheduler.stop()
+    scheduler.join()
+    return trace
+
+
+def trace_cost():
+    """ duration of the trace points of one iteration with change of stage (fusion, stage, commit) [s] """
+    trace = latency_trace.LatencyTrace()
+    t_capture = time.monotonic()
+    t_start = time.perf_counter()
+    for _ in range(CALLS):
+        trace.fusion(t_capture)
+        trace.stage()
+        trace.commit()
+    return (time.perf_counter() - t_start) / CALLS
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{DURATION} s per case, bus latency {BUS_LATENCY * 1000:.1f} ms, obstacle period {MOVE_PERIOD} s")
+    for name, event_driven in ((f"main loop at {LOOP_RATE} Hz", False), ("event-driven main loop", True)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            trace = run(event_driven)
+        print(name)
+        for line in trace.report():
+            print(f"  {line}")
+    print(f"trace points per stage change: {trace_cost() * 1e6:.2f} us")
@@ -0,0 +1,93 @@
+"""V1.0
+Benchmark of the fixed-rate main loop scheduler used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The work of one main loop iteration of main.py (getFeedback of the latest
+samples, three GPIO reads of the turning switch, set_actuator on two fake
+DRV2605L) is executed for DURATION:
+1. as fast as possible (while 1 without sleep, like main.py before)
+2. with loop_scheduler.LoopScheduler at LOOP_RATE
+3. like 2., one iteration blocks for BLOCK_TIME (time.sleep of button feedback)
+Reported are iterations per second, cpu load of the loop thread, wakeup jitter,
+overruns / missed deadlines and the duration of the phases.
+Start with: python3 bench_loop_scheduler.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+import data_procession
+import loop_scheduler
+from sample import Sample, STA_OK
+
+
+#################### variables section ####################
+
+DURATION = 3   # duration of run per case [s]
+LOOP_RATE = 50   # iterations per second of the scheduled loop
+BLOCK_TIME = 0.5   # duration of one blocking iteration [s]
+ACTUATOR_NO = [0, 1]
+SWITCH_PINS = {23: 1, 24: 0, 25: 1}   # simulated GPIO levels of the turning switch
+
+
+#################### Function section ####################
+
+def gpio_input(pin):
+    """ simulated GPIO.input """
+    return SWITCH_PINS[pin]
+
+
+def run(scheduled, block=False):
+    """ run main loop work for DURATION, return iterations/s, LoopScheduler (or None) and cpu load """
+    devices = [fake_bus.FakeDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO})
+    loop = loop_scheduler.LoopScheduler(LOOP_RATE)
+    data = data_procession.DataProcession()
+    with contextlib.redirect_stdout(io.StringIO()):
+        act = actuator.Actuator(ACTUATOR_NO, bus)
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+
+        t_start = time.monotonic()
+        cpu_start = time.thread_time()
+        loop.start()
+        loops = 0
+        while time.monotonic() - t_start < DURATION:
+            with loop.phase("feedback"):
+                now = time.monotonic()
+                value = data.getFeedback(Sample(700, now, 1, status=STA_OK), Sample(650, now, 1, status=STA_OK))
+            with loop.phase("switch"):
+                switch_state = 0 if gpio_input(23) == 0 else 1 if gpio_input(24) == 0 else \
+                    2 if gpio_input(25) == 0 else 1
+                act.set_freq_state(switch_state)
+            with loop.phase("actuator"):
+                act.set_actuator(value)
+            if block and loops == LOOP_RATE:   # blocking call after 1 s
+                time.sleep(BLOCK_TIME)
+            loops = loops + 1
+            if scheduled:
+                loop.wait()
+        duration = time.monotonic() - t_start
+        cpu_load = (time.thread_time() - cpu_start) / duration
+        act.close()
+    return loops / duration, loop if scheduled else None, cpu_load
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{DURATION} s per case, scheduled loop at {LOOP_RATE} Hz")
+    loop_rate, _, cpu_load = run(scheduled=False)
+    print(f"{'while 1, no sleep':<28}{loop_rate:>10.0f} iterations/s, cpu {100 * cpu_load:5.1f} %")
+    for name, block in (("LoopScheduler", False), (f"LoopScheduler, {BLOCK_TIME} s block", True)):
+        loop_rate, loop, cpu_load = run(scheduled=True, block=block)
+        print(f"{name:<28}{loop_rate:>10.1f} iterations/s, cpu {100 * cpu_load:5.1f} %")
+        for line in loop.report():
+            print(f"    {line}")
@@ -0,0 +1,128 @@
+"""V1.0
+Benchmark of Me007ys uart-reader used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A pty pair replaces the serial port: a writer thread sends ME007YS frames
+(with some corrupted bytes) to the master side, the driver reads from the
+slave side (fake_bus.PtySerial, no pyserial needed). Compared are the former
+reader (timeout=0, busy-spin on in_waiting, reset_input_buffer, close after
+every frame) and the streaming reader of sensors.Me007ys. Reported are CPU
+time of the reader thread and valid frames per second.
+Start with: python3 bench_me007ys_stream.py
+"""
+
+
+#################### import section ####################
+
+import os
+import threading
+import time
+
+import fake_bus   # adds Firmware_Hauptfunktion to sys.path, uart of the hal backend on a pty
+import sensors
+
+
+#################### variables section ####################
+
+DURATION = 5   # duration of each run [s]
+FRAME_RATE = 100   # frames per second sent by the writer
+CORRUPT_EVERY = 10   # every n-th frame gets a wrong checksum
+
+
+#################### Function section ####################
+
+def make_frame(distance, corrupt=False):
+    """ ME007YS frame: header, data_high, data_low, checksum """
+    frame = bytearray([0xFF, distance >> 8, distance & 0xFF, 0])
+    frame[3] = (frame[0] + frame[1] + frame[2]) & 0xFF
+    if corrupt:
+        frame[3] = (frame[3] + 1) & 0xFF
+    return bytes(frame)
+
+
+def writer(master_fd, running, sent):
+    """ send frames to master side of pty at FRAME_RATE """
+    period = 1 / FRAME_RATE
+    t_next = time.monotonic()
+    n = 0
+    while running[0]:
+        n = n + 1
+        corrupt = n % CORRUPT_EVERY == 0
+        os.write(master_fd, make_frame(300 + n % 4000, corrupt))
+        if not corrupt:
+            sent[0] = sent[0] + 1
+        t_next = t_next + period
+        time.sleep(max(0, t_next - time.monotonic()))
+
+
+def legacy_get_distance(ser):
+    """ former Me007ys.getDistance """
+    if ser.isOpen() == False:
+        ser.open()
+    while True:
+        counter = ser.in_waiting
+        if counter > 3:
+            bytes_serial = ser.read(4)
+            ser.reset_input_buffer()
+            if bytes_serial[0] == 0xFF:
+                checksum = (bytes_serial[0] + bytes_serial[1] + bytes_serial[2]) & 0x00FF
+                if checksum != bytes_serial[3]:
+                    continue
+                break
+    ser.close()
+
+
+def run(streaming):
+    """ read frames for DURATION, return CPU load of reader [%], valid frames per second, sent frames """
+    master_fd, slave_fd = os.openpty()   # slave_fd stays open, so the pty survives close() of the reader
+    port = os.ttyname(slave_fd)
+    running = [True]
+    sent = [0]
+    frames = [0]
+    cpu = [0.0]
+
+    if streaming:
+        sensor = sensors.Me007ys(port)
+    else:
+        ser = fake_bus.PtySerial(port, 9600, timeout=0)
+
+    def reader():
+        t_cpu = time.thread_time()
+        while running[0]:
+            if streaming:
+                if sensor.update():
+                    frames[0] = frames[0] + 1
+            else:
+                legacy_get_distance(ser)
+                frames[0] = frames[0] + 1
+        cpu[0] = time.thread_time() - t_cpu
+
+    threads = [
+        threading.Thread(target=writer, args=(master_fd, running, sent)),
+        threading.Thread(target=reader),
+        ]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    running[0] = False
+    threads[0].join()
+    os.write(master_fd, make_frame(300))   # release a reader waiting for a frame
+    threads[1].join()
+
+    valid = sensor.frames if streaming else frames[0]
+    if streaming:
+        sensor.close()
+    os.close(master_fd)
+    os.close(slave_fd)
+    return 100 * cpu[0] / DURATION, valid / DURATION, sent[0] / DURATION
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"writer: {FRAME_RATE} frames/s, every {CORRUPT_EVERY}th frame corrupted, {DURATION} s per run")
+    print(f"{'reader':<12}{'CPU [%]':>10}{'valid frames/s':>17}{'sent frames/s':>16}")
+    for name, streaming in (("legacy", False), ("streaming", True)):
+        load, fps, sent = run(streaming)
+        print(f"{name:<12}{load:>10.1f}{fps:>17.1f}{sent:>16.1f}")
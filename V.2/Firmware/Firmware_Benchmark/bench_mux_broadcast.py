@@ -0,0 +1,94 @@
+"""V1.0
+Benchmark of TCA9548A broadcast writes used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Two fake DRV2605L behind the TCA9548A, each i2c-transaction takes BUS_LATENCY.
+Compared are writes per channel (one DRV after the other) and broadcast writes
+(all channels enabled, one transfer to 0x5A) for:
+1. i2c-transactions of all stage changes 0-5 (STAGE_VALUES) and set_drv_freq
+2. i2c-transactions per pulse (play_all) and start skew of the actuators:
+   time between the GO writes of the first and the last DRV of one pulse
+At the end the registers of both DRVs must be equal and the register shadows
+must match the devices (reads per channel).
+Start with: python3 bench_mux_broadcast.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+BUS_LATENCY = 0.0002   # duration of one i2c-transaction [s]
+ACTUATOR_NO = [0, 1]
+STAGE_VALUES = [100, 300, 500, 700, 900, 0]   # sensor values of stage 1-5 and stage 0
+PULSES = 200   # number of pulses for the start skew
+
+
+class RecordingDRV2605(fake_bus.FakeDRV2605):
+    """ fake DRV2605L, records the time of every GO write """
+
+    def __init__(self):
+        fake_bus.FakeDRV2605.__init__(self)
+        self.t_go_list = []   # time of GO bit set
+
+    def write(self, register, value):
+        fake_bus.FakeDRV2605.write(self, register, value)
+        if register == 0x0C and value & 0x01:
+            self.t_go_list.append(time.monotonic())
+
+
+#################### Function section ####################
+
+def run(broadcast, sequencer):
+    """ return transactions of stage changes, transactions per pulse, start skew [s] \
+        (mean, max) and True if registers and shadows are consistent
+        """
+    devices = [RecordingDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO}, latency=BUS_LATENCY)
+    with contextlib.redirect_stdout(io.StringIO()):
+        act = actuator.Actuator(ACTUATOR_NO, bus, sequencer=sequencer, broadcast=broadcast)
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+        act.pattern.stop()   # pulses are started here, not by the pattern engine
+
+        bus.transactions = 0
+        for value in STAGE_VALUES:
+            act.set_actuator(value)
+        act.set_drv_freq(200)
+        stage_transactions = bus.transactions
+
+        act.set_vib_intv(1)
+        for device in devices:
+            device.t_go_list = []
+        bus.transactions = 0
+        for _ in range(PULSES):
+            act.play_all()
+        pulse_transactions = bus.transactions / PULSES
+
+    skew = [abs(devices[-1].t_go_list[n] - devices[0].t_go_list[n]) for n in range(PULSES)]
+    consistent = devices[0].reg[0x01:0x21] == devices[-1].reg[0x01:0x21] and \
+        not any(act.verify_shadow().values())
+    act.close()
+    return stage_transactions, pulse_transactions, sum(skew) / PULSES, max(skew), consistent
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{len(ACTUATOR_NO)} actuators, bus latency {BUS_LATENCY * 1000} ms/transaction")
+    print(f"{'mode':<24}{'stage changes':>15}{'per pulse':>11}{'skew mean':>12}{'skew max':>11}{'registers':>11}")
+    for sequencer in (False, True):
+        for broadcast in (False, True):
+            name = f"{'broadcast' if broadcast else 'per channel'}, {'sequencer' if sequencer else 'host'}"
+            stage_transactions, pulse_transactions, skew_mean, skew_max, consistent = run(broadcast, sequencer)
+            print(f"{name:<24}{stage_transactions:>15}{pulse_transactions:>11.1f}"
+                  f"{skew_mean * 1000:>9.3f} ms{skew_max * 1000:>8.3f} ms{'ok' if consistent else 'ERROR':>11}")
@@ -0,0 +1,79 @@
+"""V1.0
+Benchmark of the TCA9548A channel cache and batching used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A main loop at LOOP_RATE changes the stage every STAGE_TIME (STAGE_VALUES in
+turn) on two fake DRV2605L behind the TCA9548A, pulses are started by the
+pattern engine. Channel switches per second (control register writes) and
+i2c-transactions per second are measured for:
+1. select + deselect per access (adafruit_tca9548a)
+2. channel cache (select only if the channel changes)
+3. channel cache + writes of one set_actuator call sent channel by channel
+each with writes per channel and with broadcast writes. At the end the
+registers of both DRVs must be equal and the register shadows must match.
+Start with: python3 bench_mux_manager.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+DURATION = 3   # duration of run per case [s]
+LOOP_RATE = 100   # main loop iterations per second
+STAGE_TIME = 0.1   # time between stage changes [s]
+STAGE_VALUES = [100, 300, 900, 500, 0, 700]   # sensor values, stages 1, 2, 5, 3, 0, 4
+ACTUATOR_NO = [0, 1]
+CASES = {"select + deselect": (False, False), "cache": (True, False), "cache + batch": (True, True)}
+
+
+#################### Function section ####################
+
+def run(cache, reorder, broadcast):
+    """ main loop for DURATION, return channel switches/s, transactions/s and consistency """
+    devices = [fake_bus.FakeDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO})
+    with contextlib.redirect_stdout(io.StringIO()):
+        act = actuator.Actuator(ACTUATOR_NO, bus, broadcast=broadcast, mux_cache=cache)
+        act.tca.reorder = reorder
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+
+        bus.transactions = 0
+        act.tca.switch_rate()
+        t_start = time.monotonic()
+        t_next = t_start
+        n = 0
+        while t_next < t_start + DURATION:
+            act.set_actuator(STAGE_VALUES[int((t_next - t_start) / STAGE_TIME) % len(STAGE_VALUES)])
+            n = n + 1
+            t_next = t_start + n / LOOP_RATE
+            time.sleep(max(0, t_next - time.monotonic()))
+        switch_rate = act.tca.switch_rate()
+        transaction_rate = bus.transactions / (time.monotonic() - t_start)
+        act.close()
+
+    consistent = devices[0].reg[0x01:0x21] == devices[-1].reg[0x01:0x21] and \
+        not any(act.verify_shadow().values())
+    return switch_rate, transaction_rate, consistent
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"main loop {LOOP_RATE} Hz, stage change every {STAGE_TIME * 1000:.0f} ms, {DURATION} s per case")
+    print(f"{'case':<32}{'switches/s':>12}{'transactions/s':>16}{'registers':>11}")
+    for broadcast in (False, True):
+        for name, (cache, reorder) in CASES.items():
+            switch_rate, transaction_rate, consistent = run(cache, reorder, broadcast)
+            name = f"{name}{', broadcast' if broadcast else ''}"
+            print(f"{name:<32}{switch_rate:>12.1f}{transaction_rate:>16.1f}{'ok' if consistent else 'ERROR':>11}")
@@ -0,0 +1,124 @@
+"""V1.0
+Benchmark of the vibration pattern engine used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A main loop calls set_actuator() with sensor values of stage 1 to 4 on two
+fake DRV2605L behind the TCA9548A. Reported per stage are loop iterations per
+second and the pulse rate of the actuators, for the blocking start_vib_intv
+(play + time.sleep(1/frq), as before) and for the pattern engine. Then the
+rate is switched from 3 to 13 Hz in the middle of a period and the delay until
+the first pulse at the new rate is measured.
+Start with: python3 bench_pattern_engine.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+DURATION = 2   # duration of run per stage [s]
+ACTUATOR_NO = [0, 1]
+STAGE_VALUES = {1: 100, 2: 300, 3: 500, 4: 700}   # sensor value per stage
+FREQUENCIES = {1: 3, 2: 5, 3: 8, 4: 13}   # pulse rate per stage [Hz]
+SWITCHES = 20   # number of rate switches
+
+
+class BlockingActuator(actuator.Actuator):
+    """ actuator with start_vib_intv of V2.2 (blocks for one period) """
+
+    def start_vib_intv(self, frq, restart=False):
+        for i in self.act_no:
+            self.drv[i].play()
+        time.sleep(1/frq)
+
+    def set_actuator(self, value):
+        """ like V2.2: stage 1-4 play again on every call, not only on a change of stage """
+        stage_comp = self.stage_comp
+        actuator.Actuator.set_actuator(self, value)
+        if self.stage == stage_comp and self.stage in FREQUENCIES:
+            self.start_vib_intv(FREQUENCIES[self.stage])
+
+
+class RecordingDRV2605(fake_bus.FakeDRV2605):
+    """ fake DRV2605L, records the time of every pulse (GO bit set) """
+
+    def __init__(self):
+        fake_bus.FakeDRV2605.__init__(self)
+        self.t_pulses = []
+
+    def write(self, register, value):
+        fake_bus.FakeDRV2605.write(self, register, value)
+        if register == 0x0C and value & 0x01:
+            self.t_pulses.append(time.monotonic())
+
+
+#################### Function section ####################
+
+def create(actuator_class):
+    """ actuator with two fake DRVs, configured like in main.py """
+    devices = [RecordingDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO})
+    act = actuator_class(ACTUATOR_NO, bus)
+    with contextlib.redirect_stdout(io.StringIO()):
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+    return act, devices
+
+
+def run_loop(act, devices, value):
+    """ main loop with set_actuator for DURATION, return loop rate, max iteration and pulse rate """
+    plays = devices[0].plays
+    loops = 0
+    t_iteration_max = 0.0
+    t_start = time.monotonic()
+    t_end = t_start + DURATION
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            t_iteration = time.monotonic()
+            if t_iteration >= t_end:
+                break
+            act.set_actuator(value)
+            loops = loops + 1
+            t_iteration_max = max(t_iteration_max, time.monotonic() - t_iteration)
+        duration = time.monotonic() - t_start
+        act.set_actuator(0)   # stop between stages
+    return loops / duration, t_iteration_max, (devices[0].plays - plays) / duration
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"{'':<16}{'stage':>6}{'frq [Hz]':>10}{'loops/s':>12}{'max loop [ms]':>15}{'pulses/s':>10}")
+    for name, actuator_class in (("blocking sleep", BlockingActuator), ("pattern engine", actuator.Actuator)):
+        act, devices = create(actuator_class)
+        for stage, value in STAGE_VALUES.items():
+            loop_rate, t_max, pulse_rate = run_loop(act, devices, value)
+            print(f"{name:<16}{stage:>6}{FREQUENCIES[stage]:>10}{loop_rate:>12.1f}"
+                  f"{t_max * 1000:>15.2f}{pulse_rate:>10.2f}")
+        act.close()
+
+    # switch of rate in the middle of a period
+    act, devices = create(actuator.Actuator)
+    delays = []
+    for n in range(SWITCHES):
+        act.start_vib_intv(3)
+        time.sleep(0.5 + 0.01 * n)   # switch at different phases of the 333 ms period
+        t_switch = time.monotonic()
+        act.start_vib_intv(13)
+        time.sleep(0.1)
+        delays.append(min(t for t in devices[0].t_pulses if t >= t_switch) - t_switch)
+        act.set_vib_const(0)
+        time.sleep(0.1)
+    act.close()
+    print(f"switch 3 -> 13 Hz mid-pattern: first pulse after mean {1000 * sum(delays) / len(delays):.1f} ms, "
+          f"max {1000 * max(delays):.1f} ms (new period {1000 / 13:.1f} ms), "
+          f"worst-case pulse delay {act.pattern.late_max * 1000:.2f} ms")
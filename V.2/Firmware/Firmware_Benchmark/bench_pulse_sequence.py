@@ -0,0 +1,75 @@
+"""V1.0
+Benchmark of pulse trains in the DRV2605L waveform sequencer used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A main loop at LOOP_RATE holds each stage 1-4 for DURATION on two fake
+DRV2605L behind the TCA9548A. Reported per stage are GO writes per second and
+i2c-transactions per second, for pulses started by the host (pattern engine)
+and for pulses timed by the waveform sequencer. The sequencer registers of the
+fake DRVs are compared with the compiled register image of each stage.
+Start with: python3 bench_pulse_sequence.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import time
+
+import fake_bus
+import actuator
+import pulse_sequence
+
+
+#################### variables section ####################
+
+DURATION = 2   # duration of run per stage [s]
+LOOP_RATE = 100   # main loop iterations per second
+ACTUATOR_NO = [0, 1]
+STAGES = {1: (100, 3), 2: (300, 5), 3: (500, 8), 4: (700, 13)}   # stage: sensor value, pulse rate
+
+
+#################### Function section ####################
+
+def run_stage(act, bus, devices, value):
+    """ main loop in one stage for DURATION, return GO writes/s per DRV and transactions/s """
+    act.set_actuator(value)
+    plays = devices[0].plays
+    bus.transactions = 0
+    t_start = time.monotonic()
+    t_next = t_start
+    while t_next < t_start + DURATION:
+        act.set_actuator(value)
+        t_next = t_next + 1 / LOOP_RATE
+        time.sleep(max(0, t_next - time.monotonic()))
+    duration = time.monotonic() - t_start
+    return (devices[0].plays - plays) / duration, bus.transactions / duration
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"main loop {LOOP_RATE} Hz, {DURATION} s per stage")
+    print(f"{'mode':<12}{'stage':>6}{'frq [Hz]':>10}{'GO writes/s':>13}{'transactions/s':>16}{'image':>8}")
+    for sequencer in (False, True):
+        devices = [fake_bus.FakeDRV2605() for _ in ACTUATOR_NO]
+        bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO})
+        act = actuator.Actuator(ACTUATOR_NO, bus, sequencer=sequencer)
+        with contextlib.redirect_stdout(io.StringIO()):
+            act.config_drv_to_lra()
+            act.set_drv_open_loop()
+
+        for stage, (value, frq) in STAGES.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                go_rate, transaction_rate = run_stage(act, bus, devices, value)
+            if sequencer:   # sequencer registers of all DRVs = compiled register image
+                image = pulse_sequence.register_image(pulse_sequence.compile_rhythm(frq)[0])
+            else:   # one effect, end of sequence
+                image = {0x04: 1, 0x05: 0}
+            image_ok = all(d.reg[register] == val for d in devices for register, val in image.items())
+            print(f"{'sequencer' if sequencer else 'host':<12}{stage:>6}{frq:>10}{go_rate:>13.2f}"
+                  f"{transaction_rate:>16.1f}{'ok' if image_ok else 'ERROR':>8}")
+        act.close()
+        print(f"{'':<12}worst-case delay of host-timed GO: {act.pattern.late_max * 1000:.2f} ms")
@@ -0,0 +1,66 @@
+"""V1.0
+Benchmark of the DRV2605L register shadow used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Two DRV2605L behind the TCA9548A on the fake bus (busio.I2C-like, every
+register access = mux select + transfer + mux release) are initialized like in
+main.py: config_drv_to_lra, autocalibration, set_drv_open_loop and one
+set_freq_state. Reported are the i2c-transactions with and without register
+shadow, the accesses answered by the shadow and a check of the verify mode
+with a register changed behind the back of the shadow.
+Start with: python3 bench_register_shadow.py
+"""
+
+
+#################### import section ####################
+
+import fake_bus
+import actuator
+
+
+#################### variables section ####################
+
+ACTUATOR_NO = [0, 1]   # two actuators on channel 0 and 1
+ACTUATOR_TYPE = [2414, 2414]
+DRV_ADDR = 0x5A
+
+
+#################### Function section ####################
+
+def calibrate(shadow):
+    """ full initialization of both actuators, return bus, devices and actuator """
+    devices = [fake_bus.FakeDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {DRV_ADDR: devices[n]} for n in ACTUATOR_NO})
+    act = actuator.Actuator(ACTUATOR_NO, bus, shadow=shadow)
+    bus.transactions = 0
+    bus.mux_writes = 0
+    act.config_drv_to_lra()
+    act.autocalibration(ACTUATOR_TYPE)
+    act.set_drv_open_loop()
+    act.set_freq_state(1)
+    return bus, devices, act
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    results = {}
+    for shadow in (False, True):
+        bus, devices, act = calibrate(shadow)
+        results[shadow] = bus.transactions
+        print(f"shadow {'on ' if shadow else 'off'}: {bus.transactions} i2c-transactions "
+              f"({bus.mux_writes} mux writes), {sum(d.writes for d in devices)} register writes")
+        if shadow:
+            for i in ACTUATOR_NO:
+                print(f"  actuator {i}: {act.shadow[i].reads} reads / {act.shadow[i].writes} writes "
+                      f"to device, {act.shadow[i].reads_saved} reads / "
+                      f"{act.shadow[i].writes_saved} writes from shadow")
+    print(f"saved during full calibration: {results[False] - results[True]} i2c-transactions "
+          f"({100 * (results[False] - results[True]) / results[False]:.0f} %)")
+
+    # verify mode: device and shadow must match after calibration,
+    # a register changed behind the back of the shadow has to be found
+    print(f"verify after calibration: {act.verify_shadow()}")
+    devices[0].reg[0x1D] = 0x00
+    print(f"verify after change of 0x1D: {act.verify_shadow()}")
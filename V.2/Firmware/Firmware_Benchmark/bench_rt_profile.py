@@ -0,0 +1,110 @@
+"""V1.0
+Benchmark of the real-time profile used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The threads of main.py run for DURATION in a new process: bus scheduler with
+URM09 (20 Hz) and TF-Luna (50 Hz) on the fake bus, pattern engine at
+PULSE_RATE and the main loop at LOOP_RATE (loop_scheduler). Meanwhile
+LOAD_PROCESSES busy processes per core load the machine with normal priority.
+1. normal priority (CFS)
+2. rt_profile.enable(): SCHED_FIFO, cores, mlockall (fallback without permission)
+Reported are the settings of the profile and the wakeup latency per thread.
+Start with: python3 bench_rt_profile.py (as root or with CAP_SYS_NICE for case 2)
+"""
+
+
+#################### import section ####################
+
+import multiprocessing
+import os
+import time
+
+import fake_bus
+import bus_scheduler
+import i2c_bus
+import loop_scheduler
+import pattern_engine
+import rt_profile
+import sensors
+
+
+#################### variables section ####################
+
+DURATION = 5   # duration of run per case [s]
+LOOP_RATE = 50   # iterations per second of the main loop
+PULSE_RATE = 8   # pulses per second of the pattern engine
+LOAD_PROCESSES = 2   # busy processes per core
+SENSOR_DEADLINE = 0.01
+
+
+#################### Function section ####################
+
+def load():
+    """ busy process with normal priority """
+    x = 0
+    while True:
+        x = (x + 1) % 1000
+
+
+def case(profile, conn):
+    """ threads of the firmware for DURATION (own process), send report of rt_profile """
+    if profile:
+        rt_profile.enable()
+    scheduler = bus_scheduler.BusScheduler()
+    devices = {0x10: fake_bus.FakeTfLuna(), 0x11: fake_bus.FakeURM09(conversion=0.03)}
+    sensor_bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices))
+    scheduler.start()
+    sensor_1 = scheduler.call("ultrasonic", sensors.URM09, bus=sensor_bus)
+    sensor_2 = scheduler.call("lidar", sensors.TfLuna, bus=sensor_bus)
+
+    def collect():
+        sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    def trigger():
+        if sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE) == sensors.STA_OK:
+            scheduler.submit("ultrasonic", collect, priority=bus_scheduler.PRIO_SENSOR,
+                             t_due=time.monotonic() + sensor_1.CONVERSION_TIME)
+
+    def poll():
+        sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    scheduler.add_periodic("ultrasonic", trigger, 0.05, 0.005)
+    scheduler.add_periodic("lidar", poll, 0.02, 0.0)
+    pattern = pattern_engine.PatternEngine(lambda: None)
+    pattern.start()
+    pattern.set_rate(PULSE_RATE)
+
+    rt_profile.latency.clear()   # without start-up
+    loop = loop_scheduler.LoopScheduler(LOOP_RATE)
+    loop.start()
+    while time.monotonic() - loop.t_start < DURATION:
+        sensor_1.sample, sensor_2.sample
+        loop.wait()
+
+    pattern.stop()
+    pattern.join()
+    scheduler.stop()
+    scheduler.join()
+    conn.send(rt_profile.report())
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    cores = len(os.sched_getaffinity(0))
+    print(f"{DURATION} s per case, {LOAD_PROCESSES * cores} busy processes on {cores} core(s)")
+    loads = [multiprocessing.Process(target=load, daemon=True) for _ in range(LOAD_PROCESSES * cores)]
+    for p in loads:
+        p.start()
+    for name, profile in (("normal priority", False), ("rt profile", True)):
+        conn, child_conn = multiprocessing.Pipe()
+        p = multiprocessing.Process(target=case, args=(profile, child_conn))
+        p.start()
+        lines = conn.recv()
+        p.join()
+        print(name)
+        for line in lines:
+            print(f"  {line}")
+    for p in loads:
+        p.terminate()
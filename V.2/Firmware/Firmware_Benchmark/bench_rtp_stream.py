@@ -0,0 +1,102 @@
+"""V1.0
+Benchmark of the continuous vibration feedback (rtp_stream) used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A main loop at LOOP_RATE delivers a feedback value which moves slowly from 0
+to 1000 and back (an obstacle coming closer and going away, PERIOD) to two fake
+DRV2605L behind the TCA9548A (BUS_LATENCY per i2c-transaction). Compared are
+the 6 stages of set_actuator and the continuous mode with different update
+rate limits. Reported are the taken over feedback values per second (achieved
+update rate, stages: stage changes), register writes per second (RTP writes of
+the stream, stages: commit writes), i2c-transactions per second (bus load) and
+the number of different outputs (resolution: stages or pulse rate + amplitude).
+Start with: python3 bench_rtp_stream.py
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import io
+import math
+import time
+
+import fake_bus
+import actuator
+import rtp_stream
+
+
+#################### variables section ####################
+
+DURATION = 4   # duration of run per case [s]
+PERIOD = 4   # period of feedback value 0 -> 1000 -> 0 [s]
+LOOP_RATE = 100   # main loop iterations per second
+BUS_LATENCY = 0.0002   # duration of one i2c-transaction [s]
+ACTUATOR_NO = [0, 1]
+UPDATE_RATES = [10, 20, 50, 1000]   # update rate limits of continuous mode [1/s]
+
+
+#################### Function section ####################
+
+def feedback(t):
+    """ feedback value at time t """
+    return int(500 - 500 * math.cos(2 * math.pi * t / PERIOD))
+
+
+def run(update_rate):
+    """ main loop for DURATION, update_rate None = stages, \
+        return updates/s, RTP writes/s, transactions/s and number of outputs
+        """
+    devices = [fake_bus.FakeDRV2605() for _ in ACTUATOR_NO]
+    bus = fake_bus.FakeI2C(channels={n: {0x5A: devices[n]} for n in ACTUATOR_NO}, latency=BUS_LATENCY)
+    with contextlib.redirect_stdout(io.StringIO()):
+        act = actuator.Actuator(ACTUATOR_NO, bus)
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+        if update_rate is not None:
+            act.start_continuous()
+            act.stream.update_period = 1 / update_rate
+
+        outputs = set()
+        stage_changes = 0
+        writes = act.writes
+        bus.transactions = 0
+        t_start = time.monotonic()
+        t_next = t_start
+        n = 0
+        while t_next < t_start + DURATION:
+            value = feedback(t_next - t_start)
+            if update_rate is None:
+                stage = act.stage
+                act.set_actuator(value)
+                outputs.add(act.stage)
+                stage_changes = stage_changes + (act.stage != stage)
+            else:
+                act.set_continuous(value)
+                outputs.add(rtp_stream.lookup(act.stream.lut, value))
+            n = n + 1
+            t_next = t_start + n / LOOP_RATE
+            time.sleep(max(0, t_next - time.monotonic()))
+        duration = time.monotonic() - t_start
+        transaction_rate = bus.transactions / duration
+        if update_rate is None:
+            updates = stage_changes
+            writes = act.writes - writes
+        else:
+            updates = act.stream.updates
+            writes = act.stream.writes
+        act.close()
+    return updates / duration, writes / duration, transaction_rate, len(outputs)
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"main loop {LOOP_RATE} Hz, feedback 0 -> 1000 -> 0 in {PERIOD} s, "
+          f"bus latency {BUS_LATENCY * 1000} ms/transaction")
+    print(f"{'mode':<26}{'updates/s':>11}{'writes/s':>10}{'transactions/s':>16}{'outputs':>9}")
+    for update_rate in [None] + UPDATE_RATES:
+        name = "stages" if update_rate is None else f"continuous, max. {update_rate}/s"
+        update_rate_real, write_rate, transaction_rate, outputs = run(update_rate)
+        print(f"{name:<26}{update_rate_real:>11.1f}{write_rate:>10.1f}{transaction_rate:>16.1f}{outputs:>9}")
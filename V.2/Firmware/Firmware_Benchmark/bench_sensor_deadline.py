@@ -0,0 +1,81 @@
+"""V1.0
+Benchmark of sensor reads with deadline used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+1. Me007ys on a silent pty: every read has to return STA_TIMEOUT at its deadline.
+2. TfLuna and URM09 on a fake bus whose transactions sometimes stall: reads
+   return STA_TIMEOUT instead of starting further transactions.
+Reported are status counts and worst-case read latency per sensor.
+Start with: python3 bench_sensor_deadline.py
+"""
+
+
+#################### import section ####################
+
+import os
+import random
+import time
+
+import fake_bus
+import i2c_bus
+import sensors
+
+
+#################### variables section ####################
+
+READS = 50   # number of reads per sensor
+DEADLINE = 0.01   # deadline of one read [s]
+STALL = 0.015   # duration of a stalled transaction [s]
+STALL_PROBABILITY = 0.2   # probability of a stalled transaction
+
+
+class StallingSMBus(fake_bus.FakeSMBus):
+    """ fake bus, some transactions take longer than the deadline """
+
+    def _device(self, addr):
+        if random.random() < STALL_PROBABILITY:
+            time.sleep(STALL)
+        return fake_bus.FakeSMBus._device(self, addr)
+
+
+#################### Function section ####################
+
+def read_all(name, read_func):
+    """ execute READS reads with deadline and print result """
+    status_count = {}
+    t_max = 0.0
+    for _ in range(READS):
+        t_start = time.monotonic()
+        status = read_func(t_start + DEADLINE)
+        t_max = max(t_max, time.monotonic() - t_start)
+        status_count[status] = status_count.get(status, 0) + 1
+    names = {sensors.STA_OK: "ok", sensors.STA_TIMEOUT: "timeout",
+             sensors.STA_STALE: "stale", sensors.STA_ERR_DATA: "error"}
+    counts = ", ".join(f"{names[k]}: {v}" for k, v in sorted(status_count.items()))
+    print(f"{name:<8} {counts:<24} worst-case {t_max * 1000:6.2f} ms "
+          f"(recorded by driver: {read_func.__self__.latency_max * 1000:6.2f} ms)")
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"deadline {DEADLINE * 1000:.0f} ms, {READS} reads per sensor")
+
+    # silent uart-sensor
+    master_fd, slave_fd = os.openpty()
+    sensor_0 = sensors.Me007ys(os.ttyname(slave_fd))
+    read_all("Me007ys", sensor_0.getDistance)
+    sensor_0.close()
+    os.close(master_fd)
+    os.close(slave_fd)
+
+    # i2c-sensors with stalling bus
+    random.seed(1)
+    devices = {0x10: fake_bus.FakeTfLuna(), 0x11: fake_bus.FakeURM09()}
+    bus = i2c_bus.I2CBus(1, lambda port: StallingSMBus(port, devices))
+    sensor_1 = sensors.URM09(bus=bus)
+    sensor_2 = sensors.TfLuna(bus=bus)
+    read_all("URM09", sensor_1.collectDistance)
+    read_all("TfLuna", sensor_2.getDistance)
+    bus.close()
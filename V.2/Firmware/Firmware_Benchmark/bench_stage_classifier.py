@@ -0,0 +1,119 @@
+"""V1.0
+Benchmark of the stage classifier used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Distance traces are converted to feedback values like data_procession
+(near mode, 1500 mm) and classified into stages. Every change of stage
+reprograms the DRVs, reported are stage transitions per minute for:
+1. thresholds only (if/elif chain of V.1 / V.2 before)
+2. hysteresis
+3. minimum dwell time
+4. hysteresis + minimum dwell time (default of Actuator)
+and the worst-case delay of a rising stage against the thresholds only.
+Recorded traces of measprotocol.py (csv: measurement, date, time, distance
+in mm, ...) are given as arguments, without arguments synthetic traces with
+sensor noise (NOISE) are used.
+Start with: python3 bench_stage_classifier.py [trace.csv ...]
+"""
+
+
+#################### import section ####################
+
+import datetime
+import os
+import random
+import sys
+
+import fake_bus   # makes modules of Firmware_Hauptfunktion importable
+import stage_classifier
+
+
+#################### variables section ####################
+
+DISTANCE_MAX = 1500   # maximum distance of near mode [mm] (data_procession.DISTANCE_NEAR_MODE)
+SAMPLE_RATE = 50   # samples per second of synthetic traces
+DURATION = 60   # duration of synthetic traces [s]
+NOISE = 15   # standard deviation of the distance [mm]
+DROPOUTS = 0.02   # part of invalid samples (no feedback) in the trace "wall, dropouts"
+CASES = {
+    "thresholds only": dict(hysteresis=0, min_dwell=0.0),
+    "hysteresis": dict(min_dwell=0.0),
+    "dwell time": dict(hysteresis=0),
+    "hysteresis + dwell time": dict(),
+    }
+
+
+#################### Function section ####################
+
+def feedback(distance):
+    """ feedback value of a distance like data_procession.DataProcession.getFeedback """
+    return min(distance, DISTANCE_MAX) * (-1000 / DISTANCE_MAX) + 1000
+
+
+def synthetic_traces():
+    """ name -> list of (time [s], distance [mm]) """
+    rng = random.Random(1)
+    times = [n / SAMPLE_RATE for n in range(DURATION * SAMPLE_RATE)]
+    threshold = DISTANCE_MAX * (1 - 400 / 1000)   # distance of the threshold of stage 3
+    approach = [max(250, 3000 - 120 * t) for t in times]   # walking to a wall (0.12 m/s), stop at 25 cm
+    return {
+        "standing at threshold": [(t, rng.gauss(threshold, NOISE)) for t in times],
+        "walking to a wall": [(t, rng.gauss(d, NOISE)) for t, d in zip(times, approach)],
+        "wall, dropouts": [(t, DISTANCE_MAX if rng.random() < DROPOUTS else rng.gauss(1000, NOISE))
+                           for t in times],
+        }
+
+
+def read_trace(path):
+    """ list of (time [s], distance [mm]) of a csv-file of measprotocol.py, invalid rows are skipped """
+    trace = []
+    t_start = None
+    with open(path) as f:
+        for line in f:
+            columns = line.strip().split(",")
+            try:
+                t = datetime.datetime.strptime(columns[1] + " " + columns[2], "%Y-%m-%d %H:%M:%S:%f")
+                distance = float(columns[3])
+            except (IndexError, ValueError):
+                continue
+            if t_start is None:
+                t_start = t
+            trace.append(((t - t_start).total_seconds(), distance))
+    return trace
+
+
+def classify_trace(trace, **kwargs):
+    """ return transitions per minute and worst-case delay [s] of rising stages against thresholds only """
+    classifier = stage_classifier.StageClassifier(**kwargs)
+    duration = max(trace[-1][0] - trace[0][0], 1e-9)
+    delay_max = 0.0
+    t_rising = None   # time since thresholds only are above the classifier
+    for t, distance in trace:
+        value = feedback(distance)
+        stage = classifier.update(value, t)
+        if stage_classifier.classify(value) > stage:
+            t_rising = t if t_rising is None else t_rising
+        elif t_rising is not None:
+            delay_max = max(delay_max, t - t_rising)
+            t_rising = None
+    return classifier.transitions * 60 / duration, delay_max
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1:
+        traces = {os.path.basename(path): read_trace(path) for path in sys.argv[1:]}
+    else:
+        traces = synthetic_traces()
+        print(f"synthetic traces: {SAMPLE_RATE} samples/s, {DURATION} s, noise {NOISE} mm")
+    print(f"hysteresis {stage_classifier.HYSTERESIS}, minimum dwell time {stage_classifier.MIN_DWELL} s")
+    print(f"{'trace':<24}{'case':<26}{'transitions/min':>16}{'rising delay max':>18}")
+    for name, trace in traces.items():
+        if len(trace) < 2:
+            print(f"{name:<24}no valid samples")
+            continue
+        for case, kwargs in CASES.items():
+            rate, delay_max = classify_trace(trace, **kwargs)
+            print(f"{name:<24}{case:<26}{rate:>16.1f}{delay_max * 1000:>15.0f} ms")
@@ -0,0 +1,72 @@
+"""V1.0
+Benchmark of TF-Luna trigger mode vs. continuous mode used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Counts the i2c-transactions per fresh sample of sensors.TfLuna at the 50 Hz
+polling rate of lidarThread. A simulated clock is used, so the result does not
+depend on the load of the machine. Start with: python3 bench_tfluna_modes.py
+"""
+
+
+#################### import section ####################
+
+import fake_bus
+import i2c_bus
+import sensors
+
+
+#################### variables section ####################
+
+POLL_RATE = 50   # polling rate of lidarThread [Hz]
+DURATION = 60   # simulated duration [s]
+TFLUNA_ADDR = 0x10
+
+
+class SimClock:
+    """ simulated monotonic clock """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+#################### Function section ####################
+
+def run(continuous, frame_rate=100):
+    """ poll sensor for DURATION, return (transactions, polls, fresh samples) """
+    clock = SimClock()
+    devices = {TFLUNA_ADDR: fake_bus.FakeTfLuna(clock=clock)}
+    bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices))
+    lidar = sensors.TfLuna(bus=bus, continuous=continuous, frame_rate=frame_rate)
+    transactions_init = bus.transactions
+
+    polls = int(DURATION * POLL_RATE)
+    fresh = 0
+    for n in range(polls):
+        clock.now = n / POLL_RATE + 0.0005   # small offset -> poll is never exactly on a frame edge
+        if lidar.getDistance() == sensors.STA_OK:
+            fresh = fresh + 1
+    return bus.transactions - transactions_init, polls, fresh
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"polling rate {POLL_RATE} Hz, simulated duration {DURATION} s")
+    print(f"{'mode':<22}{'transactions':>14}{'fresh samples':>15}{'per poll':>10}{'per sample':>12}")
+
+    results = [("trigger", run(False))]
+    for fps in (25, 50, 100):   # 25 fps -> freshness detection skips every second poll
+        results.append((f"continuous {fps} fps", run(True, fps)))
+
+    for name, (transactions, polls, fresh) in results:
+        print(f"{name:<22}{transactions:>14}{fresh:>15}"
+              f"{transactions / polls:>10.2f}{transactions / max(fresh, 1):>12.2f}")
+
+    trigger_rate = results[0][1][0] / results[0][1][1]
+    continuous_rate = results[3][1][0] / results[3][1][1]
+    print(f"bus transactions reduced by {100 * (1 - continuous_rate / trigger_rate):.0f} % "
+          f"(continuous 100 fps vs. trigger)")
@@ -0,0 +1,88 @@
+"""V1.0
+Benchmark of blocking vs. split-phase URM09 measurement used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Runs the sensor threads of main.py (URM09 at 20 Hz, TF-Luna at 50 Hz, shared
+i2c_lock) against the fake bus and reports the effective sample rate of both
+sensors. In blocking mode the lock is held during the conversion of the URM09,
+in split-phase mode only during trigger and read. Start with:
+python3 bench_urm09_pipeline.py
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import fake_bus
+import i2c_bus
+import sensors
+
+
+#################### variables section ####################
+
+DURATION = 5   # duration of each run [s]
+BUS_LATENCY = 0.0005   # duration of one i2c-transaction [s]
+TFLUNA_ADDR = 0x10
+URM09_ADDR = 0x11
+
+
+#################### Function section ####################
+
+def run(split):
+    """ run both sensor threads for DURATION, return sample rates [Hz] and early reads """
+    devices = {
+        TFLUNA_ADDR: fake_bus.FakeTfLuna(),
+        URM09_ADDR: fake_bus.FakeURM09(conversion=sensors.URM09.CONVERSION_TIME),
+        }
+    bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices, BUS_LATENCY))
+    sensor_1 = sensors.URM09(bus=bus)
+    sensor_2 = sensors.TfLuna(bus=bus)
+    i2c_lock = threading.Lock()
+    samples = [0, 0]   # samples of URM09 [0] and TF-Luna [1]
+    running = [True]
+
+    def ultrasonic():
+        conv = sensor_1.CONVERSION_TIME
+        while running[0]:
+            if split:
+                with i2c_lock:
+                    sensor_1.triggerDistance()
+                time.sleep(conv)
+                with i2c_lock:
+                    sensor_1.collectDistance()
+            else:
+                with i2c_lock:
+                    sensor_1.getDistance()   # lock is held during conversion
+            samples[0] = samples[0] + 1
+            time.sleep(0.05 - conv)   # 20 Hz cycle
+
+    def lidar():
+        while running[0]:
+            with i2c_lock:
+                sensor_2.getDistance()
+            samples[1] = samples[1] + 1
+            time.sleep(0.02)   # 50 Hz cycle
+
+    threads = [threading.Thread(target=ultrasonic), threading.Thread(target=lidar)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    running[0] = False
+    for thread in threads:
+        thread.join()
+    bus.close()
+    return samples[0] / DURATION, samples[1] / DURATION, devices[URM09_ADDR].early_reads
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"bus latency {BUS_LATENCY * 1000} ms/transaction, URM09 conversion "
+          f"{sensors.URM09.CONVERSION_TIME * 1000:.0f} ms, {DURATION} s per run")
+    print(f"{'mode':<14}{'URM09 [Hz]':>12}{'TF-Luna [Hz]':>14}{'early reads':>13}")
+    for name, split in (("blocking", False), ("split-phase", True)):
+        rate_1, rate_2, early = run(split)
+        print(f"{name:<14}{rate_1:>12.1f}{rate_2:>14.1f}{early:>13}")
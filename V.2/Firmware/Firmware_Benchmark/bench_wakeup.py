@@ -0,0 +1,117 @@
+"""V1.0
+Benchmark of the event-driven main loop used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The bus scheduler polls URM09 (20 Hz) and TF-Luna (50 Hz) on the fake bus like
+main.py (simulated sensor feed). The main loop calculates the feedback value
+of the latest samples:
+1. as fast as possible (while 1 without sleep)
+2. at LOOP_RATE (loop_scheduler.LoopScheduler)
+3. event-driven, woken by new samples (wakeup.Wakeup)
+for a static scene and for an obstacle moving between 50 and 150 cm.
+Reported are wakeups of the main loop per second, cpu load of the main loop
+thread and the worst-case age of the samples used for the feedback.
+Start with: python3 bench_wakeup.py
+"""
+
+
+#################### import section ####################
+
+import math
+import threading
+import time
+
+import fake_bus
+import bus_scheduler
+import data_procession
+import i2c_bus
+import loop_scheduler
+import sensors
+import wakeup
+
+
+#################### variables section ####################
+
+DURATION = 3   # duration of run per case [s]
+LOOP_RATE = 50   # iterations per second of the scheduled loop
+SENSOR_DEADLINE = 0.01
+MOVE_PERIOD = 2.0   # period of the moving obstacle 50 -> 150 -> 50 cm [s]
+
+
+#################### Function section ####################
+
+def run(mode, moving):
+    """ main loop for DURATION, return wakeups/s, cpu load and worst-case sample age [s] """
+    scheduler = bus_scheduler.BusScheduler()
+    devices = {0x10: fake_bus.FakeTfLuna(distance=100), 0x11: fake_bus.FakeURM09(distance=100, conversion=0.03)}
+    sensor_bus = i2c_bus.I2CBus(1, fake_bus.fake_bus_class(devices))
+    sensor_1 = sensors.URM09(bus=sensor_bus)
+    sensor_2 = sensors.TfLuna(bus=sensor_bus)
+
+    def collect():
+        sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    def trigger():
+        if sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE) == sensors.STA_OK:
+            scheduler.submit("ultrasonic", collect, priority=bus_scheduler.PRIO_SENSOR,
+                             t_due=time.monotonic() + sensor_1.CONVERSION_TIME)
+
+    def poll():
+        sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+
+    running = [True]
+
+    def move():
+        """ obstacle moves in front of both sensors """
+        t_start = time.monotonic()
+        while running[0]:
+            distance = int(100 - 50 * math.cos(2 * math.pi * (time.monotonic() - t_start) / MOVE_PERIOD))
+            for device in devices.values():
+                device.distance = distance
+            time.sleep(0.005)
+
+    events = wakeup.Wakeup()
+    events.subscribe()
+    data = data_procession.DataProcession()
+    loop = loop_scheduler.LoopScheduler(LOOP_RATE)
+    mover = threading.Thread(target=move, daemon=True)
+    scheduler.start()
+    scheduler.add_periodic("ultrasonic", trigger, 0.05, 0.005)
+    scheduler.add_periodic("lidar", poll, 0.02, 0.0)
+    if moving:
+        mover.start()
+    time.sleep(0.2)   # first samples
+
+    data.age_max = 0.0
+    loops = 0
+    t_start = time.monotonic()
+    cpu_start = time.thread_time()
+    loop.start()
+    while time.monotonic() - t_start < DURATION:
+        data.getFeedback(sensor_1.sample, sensor_2.sample)
+        loops = loops + 1
+        if mode == "scheduled":
+            loop.wait()
+        elif mode == "event-driven":
+            events.wait(data.MAX_AGE)
+    duration = time.monotonic() - t_start
+    cpu_load = (time.thread_time() - cpu_start) / duration
+
+    running[0] = False
+    events.unsubscribe()
+    scheduler.stop()
+    scheduler.join()
+    return loops / duration, cpu_load, data.age_max
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    print(f"URM09 20 Hz, TF-Luna 50 Hz, {DURATION} s per case, deadband {wakeup.DEADBAND} mm")
+    print(f"{'main loop':<16}{'scene':<10}{'wakeups/s':>12}{'cpu':>9}{'sample age max':>17}")
+    for moving in (False, True):
+        for mode in ("while 1", "scheduled", "event-driven"):
+            wakeup_rate, cpu_load, age_max = run(mode, moving)
+            print(f"{mode:<16}{'moving' if moving else 'static':<10}{wakeup_rate:>12.1f}"
+                  f"{100 * cpu_load:>7.1f} %{age_max * 1000:>14.1f} ms")
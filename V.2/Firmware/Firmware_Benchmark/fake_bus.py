@@ -0,0 +1,99 @@
+"""V1.0
+Fake i2c-bus and sensor devices for benchmarks of Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The device models are the ones of the simulated hal backend (hal_sim):
+FakeSMBus has the same interface as smbus.SMBus. Opening the bus opens a real
+file descriptor (os.devnull), so the cost of open/close per sample is measured
+like on the Raspberry Pi. Devices are simple register maps.
+FakeI2C has the same interface as busio.I2C, including a TCA9548A multiplexer.
+FakeGPIO has the input and edge callback interface of RPi.GPIO.
+PtySerial has the interface of serial.Serial on a pty, reads are os-level.
+Importing fake_bus selects Backend as hal backend, so drivers without delivered
+bus objects (DRV2605 of Actuator, uart of Me007ys) never import RPi.GPIO,
+smbus, busio, serial or adafruit_drv2605: all benchmarks run on a Linux machine.
+"""
+
+
+#################### import section ####################
+
+import fcntl
+import os
+import select
+import struct
+import sys
+import termios
+import time
+import tty
+
+
+# make modules of Firmware_Hauptfunktion importable for all benchmarks
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Firmware_Hauptfunktion")
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+# device models of the simulated hal backend
+from hal_sim import FakeDevice, FakeTfLuna, FakeURM09, FakeDRV2605, FakeSMBus, FakeI2C, FakeGPIO, FakeSerial
+import hal
+import hal_sim
+
+
+def fake_bus_class(devices, latency=0.0):
+    """ return a bus class for i2c_bus.I2CBus, all bus objects share the same devices """
+    return lambda port: FakeSMBus(port, devices, latency)
+
+
+class PtySerial:
+    """ serial.Serial-like uart on a pty (e.g. slave side of os.openpty()), without pyserial """
+
+    def __init__(self, port, baudrate=9600, timeout=None):
+        self.port = port
+        self.baudrate = baudrate   # not used by a pty
+        self.timeout = timeout   # maximum duration of read() [s], None -> wait for size bytes
+        self.fd = None   # file descriptor of the open port
+        self.open()
+
+    def isOpen(self):
+        return self.fd is not None
+
+    def open(self):
+        """ open the port in raw mode, received bytes are discarded like by serial.Serial """
+        self.fd = os.open(self.port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(self.fd)
+        self.reset_input_buffer()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    @property
+    def in_waiting(self):
+        return struct.unpack("I", fcntl.ioctl(self.fd, termios.FIONREAD, b"\0\0\0\0"))[0]
+
+    def reset_input_buffer(self):
+        termios.tcflush(self.fd, termios.TCIFLUSH)
+
+    def read(self, size=1):
+        """ up to size bytes, returns earlier if timeout is over """
+        data = bytearray()
+        t_end = None if self.timeout is None else time.monotonic() + self.timeout
+        while len(data) < size:
+            wait = None if t_end is None else max(0.0, t_end - time.monotonic())
+            if not select.select([self.fd], [], [], wait)[0]:
+                break
+            data += os.read(self.fd, size - len(data))
+        return bytes(data)
+
+
+class Backend(hal_sim.Simulated):
+    """ hal backend of the benchmarks: in-memory devices of hal_sim, uart on a pty (PtySerial) """
+
+    def __init__(self):
+        hal_sim.Simulated.__init__(self, latency=0.0)   # benchmarks deliver own buses with their latency
+
+    def uart(self, port, baudrate, timeout=None):
+        return PtySerial(port, baudrate, timeout)
+
+
+hal.select(Backend())
@@ -0,0 +1,149 @@
+"""V1.0
+Module for sensor acquisition in an own process used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The process polls URM09 (20 Hz, split-phase) and TF-Luna (50 Hz) with its own
+bus scheduler, like main.py, and publishes every sample into a shm_ring.SampleRing
+per sensor. The sampling cadence does not share the GIL with the main loop and
+the actuators anymore. The control process reads the samples through
+shm_ring.RingSensor (sample attribute like the sensors). SamplingJitter records
+the deviation of the capture interval from the polling period in both modes.
+The process is started with fork before any thread of the control process.
+"""
+
+
+#################### import section ####################
+
+import multiprocessing
+import signal
+import time
+
+import bus_scheduler
+import histogram
+import i2c_bus
+import rt_profile
+import sample
+import sensors
+import shm_ring
+
+
+#################### variables section ####################
+
+ULTRASONIC_PERIOD = 0.05   # 20 Hz cycle of URM09 (main.ultrasonicPoll)
+ULTRASONIC_OFFSET = 0.005   # time slot between two lidar polls
+LIDAR_PERIOD = 0.02   # 50 Hz cycle of TF-Luna (main.lidarPoll)
+SENSOR_DEADLINE = 0.01   # maximum bus time of one sensor read [s]
+STOP_TIMEOUT = 2.0   # maximum time for the report of the process at stop [s]
+READY_TIMEOUT = 2.0   # maximum time for the first sample of every sensor after start [s]
+READY_POLL = 0.005   # interval of checking the rings while waiting for the first samples [s]
+
+
+class SamplingJitter:
+    """ histograms of |capture interval - polling period| per sensor (listener of sample.publish) """
+
+    PERIOD = {"URM09": ULTRASONIC_PERIOD, "TfLuna": LIDAR_PERIOD}
+
+    def __init__(self):
+        self.histograms = {name: histogram.Histogram(f"{name} sampling jitter") for name in self.PERIOD}
+
+    def on_sample(self, sensor, old, new):
+        name = type(sensor).__name__
+        if name not in self.histograms or old.seq == 0 or old.status != sample.STA_OK \
+                or new.status != sample.STA_OK:
+            return
+        self.histograms[name].record(abs(new.t_capture - old.t_capture - self.PERIOD[name]))
+
+    def lines(self, bars=True):
+        """ summary (and bins) of the histograms as text lines """
+        lines = []
+        for h in self.histograms.values():
+            lines.append(h.summary())
+            if bars:
+                lines.extend(h.lines())
+        return lines
+
+
+class AcquisitionProcess(multiprocessing.Process):
+    """ sensor polling in an own process, samples in shared memory """
+
+    def __init__(self, bus_class=None, port=1, continuous=False, frame_rate=100):
+        multiprocessing.Process.__init__(self, name="acquisition", daemon=True)
+        self.bus_class = bus_class   # bus class of i2c_bus.I2CBus (e.g. i2c_rdwr.I2CRdwr), None -> smbus of the hal backend
+        self.port = port
+        self.continuous = continuous   # TF-Luna free-runs at frame_rate
+        self.frame_rate = frame_rate
+        self.rings = [shm_ring.SampleRing(), shm_ring.SampleRing()]   # URM09, TF-Luna
+        self.sensor_1 = shm_ring.RingSensor(self.rings[0], "URM09")   # readers of the control process
+        self.sensor_2 = shm_ring.RingSensor(self.rings[1], "TfLuna")
+        self.stopped = multiprocessing.Event()
+        self.conn, self.child_conn = multiprocessing.Pipe()   # report of the process at stop
+        self.jitter = None   # SamplingJitter of the process, received at stop
+        self.latency_lines = []   # worst-case read latency of the sensors, received at stop
+
+
+    #################### Function Section ####################
+
+    def publish(self, sensor, old, new):
+        """ listener of sample.publish in the process: write sample into the ring of the sensor """
+        ring = self.rings[0] if isinstance(sensor, sensors.URM09) else self.rings[1]
+        ring.write(new.value, new.t_capture, new.seq, new.strength, new.status)
+
+    def run(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl-C stops the control process, it ends this one by stop()
+        rt_profile.latency.clear()   # wakeup latency of the threads of this process only
+        if rt_profile.active is not None:   # memory locks are not inherited by fork
+            rt_profile.active.setup_process()
+        scheduler = bus_scheduler.BusScheduler()
+        sensor_bus = i2c_bus.I2CBus(self.port, self.bus_class)
+        jitter = SamplingJitter()
+        sample.listeners[:] = [self.publish, jitter.on_sample]   # listeners of the parent are not used here
+
+        scheduler.start()
+        sensor_1 = scheduler.call("ultrasonic", sensors.URM09, bus=sensor_bus, priority=bus_scheduler.PRIO_SENSOR)
+        sensor_2 = scheduler.call("lidar", sensors.TfLuna, bus=sensor_bus, continuous=self.continuous,
+                                  frame_rate=self.frame_rate, priority=bus_scheduler.PRIO_SENSOR)
+
+        def collect():
+            sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE)
+
+        def trigger():
+            if sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE) == sensors.STA_OK:
+                scheduler.submit("ultrasonic", collect, priority=bus_scheduler.PRIO_SENSOR,
+                                 t_due=time.monotonic() + sensor_1.CONVERSION_TIME)
+
+        def poll():
+            sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+
+        scheduler.add_periodic("ultrasonic", trigger, ULTRASONIC_PERIOD, ULTRASONIC_OFFSET)
+        scheduler.add_periodic("lidar", poll, LIDAR_PERIOD)
+        self.stopped.wait()
+
+        scheduler.stop()
+        scheduler.join()
+        sensor_bus.close()
+        latency_lines = [f"{type(sensor).__name__}: worst-case read latency {sensor.latency_max * 1000:.2f} ms, "
+                         f"{sensor.timeouts} missed deadline(s)" for sensor in (sensor_1, sensor_2)]
+        latency_lines.extend(f"acquisition process: {line}" for line in rt_profile.report())
+        self.child_conn.send((jitter, latency_lines))
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        """ wait for the first sample of every sensor (before, RingSensor returns the \
+            "never measured" Sample), returns False after timeout or if the process ended
+            """
+        t_end = time.monotonic() + timeout
+        while any(ring.written() == 0 for ring in self.rings):
+            if time.monotonic() > t_end or not self.is_alive():
+                return False
+            time.sleep(READY_POLL)
+        return True
+
+    def stop(self):
+        """ stop the process, receive its report and remove the shared memory """
+        self.stopped.set()
+        if self.conn.poll(STOP_TIMEOUT):
+            self.jitter, self.latency_lines = self.conn.recv()
+        self.join(STOP_TIMEOUT)
+        if self.is_alive():
+            self.terminate()
+        for ring in self.rings:
+            ring.close()
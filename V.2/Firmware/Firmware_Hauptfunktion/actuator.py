@@ -8,13 +8,17 @@ on 25.08.2023
 
 # #################### Import section ####################
 
+import threading
 import time
 
-import board
-import busio
-
-import adafruit_drv2605
-import adafruit_tca9548a
+import hal
+from register_shadow import RegisterShadow, CALIBRATION
+from pattern_engine import PatternEngine
+import pulse_sequence
+import calibration_cache
+import mux
+from rtp_stream import RtpStream
+from stage_classifier import StageClassifier
 
 
 # #################### Variables ####################
@@ -33,18 +37,53 @@ class Actuator:
 
     #################### Class-specific Variables ####################
 
-    def __init__(self, act_no):
+    FEEDBACK_TIME = 2.0   # duration of haptic feedback of buttons [s]
+    CAL_TIMEOUT = 2.0   # maximum duration of one auto-calibration [s] (AUTO_CAL_TIME 3: 1000...1200 ms)
+    CAL_ATTEMPTS = 10   # number of auto-calibration attempts per actuator
+    CAL_POLL = 0.02   # interval of GO bit polling [s]
+    DRV_ADDR = 0x5A   # I2C-address of all DRV2605L (one per TCA9548A channel)
+    COMMIT_REGISTER = {"mode": 0x01, "rtp": 0x02}   # registers of mode and rtp-value (commit_all)
+    REG_GO = 0x0C   # GO bit: start of sequence
+
+    def __init__(self, act_no, i2c=None, shadow=True, verify_every=0, sequencer=False, broadcast=False,
+                 mux_cache=True, classifier=None, pattern_engine=PatternEngine, trace=None, hardware=None):
 
         self.act_no = act_no   # list of actuators
         self.drv = [None, None]   # list of drv-objects
         self.stage = 0   # return value of get_stage-function
+        # stage of the sensor value with hysteresis and minimum dwell time (stage_classifier)
+        self.classifier = classifier if classifier is not None else StageClassifier()
         self.stage_comp = 100   # aux-variable to determin change of stage-variable (set_actuator)
         self.state_comp = 100   # aux-variable to determin change of state-variable (set_freq_state)
         self.mute = 1   # value of mute selection. 1 = umute, 0 = mute
+        self.use_shadow = shadow   # True -> register access through register_shadow.RegisterShadow
+        self.verify_every = verify_every   # compare shadow and device every n writes, 0 = off
+        self.shadow = [None, None]   # list of register shadows of drv-objects
+        self.use_sequencer = sequencer   # True -> pulses of stage 1-4 timed by waveform sequencer of drv
+        self.committed = [{}, {}]   # last written mode, sequence and rtp-value per drv, missing = unknown
+        self.writes = 0   # number of register writes of commit (statistics)
+        self.lock = threading.RLock()   # protects committed and writes (write_rtp is called by the rtp stream)
+        self.hold_until = 0.0   # set_actuator is paused until this time (play_feedback)
+        self.calibration_time = 0.0   # duration of last auto-calibration [s]
+        self.broadcast = None   # mux.BroadcastChannel -> equal writes to all DRVs in one transfer
+        self.stream = None   # rtp_stream.RtpStream of continuous mode, None if not active
+        self.trace = trace   # latency_trace.LatencyTrace -> trace points stage and commit (also of the rtp stream), None = off
+        self.hardware = hardware if hardware is not None else hal.backend()   # hal backend (i2c, DRV2605 driver)
 
     # Initialize I2C bus and TCA9548A Multiplexer-module.
-        self.i2c = busio.I2C(board.SCL, board.SDA)
-        self.tca = adafruit_tca9548a.TCA9548A(self.i2c)
+        # i2c can be delivered (e.g. bus_scheduler.ScheduledI2C), else the i2c-bus of the hal backend is used directly
+        if i2c is None:
+            i2c = self.hardware.i2c(1)
+        self.i2c = i2c
+        # mux_cache: channel select only if the channel changes (False: select + deselect per access)
+        self.tca = mux.MuxManager(self.i2c, cache=mux_cache)
+        if broadcast:   # all channels of act_no enabled together, reads per channel (self.drv)
+            self.broadcast = self.tca.broadcast([self.act_no[k] for k in self.act_no])
+
+        # pulse trains of interval vibration are played by a thread, see start_vib_intv \
+            # (pattern_engine: class with the interface of PatternEngine, e.g. async_runtime.AsyncPatternEngine)
+        self.pattern = pattern_engine(self.play_all)
+        self.pattern.start()
 
 
     #################### Function Section ####################
@@ -55,23 +94,80 @@ class Actuator:
         """ create class of drv2605 and set to LRA-mode """
 
         for k in self.act_no:
-            self.drv[k] = adafruit_drv2605.DRV2605(self.tca[self.act_no[k]])
+            self.drv[k] = self.hardware.drv2605(self.tca[self.act_no[k]])
+            self.committed[k] = {}   # state of new drv-object is unknown
+            if self.use_shadow:
+                self.shadow[k] = RegisterShadow(self.drv[k], self.verify_every)
             self.drv[k].use_LRM()
 
 
-    def autocalibration(self, act_type):
-        """Auto-Calibration for all actuators (depending on act_no) 
+    def set_bits(self, i, register, mask, value):
+        """ set the bits of mask in register of actuator i to value \
+            (one write with shadow, read + write without)
+            """
+        self.drv[i]._write_u8(register, (self.drv[i]._read_u8(register) & ~mask & 0xFF) | value)
+
+
+    def set_bits_all(self, register, mask, value):
+        """set the bits of mask in register of all actuators (depending on act_no) to value, \
+            one broadcast write if the register of all actuators gets the same value
+            """
+        if self.broadcast is not None:
+            values = {(self.drv[i]._read_u8(register) & ~mask & 0xFF) | value for i in self.act_no}
+            if len(values) == 1:
+                self.write_all(register, list(values))
+                return
+        for i in self.act_no:
+            self.set_bits(i, register, mask, value)
+
+
+    def write_all(self, register, values):
+        """write values to all actuators (depending on act_no) from register on, \
+            one broadcast transfer if enabled, else one transfer per actuator.
+            Skipped if the register shadows already have these values
+            """
+        actuators = list(dict.fromkeys(self.act_no))
+        if all(self.shadow[i] is not None and self.shadow[i].holds(register, values) for i in actuators):
+            return
+        if self.broadcast is None:
+            for i in actuators:
+                self.write_burst(i, register, values)
+            return
+        self.broadcast.write_registers(self.DRV_ADDR, register, values)
+        for i in actuators:
+            if self.shadow[i] is not None:
+                self.shadow[i].written(register, values)
+
+
+    def verify_shadow(self):
+        """ compare register shadows with devices, return differences per actuator """
+        differences = {}
+        for i in self.act_no:
+            if self.shadow[i] is not None:
+                differences[i] = self.shadow[i].verify()
+        return differences
+
+
+    def autocalibration(self, act_type, actuators=None):
+        """Auto-Calibration for all actuators (depending on act_no, or actuators) at the same time: \
+        the GO bit of every DRV is set, then the GO bits are polled until every \
+        calibration is finished (CAL_TIMEOUT per attempt). Returns actuator -> True if calibrated
         Source: TI Documentation SLOS854D 7.5.6 (p.27) 
         -> every reference in this function is related to this document
         """
 
-        for j in self.act_no:
+        t_start = time.monotonic()
+        attempts = {}   # actuator -> number of calibration attempts
+        t_go = {}   # actuator -> time of GO bit set
+        result = {}   # actuator -> True if calibrated
+
+        if actuators is None:
+            actuators = self.act_no
+
+        for j in dict.fromkeys(actuators):   # every actuator once
             # I2C Standard-address of TCA9548a = 0x70
             # I2C Standard-address of DRV2605 = 0x5a
 
-            # Initialize variables
-            cal_error = 0 # number of missed calibration cycles
-
             # set parameter-set for Exciters type EXS 2608L-03A or EXS 241408W B (Grewus GmbH)
 
             if act_type[j] == 2608:  # technical data for EXS 2608L-03A
@@ -86,109 +182,199 @@ class Actuator:
                 time_drive = 0b00010111 # = 23 -> calc with Table 24 (8.6.21) (5 bits)
 
             else:
-                print("unknown Actuator number. Auto-calibration aborted")
-                act_type = 0
+                print(f"unknown Actuator number. Auto-calibration of actuator {j} aborted")
+                result[j] = False
+                continue
+
+            # 1. Apply the supply voltage to the DRV2605 device, and pull the EN pin high \
+                # -> should be done at this point :)
+
+            # 2. Write a value of 0x07 to register 0x01. This value moves the DRV2605 \
+                # device out of STANDBY and places the MODE[2:0] bits in auto-calibration mode.
+            self.drv[j]._write_u8(0x01, 0x07)
+            self.committed[j] = {}   # mode is not known to commit anymore
+            # print("Value of 0x01 (should be 7) = ", drv._read_u8(0x01))
+
+            # 3. Populate the input parameters required by the auto-calibration engine
+
+            # a. set N_ERM_LRA to 1 -> LRA
+            self.set_bits(j, 0x1A, 0b10000000, 0b10000000)
+            # print("Value of 0x1A[7] (should be 128) = ", drv._read_u8(0x1A) & 0b10000000)
+
+            # b. set FB_BRAKE_FACTOR to 2 -> recommendation TI
+            self.set_bits(j, 0x1A, 0b01110000, 0b00100000)
+            # print("Value of 0x1A[6:4] (should be 32) = ", drv._read_u8(0x1A) & 0b01110000)
+
+            # c. set LOOP_GAIN to 2 -> recommendation TI
+            self.set_bits(j, 0x1A, 0b00001100, 0b00001000)
+            # print("Value of 0x1A[3:2] (should be 8) = ", drv._read_u8(0x1A) & 0b00001100)
+
+            # d. set RATED_VOLTAGE to calculated value
+            self.drv[j]._write_u8(0x16, val_rated)
+            # print("Value of 0x16 (should be 87 or 117) = ", drv._read_u8(0x16))
+
+            # e. set OD_CLAMP to calculated value
+            self.drv[j]._write_u8(0x17, val_clamp)
+            # print("Value of 0x17 (should be 96 or 137) = ", drv._read_u8(0x17))
+
+            # f. set AUTO_CAL_TIME to 3 -> recommendation TI
+            self.set_bits(j, 0x1E, 0b00110000, 0b00110000)
+            # print("Value of 0x1E[5:4] (should be 48) = ", drv._read_u8(0x1E) & 0b00110000)
+
+            # g. set DRIVE_TIME to calculatec value
+            self.set_bits(j, 0x1B, 0b00011111, time_drive)
+            # print("Value of 0x1B (should be 14) = ", drv._read_u8(0x1B) & 0b00011111)
+
+            # h. set SAMPLE_TIME to 3 -> recommendation TI
+            self.set_bits(j, 0x1C, 0b00110000, 0b00110000)
+            # print("Value of 0x1C[5:4] (should be 48) = ", drv._read_u8(0x1C) & 0b00110000)
+
+            # i. set BLANKING_TIME to 1 -> recommendation TI
+            self.set_bits(j, 0x1C, 0b00001100, 0b00000100)
+            # print("Value of 0x1C[3:2] (should be 4) = ", drv._read_u8(0x1C) & 0b00001100)
+
+            # j. set IDISS_TIME to 1 -> recommendation TI
+            self.set_bits(j, 0x1C, 0b00000011, 0b00000001)
+            # print("Value of 0x1C[1:0] (should be 1) = ", drv._read_u8(0x1C) & 0b00000011)
+
+            # k. set ZC_DET_TIME[1:0] to 0 -> recommendation TI
+            self.set_bits(j, 0x1E, 0b11000000, 0b00000000)
+            # print("Value of 0x1E[1:0] (should be 0) = ", drv._read_u8(0x1E) & 0b11000000)
+
+            # 4. Set the GO bit (write 0x01 to register 0x0C) to start \
+                # the auto-calibration process. All DRVs are calibrating at the same time.
+            self.drv[j]._write_u8(0x0C, 0x01)
+            t_go[j] = time.monotonic()
+            attempts[j] = 1
+            # print("Calibration started, value of 0x0C (should be 1) = ", drv._read_u8(0x0C))
+
+        # 5. Wait for the GO bit (register 0x0C) to clear, then check the status of the \
+            # DIAG_RESULT bit (in register 0x00) to ensure that the auto-calibration routine \
+            # is complete without faults. DRVs are polled one after another (TCA9548A channels).
+        while t_go:
+            time.sleep(self.CAL_POLL)
+            for j in list(t_go):
+                if self.drv[j]._read_u8(0x0C) & 0x01:   # calibration is running
+                    if time.monotonic() - t_go[j] < self.CAL_TIMEOUT:
+                        continue
+                    self.drv[j]._write_u8(0x0C, 0x00)   # abort calibration
+                    failed = True
+                    print(f"Calibration of actuator {j}: timeout")
+                else:
+                    failed = self.drv[j]._read_u8(0x00) & 0b00001000 != 0x00
+
+                if not failed:
+                    if self.shadow[j] is not None:   # results of auto-calibration
+                        self.shadow[j].reload(*CALIBRATION)
+
+                    # Calculate and print resonant frequency
+                    act_period = self.drv[j]._read_u8(0x22) # get value of LRA_PERIOD
+                    res_freq = 1 / (act_period * (98.46 * pow(10, -6))) # calc \
+                        # resonance frequency [hz]
+                    print(f"Calibration of actuator {j} successful. \
+                            Resonance freq: {res_freq} Hz, \
+                            Drive time: {self.drv[j]._read_u8(0x1B) & 0b00011111}"
+                            )
+                    result[j] = True
+                    del t_go[j]
 
-            while act_type != 0:
+                elif attempts[j] >= self.CAL_ATTEMPTS:
+                    print(f"Calibration of actuator {j} NOT successful, breakup after {attempts[j]} times")
+                    result[j] = False
+                    del t_go[j]
 
-                # 1. Apply the supply voltage to the DRV2605 device, and pull the EN pin high \
-                    # -> should be done at this point :)
+                else:   # start next attempt
+                    self.drv[j]._write_u8(0x0C, 0x01)
+                    t_go[j] = time.monotonic()
+                    attempts[j] = attempts[j] + 1
 
-                # 2. Write a value of 0x07 to register 0x01. This value moves the DRV2605 \
-                    # device out of STANDBY and places the MODE[2:0] bits in auto-calibration mode.
-                self.drv[j]._write_u8(0x01, 0x07)
-                # print("Value of 0x01 (should be 7) = ", drv._read_u8(0x01))
+        self.calibration_time = time.monotonic() - t_start
+        print(f"Auto-calibration of actuator(s) {list(result)} finished after {self.calibration_time:.2f} s")
+        return result
 
-                # 3. Populate the input parameters required by the auto-calibration engine
 
-                # a. set N_ERM_LRA to 1 -> LRA
-                self.drv[j]._write_u8(0x1A, self.drv[j]._read_u8(0x1A) | 0b10000000)
-                # print("Value of 0x1A[7] (should be 128) = ", drv._read_u8(0x1A) & 0b10000000)
+    def read_burst(self, i, register, length):
+        """read length registers of actuator i from register on with one transfer"""
 
-                # b. set FB_BRAKE_FACTOR to 2 -> recommendation TI
-                self.drv[j]._write_u8(0x1A, self.drv[j]._read_u8(0x1A) & 0b10001111)  # clear bits
-                self.drv[j]._write_u8(0x1A, self.drv[j]._read_u8(0x1A) | 0b00100000)
-                # print("Value of 0x1A[6:4] (should be 32) = ", drv._read_u8(0x1A) & 0b01110000)
+        buffer = bytearray(length)
+        with self.drv[i]._device as i2c:
+            i2c.write_then_readinto(bytes([register]), buffer)
+        return list(buffer)
 
-                # c. set LOOP_GAIN to 2 -> recommendation TI
-                self.drv[j]._write_u8(0x1A, self.drv[j]._read_u8(0x1A) & 0b11110011)  # clear bits
-                self.drv[j]._write_u8(0x1A, self.drv[j]._read_u8(0x1A) | 0b00001000)
-                # print("Value of 0x1A[3:2] (should be 8) = ", drv._read_u8(0x1A) & 0b00001100)
 
-                # d. set RATED_VOLTAGE to calculated value
-                self.drv[j]._write_u8(0x16, val_rated)
-                # print("Value of 0x16 (should be 87 or 117) = ", drv._read_u8(0x16))
+    def write_burst(self, i, register, values):
+        """write values to actuator i from register on with one transfer"""
 
-                # e. set OD_CLAMP to calculated value
-                self.drv[j]._write_u8(0x17, val_clamp)
-                # print("Value of 0x17 (should be 96 or 137) = ", drv._read_u8(0x17))
+        with self.drv[i]._device as i2c:
+            i2c.write(bytes([register] + list(values)))
+        if self.shadow[i] is not None:
+            self.shadow[i].written(register, values)
 
-                # f. set AUTO_CAL_TIME to 3 -> recommendation TI
-                self.drv[j]._write_u8(0x1E, self.drv[j]._read_u8(0x1E) & 0b11001111)  # clear bits
-                self.drv[j]._write_u8(0x1E, self.drv[j]._read_u8(0x1E) | 0b00110000)
-                # print("Value of 0x1E[5:4] (should be 48) = ", drv._read_u8(0x1E) & 0b00110000)
 
-                # g. set DRIVE_TIME to calculatec value
-                self.drv[j]._write_u8(0x1B, self.drv[j]._read_u8(0x1B) & 0b11100000)  # clear bits
-                self.drv[j]._write_u8(0x1B, self.drv[j]._read_u8(0x1B) | time_drive)
-                # print("Value of 0x1B (should be 14) = ", drv._read_u8(0x1B) & 0b00011111)
+    def read_calibration(self, i):
+        """return calibration registers of actuator i as entry of calibration_cache"""
 
-                # h. set SAMPLE_TIME to 3 -> recommendation TI
-                self.drv[j]._write_u8(0x1C, self.drv[j]._read_u8(0x1C) & 0b11001111)  # clear bits
-                self.drv[j]._write_u8(0x1C, self.drv[j]._read_u8(0x1C) | 0b00110000)
-                # print("Value of 0x1C[5:4] (should be 48) = ", drv._read_u8(0x1C) & 0b00110000)
+        registers = self.read_burst(i, calibration_cache.REG_FIRST,
+                                    calibration_cache.REG_LAST - calibration_cache.REG_FIRST + 1)
+        return calibration_cache.create_entry(registers, self.drv[i]._read_u8(calibration_cache.REG_LRA_PERIOD))
 
-                # i. set BLANKING_TIME to 1 -> recommendation TI
-                self.drv[j]._write_u8(0x1C, self.drv[j]._read_u8(0x1C) & 0b11110011)  # clear bits
-                self.drv[j]._write_u8(0x1C, self.drv[j]._read_u8(0x1C) | 0b00000100)
-                # print("Value of 0x1C[3:2] (should be 4) = ", drv._read_u8(0x1C) & 0b00001100)
 
-                # j. set IDISS_TIME to 1 -> recommendation TI
-                self.drv[j]._write_u8(0x1C, self.drv[j]._read_u8(0x1C) & 0b11111100)  # clear bits
-                self.drv[j]._write_u8(0x1C, self.drv[j]._read_u8(0x1C) | 0b00000001)
-                # print("Value of 0x1C[1:0] (should be 1) = ", drv._read_u8(0x1C) & 0b00000011)
+    def restore_calibration(self, i, entry):
+        """write calibration registers of a cache entry to actuator i with one burst, \
+            returns True if entry is valid and the registers are read back unchanged
+            """
 
-                # k. set ZC_DET_TIME[1:0] to 0 -> recommendation TI
-                self.drv[j]._write_u8(0x1E, self.drv[j]._read_u8(0x1E) & 0b00111111)  # clear bits
-                # print("Value of 0x1E[1:0] (should be 0) = ", drv._read_u8(0x1E) & 0b11000000)
+        if not calibration_cache.valid(entry):
+            return False
+        registers = entry["registers"]
+        self.write_burst(i, calibration_cache.REG_FIRST, registers)
+        return self.read_burst(i, calibration_cache.REG_FIRST, len(registers)) == registers
 
-                # 4. Set the GO bit (write 0x01 to register 0x0C) to start \
-                    # the auto-calibration process.
-                self.drv[j]._write_u8(0x0C, 0x01)
-                # print("Calibration started, value of 0x0C (should be 1) = ", drv._read_u8(0x0C))
 
-                # 5. Check the status of the DIAG_RESULT bit (in register 0x00) \
-                    #  to ensure that the auto-calibration routine is complete without faults.
-                if self.drv[j]._read_u8(0x00) & 0b00001000 == 0x00:
+    def calibrate(self, act_type, cache_file=calibration_cache.CACHE_FILE):
+        """restore calibration of all actuators (depending on act_no) from the calibration cache, \
+            auto-calibration only for actuators without valid cache entry, their results are
+            stored in the cache. Returns actuator -> True if calibrated
+            """
 
-                    # Calculate and print resonant frequency
-                    act_period = self.drv[j]._read_u8(0x22) # get value of LRA_PERIOD
-                    res_freq = 1 / (act_period * (98.46 * pow(10, -6))) # calc \
-                        # resonance frequency [hz]
-                    print(f"Calibration of actuator {j} successful. \
-                            Resonance freq: {res_freq} Hz, \
-                            Drive time: {self.drv[j]._read_u8(0x1B) & 0b00011111}"
-                            )
+        t_start = time.monotonic()
+        entries = calibration_cache.load(cache_file)
+        result = {}
+        missing = []
+        for j in dict.fromkeys(self.act_no):
+            key = calibration_cache.key(self.act_no[j], act_type[j])
+            if key in entries and self.restore_calibration(j, entries[key]):
+                print(f"Calibration of actuator {j} restored from cache "
+                      f"(resonance freq: {calibration_cache.res_freq(entries[key]['lra_period']):.1f} Hz)")
+                result[j] = True
+            else:
+                missing.append(j)
 
-                    break # end while-loop if successfully calibrated
+        if missing:
+            result.update(self.autocalibration(act_type, missing))
+            for j in missing:
+                if result[j]:
+                    entries[calibration_cache.key(self.act_no[j], act_type[j])] = self.read_calibration(j)
+            try:
+                calibration_cache.save(entries, cache_file)
+            except OSError as e:
+                print(f"calibration cache not saved: {e}")
 
-                else:
-                    cal_error = cal_error +1
-                    if cal_error >= 9:
-                        print(f"Calibration of actuator {j} NOT successful, breakup after 10 times")
-                        break
+        self.calibration_time = time.monotonic() - t_start
+        return result
 
 
     def set_drv_open_loop(self):
         """set all actuators to open-loop mode (depending on act_no)"""
 
-        for i in self.act_no:
+        with self.tca.batch():   # writes sent channel by channel
             # set N_ERM_LRA to 1
-            self.drv[i]._write_u8(0x1A, self.drv[i]._read_u8(0x1A) | 0b10000000)
+            self.set_bits_all(0x1A, 0b10000000, 0b10000000)
+            # set LRA_OPEN_LOOP to 1
+            self.set_bits_all(0x1D, 0b00000001, 0b00000001)
+        for i in self.act_no:
             # print(f"Actuator {i}: Value of N_ERM_LRA (0x1A[7]) (128) \
                 # = {self.drv[i]._read_u8(0x1A) & 0b10000000}")
-            # set LRA_OPEN_LOOP to 1
-            self.drv[i]._write_u8(0x1D, self.drv[i]._read_u8(0x1D) | 0b00000001)
             # print(f"Actuator {i}: Value of LRA_OPEN_LOOP (0x1D[0]) (1) \
                   # = {self.drv[i]._read_u8(0x1D) & 0b00000001}")
             print(f"Actuator {i} changed to open-loop configuration")
@@ -212,70 +398,181 @@ class Actuator:
     ## Performance Functions ##
 
     def get_stage(self, sens_val):
-        """calculate Stage of Vibration dependt on sensor value (sens_val)"""
-
-        MIN_VAL = 0   # minimum value of sens_val
-        MAX_VAL = 1000   # maximum value of sens_val
-        STEP_0 = 10   # upper limit value of Step 0 --> eliminates minimal meassurement failures
-        STEP_1 = 200   # upper limit value of Step 1
-        STEP_2 = 400   # upper limit value of Step 2
-        STEP_3 = 600   # upper limit value of Step 3
-        STEP_4 = 800   # upper limit value of Step 4
-        stg = 5   # selected stage
-
-        if (MIN_VAL <= sens_val < STEP_0) or self.mute == 0:   # setting stage 0 \
-            # (no detection including elimination of minimal messurements)
+        """calculate Stage of Vibration dependt on sensor value (sens_val) \
+            -> threshold table, hysteresis and minimum dwell time of self.classifier
+            """
+
+        stg = self.classifier.update(sens_val)   # selected stage
+        if self.mute == 0:   # setting stage 0
             stg = 0
-        elif STEP_0 <= sens_val < STEP_1:   # setting stage 1
-            stg = 1
-        elif STEP_1 <= sens_val < STEP_2:   # setting stage 2
-            stg = 2
-        elif STEP_2 <= sens_val < STEP_3:   # setting stage 3
-            stg = 3
-        elif STEP_3 <= sens_val < STEP_4:   # setting stage 4
-            stg = 4
-        elif STEP_4 <= sens_val <= MAX_VAL:   # setting stage 5
-            stg = 5
         return stg
 
 
+    def commit(self, i, key, value):
+        """write mode or rtp-value of actuator i, only if it differs from the last written value"""
+
+        with self.lock:
+            if self.committed[i].get(key) == value:
+                return
+            if key == "mode":
+                self.drv[i].mode = value
+            elif key == "rtp":
+                self.drv[i].realtime_value = value
+            self.committed[i][key] = value
+            self.writes = self.writes + 1
+
+
+    def commit_sequence(self, i, slots):
+        """write slots of waveform sequencer of actuator i up to the terminating 0, \
+            only slots which differ from the last written values
+            """
+
+        with self.lock:
+            committed = list(self.committed[i].get("sequence", [None] * pulse_sequence.SLOTS))
+            for n, value in enumerate(slots):
+                if committed[n] != value:
+                    self.drv[i]._write_u8(pulse_sequence.REG_WAVESEQ1 + n, value)
+                    committed[n] = value
+                    self.writes = self.writes + 1
+                if value == 0:   # end of sequence, following slots are not played
+                    break
+            self.committed[i]["sequence"] = committed
+
+
+    def commit_all(self, key, value):
+        """commit mode or rtp-value to all actuators (depending on act_no), \
+            one broadcast write if enabled
+            """
+
+        with self.lock:
+            if self.broadcast is None:
+                for i in self.act_no:
+                    self.commit(i, key, value)
+                return
+            if all(self.committed[i].get(key) == value for i in self.act_no):
+                return
+            self.write_all(self.COMMIT_REGISTER[key], [value])
+            for i in self.act_no:
+                self.committed[i][key] = value
+            self.writes = self.writes + 1
+
+
+    def commit_sequence_all(self, slots):
+        """commit slots of waveform sequencer to all actuators (depending on act_no), \
+            one broadcast burst from the first to the last changed slot if enabled
+            """
+
+        with self.lock:
+            if self.broadcast is None:
+                for i in self.act_no:
+                    self.commit_sequence(i, slots)
+                return
+            length = slots.index(0) + 1 if 0 in slots else len(slots)   # up to the terminating 0
+            committed = [self.committed[i].get("sequence", [None] * pulse_sequence.SLOTS) for i in self.act_no]
+            changed = [n for n in range(length) if any(c[n] != slots[n] for c in committed)]
+            if changed:
+                self.write_all(pulse_sequence.REG_WAVESEQ1 + changed[0], slots[changed[0]:changed[-1] + 1])
+                self.writes = self.writes + 1
+            for i, c in zip(self.act_no, committed):
+                self.committed[i]["sequence"] = list(slots[:length]) + c[length:]
+
+
     def set_vib_const(self, val):
         """set constant vibration to variable all actuators (depending on act_no) \
             -> val-Range from 0...127
             """
 
-        for i in self.act_no:
+        self.pattern.set_rate(0)   # end interval vibration
+        self.stop_continuous()   # end continuous mode
+
+        if any(self.committed[i].get("mode") != hal.MODE_REALTIME for i in self.act_no):
             # reset value to 0 -> prevention of unintended vibration
-            self.drv[i].realtime_value = 0
+            self.commit_all("rtp", 0)
 
             # set drv-mode to realtime
-            self.drv[i].mode = adafruit_drv2605.MODE_REALTIME
+            self.commit_all("mode", hal.MODE_REALTIME)
 
-        for i in self.act_no:
-            # set intensity to delivered value
-            self.drv[i].realtime_value = val
+        # set intensity to delivered value
+        self.commit_all("rtp", val)
 
 
     def set_vib_intv(self, eff):
         """set interval vibration parameters for all actuators (depending on act_no)"""
 
-        for i in self.act_no:
-            # set delivered effect to sequence 0
-            self.drv[int(i)].sequence[0] = adafruit_drv2605.Effect(eff)
+        # set delivered effect to sequence 0, end of sequence in 1
+        self.commit_sequence_all([eff, 0])
 
-            # set drv-mode to inttrig
-            self.drv[int(i)].mode = adafruit_drv2605.MODE_INTTRIG
+        # set drv-mode to inttrig
+        self.commit_all("mode", hal.MODE_INTTRIG)
 
 
-    def start_vib_intv(self, frq):
-        """start interval vibration with chosen frequency"""
+    def set_vib_sequence(self, frq):
+        """set pulse train with frequence frq to waveform sequencer of all actuators, \
+            returns number of pulses per sequence
+            """
 
+        slots, pulses = pulse_sequence.compile_rhythm(frq)
+        self.commit_sequence_all(slots)
+        self.commit_all("mode", hal.MODE_INTTRIG)
+        return pulses
+
+
+    def play_all(self):
+        """play sequences of all actuators (called by pattern engine), \
+            with broadcast all DRVs start with the same GO write
+            """
+
+        if self.broadcast is not None:
+            self.broadcast.write_registers(self.DRV_ADDR, self.REG_GO, [0x01])
+            return
         for i in self.act_no:
-            # play sequences
             self.drv[i].play()
 
-        # set sleeping time to reciprocal delivered value
-        time.sleep(1/frq)
+
+    def stop_all(self):
+        """stop sequences of all actuators"""
+
+        if self.broadcast is not None:
+            self.broadcast.write_registers(self.DRV_ADDR, self.REG_GO, [0x00])
+            return
+        for i in self.act_no:
+            self.drv[i].stop()
+
+
+    def start_vib_intv(self, frq, restart=False):
+        """start interval vibration with chosen frequency, returns immediately \
+            -> sequences are played by the pattern engine every 1/frq seconds
+            """
+
+        self.pattern.set_rate(frq, restart)
+
+
+    def play_feedback(self, eff, delay=0.0):
+        """play effect eff once on all actuators (haptic feedback of buttons) after delay [s], \
+            returns immediately (delayed GO by the pattern engine). set_actuator is paused until
+            FEEDBACK_TIME after the effect
+            """
+
+        self.pattern.set_rate(0)   # waits for a running pulse of the stage
+        if self.stream is not None:   # no pulses of continuous mode after the feedback
+            self.stream.set_value(0)
+        with self.tca.batch():   # writes sent channel by channel
+            self.set_vib_intv(eff)
+            if delay <= 0:
+                self.play_all()
+        if delay > 0:
+            self.pattern.play_once(delay)
+        self.stage_comp = 100   # state of the stage is written again after the feedback
+        self.hold_until = time.monotonic() + delay + self.FEEDBACK_TIME
+
+
+    def close(self):
+        """stop pattern engine and continuous mode, disable channels of the TCA9548A"""
+
+        self.stop_continuous()
+        self.pattern.stop()
+        self.pattern.join()
+        self.tca.deselect()
 
 
     def set_drv_freq(self, frq):
@@ -287,72 +584,118 @@ class Actuator:
         # range-limitation -> OL_LRA_PERIOD[6:0] -> max. value = 0d63 -> min. frequency = 161,164Hz
         ol_lra_per = min(ol_lra_per, 63)
 
-        for i in self.act_no:   # write value of ol_lra_per to actuators
-            self.drv[i]._write_u8(0x20, self.drv[i]._read_u8(0x20) & 0b10000000)  # clear bits
-            self.drv[i]._write_u8(0x20, self.drv[i]._read_u8(0x20) | ol_lra_per)
+        with self.tca.batch():   # write value of ol_lra_per to actuators
+            self.set_bits_all(0x20, 0b01111111, ol_lra_per)
+        for i in self.act_no:
             print(f"Frequence of actuator {i} changed to {frq} hz at \
                    OL_LRA_PERIOD value {self.drv[i]._read_u8(0x20) & 0b01111111}"
                   )
 
 
     def set_actuator(self, value):
-        """execution function for all actuators (depending on act_no)"""
+        """execution function for all actuators (depending on act_no) \
+            -> DRVs are only written if the stage changes
+            """
 
         FREQU_1 = 3   # frequence in stage 1 in [Hz]
         FREQU_2 = 5   # frequence in stage 2 in [Hz]
         FREQU_3 = 8   # frequence in stage 3 in [Hz]
         FREQU_4 = 13   # frequence in stage 4 in [Hz]
 
-        frequ_d = 0   # frequence delivered to Actuators
+        frequ_d = [0, FREQU_1, FREQU_2, FREQU_3, FREQU_4, 0]   # frequence delivered to Actuators per stage
 
 
+        if time.monotonic() < self.hold_until:   # haptic feedback (play_feedback) is not interrupted
+            return
+
         self.stage = self.get_stage(value)   # get stage in dependence of delivered value
         # print("Sensor value: {} stage value: {}" .format(value, stage))
 
-        # set configuration of vibration pattern to actuators in dependence of stage
-        for i in self.act_no:
-            if self.stage == 0:
-                pass
+        if self.stage == self.stage_comp:   # DRVs are already in the state of this stage
+            return
+        if self.trace is not None:   # trace point: new stage decided
+            self.trace.stage()
 
-            elif self.stage == 1:
-                self.set_vib_intv(1)
-                frequ_d = FREQU_1
-                self.stage_comp = self.stage
+        rate = 0   # pulses (sequences) per second of the pattern engine
+        restart = False
 
-            elif self.stage == 2:
+        # output of vibration-selection to DRVs (simultaniously, therefore separated), \
+            # writes are sent channel by channel at the end of the batch
+        with self.tca.batch():
+            if self.stage == 0:
+                self.pattern.set_rate(0)   # no further pulses after stop
+                self.stop_all()
+                self.set_vib_const(0)
+                print(f"stop vibration of actuator(s) {self.act_no}")
+            elif self.stage < 5 and self.use_sequencer:   # pulses timed by drv, one GO per sequence
+                self.pattern.set_rate(0)
+                self.stop_all()   # running sequence is not mixed with the new one
+                pulses = self.set_vib_sequence(frequ_d[self.stage])
+                rate = frequ_d[self.stage] / pulses
+                restart = True
+                print(f"start Vibration of actuator(s) {self.act_no} at {frequ_d[self.stage]}hz (sequencer)")
+            elif self.stage < 5:
                 self.set_vib_intv(1)
-                frequ_d = FREQU_2
-                self.stage_comp = self.stage
+                rate = frequ_d[self.stage]
+                print(f"start Vibration of actuator(s) {self.act_no} at {frequ_d[self.stage]}hz ")
+            else:
+                self.set_vib_const(127)
+                print(f"start constant vibration of actuator(s) {self.act_no}")
+        if self.trace is not None:   # trace point: writes of the stage are sent (end of batch)
+            self.trace.commit()
 
-            elif self.stage == 3:
-                self.set_vib_intv(1)
-                frequ_d = FREQU_3
-                self.stage_comp = self.stage
+        if rate > 0:   # after the batch: pattern engine plays the written sequences
+            self.start_vib_intv(rate, restart)
+        self.stage_comp = self.stage
 
-            elif self.stage == 4:
-                self.set_vib_intv(1)
-                frequ_d = FREQU_4
-                self.stage_comp = self.stage
 
-            elif self.stage == 5 and self.stage != self.stage_comp:
-                pass
+    def write_rtp(self, val):
+        """write rtp-value to all actuators (called by rtp stream)"""
 
-        # output of vibration-selection to DRVs (simultaniously, therefore separated)
-        if self.stage == 0 and self.stage_comp != 0:
-            for i in self.act_no:
-                self.drv[i].stop()
-                self.set_vib_const(0)
-            self.stage_comp = self.stage
-            print(f"stop vibration of actuator(s) {self.act_no}")
-        elif self.stage < 5 and self.stage != 0:
-            for i in self.act_no:
-                self.start_vib_intv(frequ_d)
-            print(f"start Vibration of actuator(s) {self.act_no} at {frequ_d}hz ")
-        elif self.stage == 5 and self.stage != self.stage_comp:
-            for i in self.act_no:
-                self.set_vib_const(127)
-                print(f"start constant vibration of actuator(s) {self.act_no}")
-                self.stage_comp = self.stage
+        self.commit_all("rtp", val)
+
+
+    def start_continuous(self, lut=None):
+        """start continuous mode: pulse rate and amplitude follow the sensor value \
+            (rtp_stream), the DRVs are in realtime mode
+            """
+
+        if self.stream is not None:
+            return
+        self.pattern.set_rate(0)
+        with self.tca.batch():
+            self.stop_all()
+            self.commit_all("rtp", 0)
+            self.commit_all("mode", hal.MODE_REALTIME)
+        self.stream = RtpStream(self.write_rtp, lut, trace=self.trace)
+        self.stream.level = 0
+        self.stream.start()
+        print(f"continuous vibration of actuator(s) {self.act_no}")
+
+
+    def stop_continuous(self):
+        """stop continuous mode, the DRVs are switched off"""
+
+        if self.stream is None:
+            return
+        self.stream.stop()
+        self.stream.join()
+        self.stream = None
+        self.commit_all("rtp", 0)
+        self.stage_comp = 100   # state of the stage is written again by set_actuator
+
+
+    def set_continuous(self, value):
+        """execution function of continuous mode for all actuators (depending on act_no) \
+            -> returns immediately, the DRVs are written by the rtp stream
+            """
+
+        if time.monotonic() < self.hold_until:   # haptic feedback (play_feedback) is not interrupted
+            return
+        if self.stream is None:
+            self.start_continuous()
+        self.commit_all("mode", hal.MODE_REALTIME)   # after feedback
+        self.stream.set_value(value if self.mute else 0)
 
 
     def set_freq_state(self, state):
@@ -0,0 +1,403 @@
+"""V1.0
+Module for the asyncio runtime of the firmware used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Alternative to the threads of main.py: sensor polling, pattern engine, buttons,
+turning switch, main loop (control) and logging are cooperative tasks of one
+event loop. Blocking i2c transfers are executed by a small executor, with one
+worker it is the single owner of the i2c-bus (like bus_scheduler). GPIO
+callbacks only hand over edges to the event loop, the buttons are interpreted
+by button.Button, its delayed feedback is a single pulse of the pattern engine
+task, so the main loop keeps running meanwhile.
+The gpio module is delivered (RPi.GPIO or a fake), no GPIO access at import.
+"""
+
+
+#################### import section ####################
+
+import asyncio
+import concurrent.futures
+import datetime
+import threading
+import time
+
+import button
+import sample
+import wakeup
+
+
+#################### variables section ####################
+
+I2C_WORKERS = 1   # threads of the i2c executor, 1 -> transfers never overlap
+SENSOR_DEADLINE = 0.01   # maximum bus time of one sensor read [s]
+ULTRASONIC_PERIOD = 0.05   # 20 Hz cycle of URM09 (trigger, collect after conversion)
+ULTRASONIC_OFFSET = 0.005   # time slot between two lidar polls
+LIDAR_PERIOD = 0.02   # 50 Hz cycle of TF-Luna
+BUTTON_FUNCTION = ["distance", "mute"]   # function of button 0 and button 1
+LOG_INTERVAL = 10   # interval of status lines in the log file [s]
+
+
+def read(func):
+    """ execute sensor read func with a deadline of SENSOR_DEADLINE from now (in the i2c executor) """
+    return func(time.monotonic() + SENSOR_DEADLINE)
+
+
+class AsyncPatternEngine:
+    """ plays pulse trains as task of the event loop, interface of pattern_engine.PatternEngine """
+
+    def __init__(self, pulse, runtime):
+        self.pulse = pulse   # function which starts one pulse, executed by the i2c executor
+        self.runtime = runtime
+        self.lock = threading.Lock()   # protects rate and time slots (set_rate is called by the executor)
+        self.changed = None   # asyncio.Event, wakes up the task after set_rate / stop
+        self.task = None
+        self.done = threading.Event()   # task has ended (join)
+        self.rate = 0   # pulse rate [Hz], 0 = no pulses
+        self.t_next = None   # time slot of next pulse (time.monotonic), None if no pulses
+        self.t_last = None   # time slot of last pulse
+        self.single = False   # True -> pending time slot is a single pulse of play_once
+        self.changes = 0   # number of set_rate / play_once calls, a slot taken before a change is not played
+        self.running = True
+        self.pulses = 0   # number of played pulses
+        self.late_max = 0.0   # worst-case delay of a pulse against its time slot [s]
+        self.error = None   # last exception of pulse()
+
+
+    #################### Function Section ####################
+
+    def start(self):
+        """ create the task in the event loop (thread-safe) """
+        self.runtime.loop.call_soon_threadsafe(self._create_task)
+
+    def _create_task(self):
+        self.changed = asyncio.Event()
+        self.task = self.runtime.loop.create_task(self.run())
+
+    def _wake(self):
+        if self.changed is not None:
+            self.changed.set()
+
+    def set_rate(self, rate, restart=False):
+        """ change pulse rate, 0 stops the pulse train (same behaviour as PatternEngine.set_rate) """
+        with self.lock:   # waits for a running pulse (_play)
+            if rate == self.rate and not restart and not self.single:
+                return
+            self.rate = rate
+            self.single = False
+            self.changes = self.changes + 1
+            if rate > 0:
+                now = time.monotonic()
+                if self.t_last is None or restart:
+                    self.t_next = now
+                else:
+                    self.t_next = max(now, self.t_last + 1 / rate)
+            else:
+                self.t_next = None
+        self.runtime.loop.call_soon_threadsafe(self._wake)
+
+    def play_once(self, delay=0.0):
+        """ stop the pulse train and play a single pulse after delay [s] (same as PatternEngine.play_once) """
+        with self.lock:
+            self.rate = 0
+            self.single = True
+            self.changes = self.changes + 1
+            self.t_next = time.monotonic() + delay
+        self.runtime.loop.call_soon_threadsafe(self._wake)
+
+    def stop(self):
+        """ stop task after the running pulse """
+        with self.lock:
+            self.running = False
+        self.runtime.loop.call_soon_threadsafe(self._wake)
+
+    def _play(self, changes):
+        """ pulse of a taken time slot (executor), skipped if the rate was changed meanwhile, \
+            returns True if played
+            """
+        with self.lock:
+            if changes != self.changes or not self.running:
+                return False
+            self.pulse()
+            return True
+
+    def join(self, timeout=None):
+        """ wait for the end of the task (not from the event loop, see AsyncRuntime.shutdown) """
+        if self.task is not None:
+            self.done.wait(timeout)
+
+    async def run(self):
+        try:
+            while True:
+                with self.lock:
+                    if not self.running:
+                        break
+                    t_wait = None if self.t_next is None else self.t_next - time.monotonic()
+                    if t_wait is not None and t_wait <= 0:
+                        t_due = self.t_next
+                        rate = self.rate
+                        changes = self.changes
+                        self.t_last = t_due
+                        if self.single:   # single pulse of play_once
+                            self.single = False
+                            self.t_next = None
+                        else:
+                            self.t_next = t_due + 1 / rate   # next time slot, without drift
+                if t_wait is None or t_wait > 0:
+                    self.changed.clear()
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), t_wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                late = time.monotonic() - t_due
+                if late > self.late_max:
+                    self.late_max = late
+                try:
+                    if await self.runtime.io(self._play, changes):
+                        self.pulses = self.pulses + 1
+                except Exception as e:
+                    self.error = e
+
+                with self.lock:   # overrun, skip missed slots (not after a change of rate)
+                    now = time.monotonic()
+                    if self.rate == rate and self.t_next is not None and self.t_next < now:
+                        period = 1 / rate
+                        self.t_next = self.t_next + period * ((now - self.t_next) // period + 1)
+        finally:
+            self.done.set()
+
+
+class AsyncRuntime:
+    """ tasks of the firmware in one event loop, blocking i2c in an executor """
+
+    def __init__(self, gpio, button_pin, switch_pin, workers=I2C_WORKERS, log_file=None,
+                 deadband=wakeup.DEADBAND):
+        self.gpio = gpio   # RPi.GPIO or a fake with input() and add_event_detect()
+        self.button_pin = button_pin   # pins of button 0 (distance) and button 1 (mute), pressed = 0
+        self.switch_pin = switch_pin   # pins of turning switch, 0 = active
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="i2c")
+        self.log_file = log_file   # csv file of status lines, None -> no logging
+        self.deadband = deadband   # minimum change of distance which wakes the main loop [mm]
+        self.loop = None   # event loop, set by start()
+        self.wake = None   # asyncio.Event of the main loop
+        self.edges = None   # asyncio.Queue of button edges (pin, level, time)
+        self.switch_changed = None   # asyncio.Event of the turning switch
+        self.events = set()   # sources of events since the last wakeup
+        self.reported = {}   # sensor -> last sample which woke the main loop
+        self.button = button.Button()   # press time and mode of button 0 (distance) and button 1 (mute)
+        self.button_edge = [[0, 0], [0, 0]]   # time-stamp of falling ([][0]) and rising ([][1]) edge per button
+        self.switch_state = 1
+        self.t_start = None
+        self.t_signal = None   # time of the first event since the last wakeup
+        self.wakeups = 0   # number of wakeups of the main loop by events
+        self.timeouts = 0   # number of wakeups of the main loop by timeout
+        self.latency_sum = 0.0   # accumulated time from first event to wakeup [s]
+        self.latency_max = 0.0   # worst-case time from first event to wakeup [s]
+
+
+    #################### Function Section ####################
+
+    def start(self):
+        """ bind to the running event loop and register the GPIO callbacks (call from a coroutine) """
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        self.edges = asyncio.Queue()
+        self.switch_changed = asyncio.Event()
+        self.t_start = time.monotonic()
+        for pin in self.button_pin + self.switch_pin:
+            self.gpio.add_event_detect(pin, self.gpio.BOTH, callback=self.cb_gpio, bouncetime=50)
+
+    def pattern_engine(self, pulse):
+        """ pattern engine as task of this runtime (pattern_engine parameter of actuator.Actuator) """
+        return AsyncPatternEngine(pulse, self)
+
+    async def io(self, func, *args):
+        """ execute blocking func (i2c transfer) in the executor """
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    def cb_gpio(self, pin):
+        """ GPIO callback (thread of RPi.GPIO): hand over the edge to the event loop """
+        self.loop.call_soon_threadsafe(self._edge, pin, self.gpio.input(pin), time.monotonic())
+
+    def _edge(self, pin, level, t):
+        if pin in self.button_pin:
+            self.edges.put_nowait((pin, level, t))
+        else:
+            self.switch_changed.set()
+
+    def signal(self, source):
+        """ event of source, wakes up the main loop """
+        if not self.events:
+            self.t_signal = time.monotonic()
+        self.events.add(source)
+        self.wake.set()
+
+    async def wait(self, timeout):
+        """ sleep until an event is signalled or timeout [s] passed, returns the set of event sources """
+        if not self.events:
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        events = self.events
+        self.events = set()
+        if events:
+            latency = time.monotonic() - self.t_signal
+            self.latency_sum = self.latency_sum + latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+            self.wakeups = self.wakeups + 1
+        else:
+            self.timeouts = self.timeouts + 1
+        return events
+
+    def check(self, sensor, status):
+        """ raise exception if sensor is not answering, signal a changed sample """
+        if status == sample.STA_ERR_DATA:   # no sensor connection, exception for shutdown
+            raise IOError("[Errno 121] Remote I/O error")   # no connection to i2c device
+        if wakeup.changed(self.reported.get(sensor), sensor.sample, self.deadband):
+            self.reported[sensor] = sensor.sample
+            self.signal(type(sensor).__name__)
+
+    async def sleep_until(self, t_due):
+        t_wait = t_due - time.monotonic()
+        if t_wait > 0:
+            await asyncio.sleep(t_wait)
+
+    def next_slot(self, t_due, period):
+        """ next time slot after t_due, missed slots are skipped """
+        t_due = t_due + period
+        now = time.monotonic()
+        if t_due < now:
+            t_due = t_due + period * ((now - t_due) // period + 1)
+        return t_due
+
+
+    ### tasks ###
+
+    async def ultrasonic(self, sensor):
+        """ URM09: trigger at 20 Hz, collect after conversion, bus is free for other tasks meanwhile """
+        t_due = time.monotonic() + ULTRASONIC_OFFSET
+        while True:
+            await self.sleep_until(t_due)
+            t_due = self.next_slot(t_due, ULTRASONIC_PERIOD)
+            status = await self.io(read, sensor.triggerDistance)
+            if status == sample.STA_OK:
+                await asyncio.sleep(sensor.CONVERSION_TIME)
+                status = await self.io(read, sensor.collectDistance)
+            self.check(sensor, status)
+
+    async def lidar(self, sensor):
+        """ TF-Luna: read at 50 Hz """
+        t_due = time.monotonic()
+        while True:
+            await self.sleep_until(t_due)
+            t_due = self.next_slot(t_due, LIDAR_PERIOD)
+            self.check(sensor, await self.io(read, sensor.getDistance))
+
+    async def buttons(self, act, data):
+        """ button.Button fed with the edges of the GPIO callbacks: short press -> feedback of active \
+            mode, long press -> change mode (button.Button.but_func, executed by the i2c executor)
+            """
+        while True:
+            pin, level, t = await self.edges.get()
+            n = self.button_pin.index(pin)
+            if level == 0:   # pressed
+                self.button_edge[n] = [t, 0]
+                continue
+            if self.button_edge[n][0] == 0:   # released without press
+                continue
+            self.button_edge[n][1] = t
+            await self.io(self.button.but_func, n, BUTTON_FUNCTION[n], act, self.button_edge)
+            self.button_edge[n] = [0, 0]
+            data.setMode(self.button.but_mode[0])
+            self.signal("button")
+
+    def read_switch(self):
+        """ state 0...2 of the turning switch (like switch.Switch.set_switch_state) """
+        if self.gpio.input(self.switch_pin[0]) == 0:
+            self.switch_state = 0
+        elif self.gpio.input(self.switch_pin[1]) == 0:
+            self.switch_state = 1
+        elif self.gpio.input(self.switch_pin[2]) == 0:
+            self.switch_state = 2
+        return self.switch_state
+
+    async def switch(self, act, data):
+        """ set frequency and sensor selection after every change of the turning switch """
+        while True:
+            self.switch_changed.clear()
+            state = self.read_switch()
+            await self.io(act.set_freq_state, state)
+            data.setSensor(state)
+            self.signal("switch")
+            await self.switch_changed.wait()
+
+    async def control(self, act, data, sensor_1, sensor_2):
+        """ main loop: feedback of the latest samples, woken by events, latest when samples get stale """
+        while True:
+            value = data.getFeedback(sensor_1.sample, sensor_2.sample)
+            await self.io(act.set_actuator, value)
+            await self.wait(data.MAX_AGE)
+
+    def write_log(self, line):
+        f = open(self.log_file, "a")
+        f.write(line)
+        f.write("\n")
+        f.close()
+
+    async def logging(self, act, data):
+        """ status line every LOG_INTERVAL, file is written by the default executor (not the i2c bus) """
+        while True:
+            await asyncio.sleep(LOG_INTERVAL)
+            x = datetime.datetime.now()
+            line = "{},{},{:.1f},{:.2f},{:.1f},{}".format(
+                x.strftime("%Y-%m-%d"),
+                x.strftime("%H:%M:%S:%f")[:-3],
+                self.rate(),
+                self.latency_max * 1000,
+                data.age_max * 1000,
+                act.pattern.pulses
+                )
+            await self.loop.run_in_executor(None, self.write_log, line)
+
+    async def run(self, act, data, sensor_1, sensor_2, duration=None):
+        """ run all tasks for duration [s] (None -> until an exception or cancel) """
+        tasks = [
+            self.loop.create_task(self.ultrasonic(sensor_1)),
+            self.loop.create_task(self.lidar(sensor_2)),
+            self.loop.create_task(self.buttons(act, data)),
+            self.loop.create_task(self.switch(act, data)),
+            self.loop.create_task(self.control(act, data, sensor_1, sensor_2)),
+            ]
+        if self.log_file is not None:
+            tasks.append(self.loop.create_task(self.logging(act, data)))
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=duration, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:   # exception of a task (e.g. sensor not answering) -> shutdown
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def shutdown(self, act):
+        """ switch off the actuators, stop pattern engine and executor """
+        await self.io(act.set_vib_const, 0)
+        act.pattern.stop()
+        if act.pattern.task is not None:
+            await act.pattern.task
+        await self.io(act.close)
+        self.executor.shutdown()
+
+    def rate(self):
+        """ wakeups of the main loop per second (with events and timeouts) """
+        return (self.wakeups + self.timeouts) / max(time.monotonic() - self.t_start, 1e-9)
+
+    def report(self):
+        """ return wakeups and latency of the main loop as text lines """
+        latency_mean = self.latency_sum / self.wakeups if self.wakeups else 0.0
+        return [f"main loop: {self.rate():.1f} wakeups/s ({self.wakeups} by events, {self.timeouts} by "
+                f"timeout), event-to-wakeup mean {latency_mean * 1000:.2f} ms, max {self.latency_max * 1000:.2f} ms"]
@@ -0,0 +1,220 @@
+"""V1.0
+Module for the i2c-bus scheduler used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+One thread owns the i2c-bus and executes all transactions: periodic sensor
+polls in fixed time slots and one-shot jobs (actuator writes) of other threads.
+Due jobs are executed by priority, actuator jobs first. Bus time and queueing
+delay are recorded per client.
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import rt_profile
+
+
+#################### variables section ####################
+
+PRIO_ACTUATOR = 0   # highest priority: actuator updates
+PRIO_SENSOR = 1   # sensor polls
+
+
+class BusClient:
+    """ statistics of one client of the bus """
+
+    def __init__(self, name):
+        self.name = name
+        self.jobs = 0   # number of executed jobs
+        self.busy = 0.0   # accumulated execution time [s]
+        self.delay_sum = 0.0   # accumulated queueing delay [s]
+        self.delay_max = 0.0   # worst-case queueing delay [s]
+        self.error = None   # last exception of a periodic job
+
+    def record(self, delay, busy):
+        """ add one executed job """
+        self.jobs = self.jobs + 1
+        self.busy = self.busy + busy
+        self.delay_sum = self.delay_sum + delay
+        if delay > self.delay_max:
+            self.delay_max = delay
+
+
+class BusJob:
+    """ one job of the scheduler, periodic if period is set """
+
+    __slots__ = ("client", "func", "args", "kwargs", "priority", "t_due", "period",
+                 "seq", "done", "result", "error")
+
+    def __init__(self, client, func, args, kwargs, priority, t_due, period, seq):
+        self.client = client   # BusClient
+        self.func = func   # function to execute in the bus thread
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority   # PRIO_ACTUATOR or PRIO_SENSOR
+        self.t_due = t_due   # earliest time of execution (time.monotonic) [s]
+        self.period = period   # period of periodic job [s], None for one-shot job
+        self.seq = seq   # submission order, executed first-in first-out at equal priority
+        self.done = None   # threading.Event for waiting callers
+        self.result = None
+        self.error = None
+
+
+class BusScheduler(threading.Thread):
+    """ single owner thread of the i2c-bus """
+
+    def __init__(self):
+        threading.Thread.__init__(self, name="bus_scheduler", daemon=True)
+        self.cond = threading.Condition()   # protects jobs, wakes up the bus thread
+        self.jobs = []   # waiting jobs
+        self.clients = {}   # name -> BusClient
+        self.seq = 0   # number of submitted jobs
+        self.running = True
+        self.t_start = time.monotonic()
+
+
+    #################### Function Section ####################
+
+    def client(self, name):
+        """ return statistics of client name, create it if needed """
+        if name not in self.clients:
+            self.clients[name] = BusClient(name)
+        return self.clients[name]
+
+    def _add(self, name, func, args, kwargs, priority, t_due, period):
+        with self.cond:
+            self.seq = self.seq + 1
+            job = BusJob(self.client(name), func, args, kwargs, priority, t_due, period, self.seq)
+            self.jobs.append(job)
+            self.cond.notify()
+        return job
+
+    def add_periodic(self, name, func, period, offset=0.0, priority=PRIO_SENSOR):
+        """ execute func() every period, first execution after offset (time slot of client) """
+        return self._add(name, func, (), {}, priority, time.monotonic() + offset, period)
+
+    def submit(self, name, func, *args, priority=PRIO_ACTUATOR, t_due=None, **kwargs):
+        """ execute func(*args, **kwargs) once, not before t_due """
+        if t_due is None:
+            t_due = time.monotonic()
+        return self._add(name, func, args, kwargs, priority, t_due, None)
+
+    def call(self, name, func, *args, priority=PRIO_ACTUATOR, **kwargs):
+        """ execute func(*args, **kwargs) in the bus thread and wait for the result """
+        if threading.current_thread() is self or not self.is_alive():
+            return func(*args, **kwargs)   # already owner of the bus, or no bus thread running
+        done = threading.Event()
+        with self.cond:
+            self.seq = self.seq + 1
+            job = BusJob(self.client(name), func, args, kwargs, priority, time.monotonic(), None, self.seq)
+            job.done = done
+            self.jobs.append(job)
+            self.cond.notify()
+        done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stop(self):
+        """ stop bus thread after the running job """
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def _next_job(self):
+        """ wait for the next due job, highest priority first, returns None when stopped """
+        with self.cond:
+            while self.running:
+                now = time.monotonic()
+                job = None
+                t_next = None
+                for candidate in self.jobs:
+                    if candidate.t_due <= now:
+                        if job is None or (candidate.priority, candidate.t_due, candidate.seq) \
+                                < (job.priority, job.t_due, job.seq):
+                            job = candidate
+                    elif t_next is None or candidate.t_due < t_next:
+                        t_next = candidate.t_due
+                if job is not None:
+                    self.jobs.remove(job)
+                    return job
+                self.cond.wait(None if t_next is None else t_next - now)
+            return None
+
+    def run(self):
+        rt_profile.enter(self.name)
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            t_start = time.monotonic()
+            rt_profile.record(self.name, t_start - job.t_due)
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                job.error = e
+                job.client.error = e
+            t_end = time.monotonic()
+            job.client.record(t_start - job.t_due, t_end - t_start)
+
+            if job.done is not None:
+                job.done.set()
+            if job.period is not None:   # next time slot, without drift
+                job.t_due = job.t_due + job.period
+                if job.t_due < t_end:   # overrun, skip missed slots
+                    job.t_due = job.t_due + job.period * ((t_end - job.t_due) // job.period + 1)
+                with self.cond:
+                    self.jobs.append(job)
+
+        # release callers waiting for jobs which are not executed anymore
+        with self.cond:
+            for job in self.jobs:
+                if job.done is not None:
+                    job.error = RuntimeError("bus scheduler stopped")
+                    job.done.set()
+            self.jobs = []
+
+    def report(self):
+        """ return bus utilization and queueing delay per client as text lines """
+        t_total = max(time.monotonic() - self.t_start, 1e-9)
+        lines = []
+        for client in self.clients.values():
+            delay_mean = client.delay_sum / client.jobs if client.jobs else 0.0
+            lines.append(f"{client.name}: {client.jobs} jobs, utilization "
+                         f"{100 * client.busy / t_total:.1f} %, queueing delay mean "
+                         f"{delay_mean * 1000:.2f} ms, max {client.delay_max * 1000:.2f} ms")
+        return lines
+
+
+class ScheduledI2C:
+    """ busio.I2C-compatible proxy, every transaction is executed by the bus scheduler """
+
+    def __init__(self, i2c, scheduler, name="actuator", priority=PRIO_ACTUATOR):
+        self.i2c = i2c   # busio.I2C object
+        self.scheduler = scheduler
+        self.name = name   # client name for statistics
+        self.priority = priority
+
+    def try_lock(self):
+        return self.i2c.try_lock()
+
+    def unlock(self):
+        self.i2c.unlock()
+
+    def scan(self):
+        return self.scheduler.call(self.name, self.i2c.scan, priority=self.priority)
+
+    def writeto(self, address, buffer, **kwargs):
+        return self.scheduler.call(self.name, self.i2c.writeto, address, buffer,
+                                   priority=self.priority, **kwargs)
+
+    def readfrom_into(self, address, buffer, **kwargs):
+        return self.scheduler.call(self.name, self.i2c.readfrom_into, address, buffer,
+                                   priority=self.priority, **kwargs)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, **kwargs):
+        return self.scheduler.call(self.name, self.i2c.writeto_then_readfrom, address,
+                                   buffer_out, buffer_in, priority=self.priority, **kwargs)
@@ -9,15 +9,12 @@ on 26.08.2023
 
 #################### import section #################### -> all libraries needed to run the function
 
-import time
-import RPi.GPIO as GPIO
+import hal
 
 
 
 #################### Test program variables ####################
 
-GPIO.setmode(GPIO.BCM)
-
 button_mode = [0, 1]   # Mode of button 0 ([0] = distance) and button 1 ([1] = mute)
 BUTTON_PIN = [17, 27]   # Pins for Mute-Mode [0] & Distance-Mode [1]: pressed = 0, not pressed = 1
 button_edge = [[0, 0], [0, 0]]   # relative time-stamp of rising ([][0]) and falling ([][1])
@@ -29,6 +26,9 @@ class Button:
 
     #################### Class-specific Variables ####################
 
+    SWITCH_TIME = 1   # button pressed longer -> long press (change mode) [s]
+    FEEDBACK_DELAY = 0.5   # delay of the haptic feedback after the button is released [s]
+
     def __init__(self):
         self.but_press_time = [None, None]   # pressing time of buttons
         self.but_mode = [1, 1]   # default-values of button modes
@@ -68,7 +68,7 @@ class Button:
             long press -> change active state
             """
 
-        self.but_press_time[bu_no] = self.set_but_sel(bu_edge[bu_no][0], bu_edge[bu_no][1], 1)
+        self.but_press_time[bu_no] = self.set_but_sel(bu_edge[bu_no][0], bu_edge[bu_no][1], self.SWITCH_TIME)
 
 
         if self.but_press_time[bu_no] == 0:   # value 0 = no button action detected
@@ -79,9 +79,7 @@ class Button:
 
             if self.but_mode[bu_no] == 1:   # detection of active mode: 1 (long distance / unmute)
 
-                time.sleep(0.5)
-                act_inst.set_vib_intv(12)   # set haptic feedback of active mode
-                act_inst.start_vib_intv(0.5)   # set haptic feedback of active mode
+                act_inst.play_feedback(12, self.FEEDBACK_DELAY)   # haptic feedback of active mode, returns immediately
 
                 if bu_no == 0:   # = distance-button
                     print(f"active {function}-mode = {self.but_mode[bu_no]} (long distance)")
@@ -90,9 +88,7 @@ class Button:
 
             elif self.but_mode[bu_no] == 0:   # detection of active mode: 0 (short distance / mute)
 
-                time.sleep(0.5)
-                act_inst.set_vib_intv(4)   # set haptic feedback of active mode
-                act_inst.start_vib_intv(0.5)   # set haptic feedback of active mode
+                act_inst.play_feedback(4, self.FEEDBACK_DELAY)   # haptic feedback of active mode, returns immediately
 
                 if bu_no == 0:   # = distance-button
                     print(f"active {function}-mode = {self.but_mode[bu_no]} (short distance)")
@@ -104,9 +100,7 @@ class Button:
 
             if self.but_mode[bu_no] == 0:   # detection of active mode: 0 (short distance / mute)
 
-                time.sleep(0.5)
-                act_inst.set_vib_intv(12)   # set haptic feedback of active mode
-                act_inst.start_vib_intv(0.5)   # set haptic feedback of active mode
+                act_inst.play_feedback(12, self.FEEDBACK_DELAY)   # haptic feedback of active mode, returns immediately
 
                 self.but_mode[bu_no] = 1   # change active mode to 1 (class variable)
 
@@ -120,9 +114,7 @@ class Button:
 
             elif self.but_mode[bu_no] == 1:   # detection of active mode: 1 (long distance / unmute)
 
-                time.sleep(0.5)
-                act_inst.set_vib_intv(4)   # set haptic feedback of active mode
-                act_inst.start_vib_intv(0.5)   # set haptic feedback of active mode
+                act_inst.play_feedback(4, self.FEEDBACK_DELAY)   # haptic feedback of active mode, returns immediately
 
                 self.but_mode[bu_no] = 0   # change active mode to 0 (class variable)
 
@@ -189,4 +181,4 @@ if __name__ == "__main__":
             button_mode[1] = testButton.but_func(1, "mute", myActuator, button_edge[1])
 
     except KeyboardInterrupt:
-        GPIO.cleanup()
+        hal.backend().cleanup()
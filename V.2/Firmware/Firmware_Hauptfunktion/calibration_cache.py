@@ -0,0 +1,85 @@
+"""V1.0
+Module for the calibration cache of the actuators used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The registers of a DRV2605L after auto-calibration (RATED_VOLTAGE ... CONTROL4,
+including A_CAL_COMP, A_CAL_BEMF and BEMF_GAIN) are stored in a json-file,
+key is the TCA9548A channel and the actuator type. At startup they are written
+back with one burst write instead of a new auto-calibration.
+LRA_PERIOD (0x22) is read-only, it is stored for the plausibility check.
+"""
+
+
+#################### import section ####################
+
+import datetime
+import json
+import os
+
+
+#################### variables section ####################
+
+CACHE_FILE = "calibration_cache.json"   # device-specific, in the working directory next to the log files
+VERSION = 1   # format of the cache file, other versions are ignored
+REG_FIRST = 0x16   # RATED_VOLTAGE
+REG_LAST = 0x1E   # CONTROL4 (AUTO_CAL_TIME, ZC_DET_TIME)
+REG_LRA_PERIOD = 0x22   # measured resonance period, read-only
+RES_FREQ_MIN = 100   # plausible resonance frequency of the exciters [Hz]
+RES_FREQ_MAX = 300
+
+
+#################### Function section ####################
+
+def key(channel, act_type):
+    """ key of one actuator in the cache """
+    return f"{channel}:{act_type}"
+
+
+def res_freq(lra_period):
+    """ resonance frequency [Hz] of LRA_PERIOD, see Actuator.autocalibration """
+    return 1 / (lra_period * (98.46 * pow(10, -6)))
+
+
+def create_entry(registers, lra_period):
+    """ cache entry of registers REG_FIRST...REG_LAST and LRA_PERIOD """
+    return {
+        "registers": list(registers),
+        "lra_period": lra_period,
+        "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+def valid(entry):
+    """ True if entry is complete and the calibration is plausible """
+    try:
+        registers = entry["registers"]
+        lra_period = entry["lra_period"]
+        if len(registers) != REG_LAST - REG_FIRST + 1:
+            return False
+        if not all(isinstance(value, int) and 0 <= value <= 0xFF for value in registers):
+            return False
+        if registers[0] == 0:   # RATED_VOLTAGE not set
+            return False
+        return isinstance(lra_period, int) and lra_period > 0 and \
+            RES_FREQ_MIN <= res_freq(lra_period) <= RES_FREQ_MAX
+    except (KeyError, TypeError):
+        return False
+
+
+def load(path=CACHE_FILE):
+    """ return all entries of the cache file, empty if file is missing or broken """
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache.get("version") != VERSION:
+            return {}
+        return cache["actuators"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+
+def save(entries, path=CACHE_FILE):
+    """ write all entries to the cache file (replaced at once, no half written file) """
+    with open(path + ".tmp", "w") as f:
+        json.dump({"version": VERSION, "actuators": entries}, f, indent=4)
+    os.replace(path + ".tmp", path)
@@ -1,12 +1,17 @@
 import time
+from sample import Sample, STA_OK
 
 class DataProcession():
     #variables
     mode = False #False -> near; True -> far
     selector = 1 #1 -> both sensors, 0 -> lidar, 2 -> ultrasonic
+    age = 0.0 #age of the sample used for the last feedback [s]
+    age_max = 0.0 #maximum age of a sample used for feedback [s]
+    trace = None #latency_trace.LatencyTrace -> trace point fusion in getFeedback, None = off
     #constants
     DISTANCE_NEAR_MODE = 1500
     DISTANCE_FAR_MODE = 3000
+    MAX_AGE = 0.2 #samples older than MAX_AGE [s] are ignored
 
     # set mode for smart cane V1
     #def setMode(self): 
@@ -20,28 +25,38 @@ class DataProcession():
     def setSensor(self, selector):
         self.selector = selector
         
-    # distance 1 -> ultrasonic, distance 2 -> lidar
-    def getFeedback(self,distance_1,distance_2):
+    # sample 1 -> ultrasonic, sample 2 -> lidar (sample.Sample)
+    def getFeedback(self,sample_1,sample_2):
         if self.mode == False: #set max distance depending on modus
             distance_max = self.DISTANCE_NEAR_MODE
         else:
             distance_max = self.DISTANCE_FAR_MODE
-    
-        if distance_1 > distance_max: #if measured value is outside range
-            distance_1 = distance_max
-        if distance_2 > distance_max:
-            distance_2 = distance_max
 
+        now = time.monotonic()
+        distance_1 = self.getDistance(sample_1, distance_max, now)
+        distance_2 = self.getDistance(sample_2, distance_max, now)
 
         if self.selector == 1: # both sensors
             if distance_1 < distance_2: #smaller value for feedback
                 distance = distance_1
+                sample = sample_1
             else:
                 distance = distance_2
+                sample = sample_2
         elif self.selector == 0: # lidar sensor
             distance = distance_2
+            sample = sample_2
         elif self.selector == 2: # ultrasonic sensor
             distance = distance_1
+            sample = sample_1
+
+        if self.trace is not None: #trace point fusion, capture time of a valid sample
+            self.trace.fusion(sample.t_capture if sample.status == STA_OK else None)
+
+        if distance < distance_max: #measure sensor-to-feedback age of used sample
+            self.age = sample.age(now)
+            if self.age > self.age_max:
+                self.age_max = self.age
         
   
         #if measured distance is 500, output value is 500 at max. distance of 1000
@@ -49,16 +64,25 @@ class DataProcession():
         #0 -> far, no feedback; 1000 -> close, max feedback
         return distance*(-1000/distance_max)+1000 #return for Marian
 
+    # distance of a sample limited to distance_max, stale or invalid samples -> no feedback
+    def getDistance(self, sample, distance_max, now):
+        if sample.status != STA_OK or sample.age(now) > self.MAX_AGE:
+            return distance_max
+        if sample.value > distance_max: #if measured value is outside range
+            return distance_max
+        return sample.value
+
 if __name__ == "__main__":
     data = DataProcession()
     print(data.mode)
-    data.setMode()
+    data.setMode(True)
     print(data.mode)
-    data.setMode()
+    data.setMode(False)
     print(data.mode)
-    feedback = data.getFeedback(500,999)
-    print(feedback)
-    data.setMode()
-    feedback = data.getFeedback(500,999)
-    print(feedback)
+    now = time.monotonic()
+    feedback = data.getFeedback(Sample(500,now,1,status=STA_OK),Sample(999,now,1,status=STA_OK))
+    print(feedback, data.age)
+    data.setMode(True)
+    feedback = data.getFeedback(Sample(500,now-1,1,status=STA_OK),Sample(999,now,1,status=STA_OK)) #sample 1 is stale
+    print(feedback, data.age)
 
@@ -0,0 +1,88 @@
+"""V1.0
+Module for the hardware abstraction layer used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A backend delivers the interfaces GPIO, I2C, UART and DRV2605 of the hardware:
+gpio()            RPi.GPIO-like object (setmode, setup, input, add_event_detect, cleanup)
+smbus(port)       smbus.SMBus-like bus object, used as bus_class of i2c_bus.I2CBus
+i2c(port)         busio.I2C-like bus object of the actuators (TCA9548A, DRV2605L)
+uart(port, ...)   serial.Serial-like object of the ME007YS
+drv2605(i2c)      adafruit_drv2605.DRV2605-like driver on a busio.I2C-like channel
+RaspberryPi imports RPi.GPIO, smbus, busio, serial and adafruit_drv2605 only
+when the interface is used, so no module of the firmware needs them at import.
+hal_sim.Simulated has the same interfaces with in-memory devices and a
+simulated duration per transaction, so the firmware runs on every Linux machine.
+The backend is selected once with select() (main.py: SMARTCANE_HAL), drivers
+without delivered bus objects use backend().
+"""
+
+
+#################### import section ####################
+
+import i2c_rdwr
+import calibration_cache
+
+
+#################### variables section ####################
+
+MODE_INTTRIG = 0x00   # DRV2605L mode register: internal trigger (GO bit), like adafruit_drv2605
+MODE_REALTIME = 0x05   # DRV2605L mode register: real-time playback (RTP)
+
+active = None   # backend of the firmware, None -> RaspberryPi at first use of backend()
+
+
+def select(hardware):
+    """ use hardware as backend of the firmware, returns hardware """
+    global active
+    active = hardware
+    return active
+
+
+def backend():
+    """ selected backend, RaspberryPi if none is selected """
+    if active is None:
+        select(RaspberryPi())
+    return active
+
+
+class RaspberryPi:
+    """ backend of the real hardware: RPi.GPIO, /dev/i2c-1, /dev/serial0, DRV2605L """
+
+    def __init__(self, i2c_rdwr=False):
+        self.use_i2c_rdwr = i2c_rdwr   # True -> one I2C_RDWR ioctl per transfer (i2c_rdwr), False -> smbus / busio
+        self.cache_file = calibration_cache.CACHE_FILE   # calibration cache of the DRV2605L
+        self._gpio = None   # RPi.GPIO module after first gpio()
+
+
+    #################### Function Section ####################
+
+    def gpio(self):
+        import RPi.GPIO
+        self._gpio = RPi.GPIO
+        return self._gpio
+
+    def smbus(self, port):
+        if self.use_i2c_rdwr:
+            return i2c_rdwr.I2CRdwr(port)
+        from smbus import SMBus
+        return SMBus(port)
+
+    def i2c(self, port=1):
+        if self.use_i2c_rdwr:
+            return i2c_rdwr.I2CRdwr(port)
+        import board
+        import busio
+        return busio.I2C(board.SCL, board.SDA)   # I2C(1), pins 3/5
+
+    def uart(self, port, baudrate, timeout=None):
+        import serial
+        return serial.Serial(port, baudrate, timeout=timeout)
+
+    def drv2605(self, i2c):
+        import adafruit_drv2605
+        return adafruit_drv2605.DRV2605(i2c)
+
+    def cleanup(self):
+        """ release the GPIO pins (only if they were used) """
+        if self._gpio is not None:
+            self._gpio.cleanup()
@@ -0,0 +1,556 @@
+"""V1.0
+Module for the simulated backend of the hardware abstraction layer used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Simulated has the interfaces of hal.RaspberryPi with in-memory devices:
+TF-Luna (0x10) and URM09 (0x11) on the main bus, TCA9548A (0x70) with one
+DRV2605L (0x5A) per channel, ME007YS on the uart and the GPIO inputs of
+buttons and switch. Every i2c-transaction lasts `latency`, every uart read
+`uart_latency`, so bus load and timing of the firmware can be measured
+without Raspberry Pi. FakeSMBus has the interface of smbus.SMBus (opening the
+bus opens os.devnull, so open/close costs a real syscall), FakeI2C the one of
+busio.I2C, FakeSerial the one of serial.Serial, FakeGPIO the input and edge
+callback interface of RPi.GPIO. DRV2605 and I2CDevice replace adafruit_drv2605
+and adafruit_bus_device. The device models are also used by the benchmarks.
+"""
+
+
+#################### import section ####################
+
+import math
+import os
+import tempfile
+import threading
+import time
+
+
+#################### variables section ####################
+
+TFLUNA_ADDR = 0x10
+URM09_ADDR = 0x11
+DRV_ADDR = 0x5A
+URM09_CONVERSION = 0.03   # time-of-flight of the URM09 at 300 cm range [s]
+
+
+class FakeDevice:
+    """ register map of one i2c-device """
+
+    def __init__(self, size=0x40):
+        self.reg = [0] * size   # register values
+
+    def write(self, register, value):
+        self.reg[register] = value & 0xFF
+
+    def read(self, register, length):
+        return self.reg[register:register + length]
+
+
+class FakeTfLuna(FakeDevice):
+    """ TF-Luna: in trigger mode every write to TFL_TRIGGER creates a new frame, \
+        in continuous mode frames are created at the frame rate of TFL_FPS_L/H
+        """
+
+    def __init__(self, distance=150, strength=1000, clock=time.monotonic):
+        FakeDevice.__init__(self)
+        self.distance = distance   # distance in cm
+        self.strength = strength   # signal strength
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.tick = 0   # device timestamp of last frame
+        self.frame_no = None   # number of last frame in continuous mode
+        self.frames = 0   # number of created frames
+        self.reg[0x23] = 1   # TFL_SET_MODE -> trigger mode
+
+    def new_frame(self, tick):
+        """ write distance, strength and timestamp of a new frame to the registers """
+        self.tick = tick & 0xFFFF
+        self.frames = self.frames + 1
+        self.reg[0x00:0x08] = [
+            self.distance & 0xFF, self.distance >> 8,
+            self.strength & 0xFF, self.strength >> 8,
+            0x00, 0x0A,   # temperature
+            self.tick & 0xFF, self.tick >> 8,
+            ]
+
+    def write(self, register, value):
+        FakeDevice.write(self, register, value)
+        if register == 0x24 and value == 1:   # TFL_TRIGGER
+            self.new_frame(self.tick + 1)
+
+    def read(self, register, length):
+        fps = self.reg[0x26] + (self.reg[0x27] << 8)
+        if self.reg[0x23] == 0 and fps > 0:   # continuous mode -> frame of current time slot
+            now = self.clock()
+            frame_no = int(now * fps)
+            if frame_no != self.frame_no:
+                self.frame_no = frame_no
+                self.new_frame(int(now * 1000))   # timestamp in ms
+        return FakeDevice.read(self, register, length)
+
+
+class FakeURM09(FakeDevice):
+    """ URM09: every write of 0x01 to COMMAND starts a measurement, \
+        distance registers are updated after the conversion time
+        """
+
+    def __init__(self, distance=120, conversion=0.0, clock=time.monotonic):
+        FakeDevice.__init__(self)
+        self.distance = distance   # distance in cm
+        self.conversion = conversion   # time-of-flight until the result is valid [s]
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.t_trigger = None   # time of pending measurement, None if no measurement is pending
+        self.early_reads = 0   # number of reads before conversion was finished
+
+    def write(self, register, value):
+        FakeDevice.write(self, register, value)
+        if register == 0x08 and value == 0x01:   # COMMAND -> trigger measurement
+            self.t_trigger = self.clock()
+
+    def read(self, register, length):
+        if self.t_trigger is not None:
+            if self.clock() - self.t_trigger >= self.conversion:   # conversion finished
+                self.reg[0x03] = self.distance >> 8
+                self.reg[0x04] = self.distance & 0xFF
+                self.t_trigger = None
+            else:
+                self.early_reads = self.early_reads + 1
+        return FakeDevice.read(self, register, length)
+
+
+class FakeDRV2605(FakeDevice):
+    """ DRV2605L: default registers after reset, GO bit is cleared by the device \
+        after auto-calibration (calibration time) or after playback
+        """
+
+    DEFAULTS = {0x00: 0xE0, 0x01: 0x40, 0x16: 0x3E, 0x17: 0x8C, 0x18: 0x0C, 0x19: 0x6C,
+                0x1A: 0x36, 0x1B: 0x93, 0x1C: 0xF5, 0x1D: 0xA0, 0x1E: 0x20, 0x20: 0x33}
+
+    def __init__(self, calibration=0.0, lra_period=0x33, failures=0, clock=time.monotonic):
+        FakeDevice.__init__(self)
+        self.calibration = calibration   # duration of auto-calibration [s]
+        self.failures = failures   # number of auto-calibrations which end with DIAG_RESULT = 1
+        self.lra_period = lra_period   # LRA_PERIOD found by auto-calibration
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.t_go = None   # time of GO bit set, None if GO bit is cleared
+        self.writes = 0   # number of register writes
+        self.plays = 0   # number of started sequences / calibrations
+        self.reset()
+
+    def reset(self):
+        self.reg = [0] * 0x40
+        for register, value in self.DEFAULTS.items():
+            self.reg[register] = value
+
+    def write(self, register, value):
+        self.writes = self.writes + 1
+        if register == 0x01 and value & 0x80:   # DEV_RESET
+            self.reset()
+            return
+        FakeDevice.write(self, register, value)
+        if register == 0x0C:
+            if value & 0x01:
+                self.t_go = self.clock()
+                self.plays = self.plays + 1
+            else:
+                self.t_go = None
+
+    def read(self, register, length):
+        if self.t_go is not None:
+            duration = self.calibration if self.reg[0x01] & 0x07 == 0x07 else 0.0
+            if self.clock() - self.t_go >= duration:   # GO bit cleared by device
+                if self.reg[0x01] & 0x07 == 0x07 and self.failures > 0:   # DIAG_RESULT: failed
+                    self.failures = self.failures - 1
+                    self.reg[0x00] = self.reg[0x00] | 0x08
+                elif self.reg[0x01] & 0x07 == 0x07:   # results of auto-calibration
+                    self.reg[0x00] = self.reg[0x00] & ~0x08
+                    self.reg[0x18] = 0x0D
+                    self.reg[0x19] = 0x7A
+                    self.reg[0x1A] = (self.reg[0x1A] & 0xFC) | 0x02
+                    self.reg[0x22] = self.lra_period
+                self.reg[0x0C] = 0
+                self.t_go = None
+        return FakeDevice.read(self, register, length)
+
+
+class FakeSMBus:
+    """ in-memory stand-in for smbus.SMBus """
+
+    def __init__(self, bus=None, devices=None, latency=0.0):
+        self.fd = None   # file descriptor of opened bus
+        self.devices = devices if devices is not None else {}   # i2c-address -> FakeDevice
+        self.latency = latency   # simulated duration of one transaction [s]
+        self.transactions = 0   # number of transactions
+        self.opens = 0   # number of open calls
+        if bus is not None:
+            self.open(bus)
+
+    def open(self, bus):
+        self.fd = os.open(os.devnull, os.O_RDWR)
+        self.opens = self.opens + 1
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _device(self, addr):
+        """ check bus and address like the kernel driver does """
+        if self.fd is None:
+            raise IOError(9, "Bad file descriptor")
+        if addr not in self.devices:
+            raise IOError(121, "Remote I/O error")
+        self.transactions = self.transactions + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return self.devices[addr]
+
+    def write_quick(self, addr):
+        self._device(addr)
+
+    def write_byte_data(self, addr, register, value):
+        self._device(addr).write(register, value)
+
+    def read_i2c_block_data(self, addr, register, length):
+        return self._device(addr).read(register, length)
+
+
+class FakeI2C:
+    """ in-memory stand-in for busio.I2C with optional TCA9548A multiplexer at 0x70 """
+
+    MUX_ADDR = 0x70
+
+    def __init__(self, devices=None, channels=None, latency=0.0):
+        self.devices = devices if devices is not None else {}   # i2c-address -> FakeDevice (main bus)
+        self.channels = channels if channels is not None else {}   # mux channel -> {i2c-address -> FakeDevice}
+        self.latency = latency   # simulated duration of one transaction [s]
+        self.mux_mask = 0   # enabled channels of multiplexer
+        self.pointer = {}   # register pointer per device
+        self.transactions = 0   # number of transactions
+        self.mux_writes = 0   # number of channel-select writes
+        self.lock = threading.Lock()
+
+    def try_lock(self):
+        return self.lock.acquire(blocking=False)
+
+    def unlock(self):
+        self.lock.release()
+
+    def _targets(self, address):
+        """ all devices answering to address (several if multiplexer broadcasts) """
+        self.transactions = self.transactions + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        targets = []
+        if address in self.devices:
+            targets.append(self.devices[address])
+        for channel, devices in self.channels.items():
+            if self.mux_mask & (1 << channel) and address in devices:
+                targets.append(devices[address])
+        if not targets:
+            raise OSError(121, "Remote I/O error")
+        return targets
+
+    def scan(self):
+        return sorted(set(self.devices) | {self.MUX_ADDR})
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        data = bytes(buffer[start:end])
+        if address == self.MUX_ADDR and self.channels:
+            self.transactions = self.transactions + 1
+            self.mux_writes = self.mux_writes + 1
+            self.mux_mask = data[0]
+            return
+        for device in self._targets(address):
+            if data:
+                self.pointer[device] = data[0]
+                for n, value in enumerate(data[1:]):   # register address auto-increment
+                    device.write(data[0] + n, value)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        targets = self._targets(address)
+        values = [0xFF] * (end - start)
+        for device in targets:   # several devices on the bus -> wired-AND
+            register = self.pointer.get(device, 0)
+            values = [v & d for v, d in zip(values, device.read(register, end - start))]
+        buffer[start:end] = bytes(values)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *,
+                              out_start=0, out_end=None, in_start=0, in_end=None):
+        self.writeto(address, buffer_out, start=out_start, end=out_end)
+        self.transactions = self.transactions - 1   # repeated start -> one transaction
+        self.readfrom_into(address, buffer_in, start=in_start, end=in_end)
+
+
+class FakeGPIO:
+    """ in-memory stand-in for RPi.GPIO: input levels and edge callbacks """
+
+    BCM = 11
+    IN = 1
+    PUD_UP = 22
+    BOTH = 33
+
+    def __init__(self, levels=None):
+        self.levels = dict(levels) if levels is not None else {}   # pin -> level, default 1 (pull up)
+        self.callbacks = {}   # pin -> callback of add_event_detect
+        self.reads = 0   # number of input() calls
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.levels.setdefault(pin, 1)
+
+    def input(self, pin):
+        self.reads = self.reads + 1
+        return self.levels.get(pin, 1)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = callback
+
+    def set_level(self, pin, level):
+        """ simulated edge: change level and call the callback in the calling thread """
+        if self.levels.get(pin, 1) == level:
+            return
+        self.levels[pin] = level
+        if pin in self.callbacks:
+            self.callbacks[pin](pin)
+
+    def cleanup(self):
+        self.callbacks = {}
+
+
+class FakeSerial:
+    """ in-memory stand-in for serial.Serial with a ME007YS, which sends one frame per PERIOD """
+
+    PERIOD = 0.1   # interval of the frames in uart auto output mode [s]
+    BUFFER_SIZE = 4096   # receive buffer of the uart [bytes], oldest bytes are dropped on overflow
+
+    def __init__(self, port=None, baudrate=9600, timeout=None, distance=1500, latency=0.0, clock=time.monotonic):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout   # maximum wait of read() for the first byte [s], None -> wait for next frame
+        self.distance = distance   # distance in mm
+        self.latency = latency   # simulated duration of one read [s]
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.is_open = True
+        self.t_next = clock() + self.PERIOD   # time of the next frame
+        self.rx = bytearray()   # received bytes
+        self.reads = 0   # number of read() calls
+
+    def isOpen(self):
+        return self.is_open
+
+    def open(self):
+        self.is_open = True
+        self.t_next = self.clock() + self.PERIOD
+
+    def close(self):
+        self.is_open = False
+        self.rx.clear()
+
+    def _receive(self):
+        """ append the frames sent since the last call: header, data_high, data_low, checksum """
+        now = self.clock()
+        while self.t_next <= now:
+            frame = [0xFF, (self.distance >> 8) & 0xFF, self.distance & 0xFF]
+            frame.append(sum(frame) & 0xFF)
+            self.rx += bytes(frame)
+            self.t_next = self.t_next + self.PERIOD
+        if len(self.rx) > self.BUFFER_SIZE:
+            del self.rx[:len(self.rx) - self.BUFFER_SIZE]
+
+    @property
+    def in_waiting(self):
+        self._receive()
+        return len(self.rx)
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise IOError(9, "Bad file descriptor")
+        self.reads = self.reads + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        self._receive()
+        if not self.rx:   # wait for the next frame, maximum timeout
+            wait = self.t_next - self.clock()
+            if self.timeout is not None:
+                wait = min(wait, self.timeout)
+            if wait > 0:
+                time.sleep(wait)
+            self._receive()
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+
+class I2CDevice:
+    """ device on a busio.I2C-like bus, like adafruit_bus_device.i2c_device.I2CDevice """
+
+    def __init__(self, i2c, device_address):
+        self.i2c = i2c
+        self.device_address = device_address
+        with self:   # probe device
+            try:
+                self.i2c.writeto(self.device_address, b"")
+            except OSError:
+                raise ValueError(f"No I2C device at address: 0x{self.device_address:x}")
+
+    def __enter__(self):
+        while not self.i2c.try_lock():
+            time.sleep(0)
+        return self
+
+    def __exit__(self, *exc):
+        self.i2c.unlock()
+        return False
+
+    def readinto(self, buffer, *, start=0, end=None):
+        self.i2c.readfrom_into(self.device_address, buffer, start=start, end=end)
+
+    def write(self, buffer, *, start=0, end=None):
+        self.i2c.writeto(self.device_address, buffer, start=start, end=end)
+
+    def write_then_readinto(self, out_buffer, in_buffer, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        self.i2c.writeto_then_readfrom(self.device_address, out_buffer, in_buffer, out_start=out_start,
+                                       out_end=out_end, in_start=in_start, in_end=in_end)
+
+
+class DRV2605:
+    """ driver of the DRV2605L with the functions of adafruit_drv2605.DRV2605 used by the firmware \
+        (same register access at initialisation)
+        """
+
+    REG_STATUS = 0x00
+    REG_MODE = 0x01
+    REG_RTPIN = 0x02
+    REG_LIBRARY = 0x03
+    REG_GO = 0x0C
+    REG_FEEDBACK = 0x1A
+    REG_CONTROL3 = 0x1D
+    INIT = ((0x01, 0x00), (0x02, 0x00), (0x04, 0x01), (0x05, 0x00), (0x0D, 0x00), (0x0E, 0x00),
+            (0x0F, 0x00), (0x10, 0x00), (0x13, 0x64))   # out of standby, no rtp, strong click, no overdrive
+
+    def __init__(self, i2c, address=DRV_ADDR):
+        self._device = I2CDevice(i2c, address)
+        self._buffer = bytearray(2)
+        if (self._read_u8(self.REG_STATUS) >> 5) & 0x07 not in (3, 7):   # device id DRV2605 / DRV2605L
+            raise RuntimeError("Failed to find DRV2605, check wiring!")
+        for register, value in self.INIT:
+            self._write_u8(register, value)
+        self.use_ERM()
+        self._write_u8(self.REG_CONTROL3, self._read_u8(self.REG_CONTROL3) | 0x20)
+        self.mode = 0x00   # MODE_INTTRIG
+        self._write_u8(self.REG_LIBRARY, 0x01)   # LIBRARY_TS2200A
+
+
+    #################### Function Section ####################
+
+    def _read_u8(self, address):
+        with self._device as i2c:
+            self._buffer[0] = address & 0xFF
+            i2c.write_then_readinto(self._buffer, self._buffer, out_end=1, in_end=1)
+        return self._buffer[0]
+
+    def _write_u8(self, address, val):
+        with self._device as i2c:
+            self._buffer[0] = address & 0xFF
+            self._buffer[1] = val & 0xFF
+            i2c.write(self._buffer, end=2)
+
+    def play(self):
+        self._write_u8(self.REG_GO, 1)
+
+    def stop(self):
+        self._write_u8(self.REG_GO, 0)
+
+    @property
+    def mode(self):
+        return self._read_u8(self.REG_MODE)
+
+    @mode.setter
+    def mode(self, val):
+        if not 0 <= val <= 7:
+            raise ValueError("Mode must be a value within 0-7!")
+        self._write_u8(self.REG_MODE, val)
+
+    @property
+    def realtime_value(self):
+        return self._read_u8(self.REG_RTPIN)
+
+    @realtime_value.setter
+    def realtime_value(self, val):
+        if not -127 <= val <= 255:
+            raise ValueError("Real-Time Playback value must be between -127 and 255!")
+        self._write_u8(self.REG_RTPIN, val)
+
+    def use_ERM(self):
+        self._write_u8(self.REG_FEEDBACK, self._read_u8(self.REG_FEEDBACK) & 0x7F)
+
+    def use_LRM(self):
+        self._write_u8(self.REG_FEEDBACK, self._read_u8(self.REG_FEEDBACK) | 0x80)
+
+
+class Simulated:
+    """ backend of hal with in-memory devices and simulated duration per transaction """
+
+    def __init__(self, latency=0.0005, uart_latency=0.0, channels=(0, 1), distance=150, calibration=1.0,
+                 clock=time.monotonic):
+        self.latency = latency   # duration of one i2c-transaction [s]
+        self.uart_latency = uart_latency   # duration of one uart read [s]
+        self.clock = clock
+        self.gpio_device = FakeGPIO()   # buttons and switch, all inputs 1 (pull up)
+        self.sensors = {   # devices on the main bus
+            TFLUNA_ADDR: FakeTfLuna(distance=distance, clock=clock),
+            URM09_ADDR: FakeURM09(distance=distance, conversion=URM09_CONVERSION, clock=clock),
+            }
+        self.drvs = {n: FakeDRV2605(calibration=calibration, clock=clock) for n in channels}   # per channel
+        self.bus = FakeI2C(devices=self.sensors, channels={n: {DRV_ADDR: drv} for n, drv in self.drvs.items()},
+                           latency=latency)
+        self.uarts = []   # FakeSerial objects of uart()
+        # calibration cache of the simulated DRV2605L, separate from the cache of the real ones
+        self.cache_file = os.path.join(tempfile.gettempdir(), "smartcane_sim_calibration.json")
+        self.running = False   # True while the obstacle moves
+
+
+    #################### Function Section ####################
+
+    def gpio(self):
+        return self.gpio_device
+
+    def smbus(self, port):
+        return FakeSMBus(port, self.sensors, self.latency)
+
+    def i2c(self, port=1):
+        return self.bus
+
+    def uart(self, port, baudrate, timeout=None):
+        ser = FakeSerial(port, baudrate, timeout, distance=self.sensors[URM09_ADDR].distance * 10,
+                         latency=self.uart_latency, clock=self.clock)
+        self.uarts.append(ser)
+        return ser
+
+    def drv2605(self, i2c):
+        return DRV2605(i2c)
+
+    def set_distance(self, distance):
+        """ distance of the obstacle for all sensors [cm] """
+        for device in self.sensors.values():
+            device.distance = distance
+        for ser in self.uarts:
+            ser.distance = distance * 10
+
+    def move(self, period, near=30, far=200):
+        """ obstacle moves between far and near [cm] with period [s] (thread), until cleanup() """
+        def run():
+            t_start = self.clock()
+            while self.running:
+                phase = 2 * math.pi * (self.clock() - t_start) / period
+                self.set_distance(int((far + near) / 2 - (far - near) / 2 * math.cos(phase)))
+                time.sleep(0.005)
+
+        self.running = True
+        threading.Thread(target=run, name="obstacle", daemon=True).start()
+
+    def cleanup(self):
+        self.running = False
+        self.gpio_device.cleanup()
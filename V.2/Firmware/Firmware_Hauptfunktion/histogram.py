@@ -0,0 +1,122 @@
+"""V1.0
+Module for fixed-size histograms used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A histogram has fixed bins (upper bounds, logarithmic by default), record()
+only increments a counter and allocates nothing, so it can be used in the
+sampling and control paths. Percentiles are the upper bound of the bin
+(resolution of the bins), the maximum is exact.
+"""
+
+
+#################### import section ####################
+
+import bisect
+
+
+#################### variables section ####################
+
+BOUNDS_MIN = 10e-6   # upper bound of the first bin [s]
+BOUNDS_MAX = 1.0   # upper bound of the last closed bin [s], larger values -> overflow bin
+BINS_PER_DECADE = 10
+
+
+def log_bounds(minimum=BOUNDS_MIN, maximum=BOUNDS_MAX, per_decade=BINS_PER_DECADE):
+    """ logarithmic upper bounds of bins from minimum to maximum """
+    bounds = []
+    n = 0
+    while True:
+        bound = minimum * 10 ** (n / per_decade)
+        if bound > maximum * (1 + 1e-9):
+            return tuple(bounds)
+        bounds.append(bound)
+        n = n + 1
+
+
+class Histogram:
+    """ counts of values in fixed bins """
+
+    def __init__(self, name="", bounds=None):
+        self.name = name
+        self.bounds = bounds if bounds is not None else log_bounds()   # upper bounds of bins, ascending
+        self.counts = [0] * (len(self.bounds) + 1)   # last bin: values above bounds[-1]
+        self.n = 0   # number of values
+        self.sum = 0.0
+        self.max = 0.0
+
+
+    #################### Function Section ####################
+
+    def record(self, value):
+        """ add one value """
+        i = bisect.bisect_left(self.bounds, value)
+        self.counts[i] = self.counts[i] + 1
+        self.n = self.n + 1
+        self.sum = self.sum + value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """ add the counts of a histogram with the same bins """
+        for i, count in enumerate(other.counts):
+            self.counts[i] = self.counts[i] + count
+        self.n = self.n + other.n
+        self.sum = self.sum + other.sum
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.n = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def percentile(self, p):
+        """ upper bound of the bin of percentile p (0...100), maximum for the overflow bin """
+        if self.n == 0:
+            return 0.0
+        rank = p / 100 * self.n
+        total = 0
+        for i, count in enumerate(self.counts):
+            total = total + count
+            if total >= rank and count:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def mean(self):
+        return self.sum / self.n if self.n else 0.0
+
+    def summary(self, scale=1000, unit="ms"):
+        """ one text line: number, mean, percentiles and maximum """
+        return (f"{self.name}: n {self.n}, mean {self.mean() * scale:.2f} {unit}, "
+                f"p50 {self.percentile(50) * scale:.2f}, p99 {self.percentile(99) * scale:.2f}, "
+                f"p99.9 {self.percentile(99.9) * scale:.2f}, max {self.max * scale:.2f} {unit}")
+
+    def lines(self, scale=1000, unit="ms", width=40):
+        """ text lines of the occupied bins with bars """
+        peak = max(self.counts) if self.n else 1
+        lines = []
+        for i, count in enumerate(self.counts):
+            if count == 0:
+                continue
+            label = f"<= {self.bounds[i] * scale:8.3f}" if i < len(self.bounds) else f" > {self.bounds[-1] * scale:8.3f}"
+            lines.append(f"  {label} {unit} {count:>7} {'#' * max(1, round(width * count / peak))}")
+        return lines
+
+
+#################### Test program ####################
+
+if __name__ == "__main__":
+
+    h = Histogram("test")
+    for value in (5e-6, 20e-6, 20e-6, 1e-3, 2.0):
+        h.record(value)
+    assert h.n == 5 and h.max == 2.0
+    assert h.counts[0] == 1 and h.counts[-1] == 1
+    assert 20e-6 <= h.percentile(50) < 26e-6   # upper bound of the bin of 20 us
+    assert h.percentile(100) == 2.0
+    g = Histogram("test")
+    g.merge(h)
+    assert g.counts == h.counts and g.n == 5
+    print(h.summary())
+    for line in h.lines():
+        print(line)
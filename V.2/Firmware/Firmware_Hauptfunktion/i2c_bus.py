@@ -0,0 +1,93 @@
+"""V1.0
+Module for a shared i2c-bus session used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The bus is opened once and borrowed by all sensor drivers (URM09, TfLuna),
+instead of opening and closing /dev/i2c-x for every single sample.
+"""
+
+
+#################### import section ####################
+
+import time
+
+import hal
+
+
+class I2CBus:
+    """ long-lived session on one i2c-bus, shared by the sensor drivers """
+
+    # constants
+    RETRIES = 1   # number of reconnects before an error is passed to the driver
+
+    def __init__(self, I2CPort=1, bus_class=None):
+        self.I2CPort = I2CPort   # I2C(1), /dev/i2c-1, pins 3/5
+        # class of bus object (SMBus, i2c_rdwr.I2CRdwr or fake bus for benchmark), None -> smbus of the hal backend
+        self.bus_class = bus_class if bus_class is not None else hal.backend().smbus
+        self.bus = None   # bus object, None if bus is closed
+        self.combined = False   # True if the bus object has write_read_block_data (i2c_rdwr.I2CRdwr), set by open
+        self.transactions = 0   # number of successful transactions
+        self.bus_time = 0.0   # accumulated time of all transactions [s]
+        self.reconnects = 0   # number of reconnects after errors
+        self.open()
+
+
+    #################### Function Section ####################
+
+    def open(self):
+        """ open bus, if not already open """
+        if self.bus is None:
+            self.bus = self.bus_class(self.I2CPort)   # SMBus(port) opens /dev/i2c-<port>
+            self.combined = hasattr(self.bus, "write_read_block_data")
+
+    def close(self):
+        """ close bus, errors while closing a broken bus are ignored """
+        if self.bus is not None:
+            try:
+                self.bus.close()
+            except IOError:
+                pass
+            self.bus = None
+
+    def reconnect(self):
+        """ drop the current file handle, bus is opened again with next transaction """
+        self.close()
+        self.reconnects = self.reconnects + 1
+
+    def _transfer(self, func_name, *args):
+        """ execute one transaction, reconnect and repeat once on IOError """
+        attempt = 0
+        while True:
+            try:
+                self.open()
+                t_start = time.perf_counter()
+                result = getattr(self.bus, func_name)(*args)
+                self.bus_time = self.bus_time + time.perf_counter() - t_start
+                self.transactions = self.transactions + 1
+                return result
+            except IOError:
+                if attempt >= self.RETRIES:
+                    raise   # device is not answering, pass error to driver
+                attempt = attempt + 1
+                self.reconnect()
+
+    def write_quick(self, I2CAddr):
+        """ perform quick transaction, throws IOError if unsuccesfull """
+        return self._transfer("write_quick", I2CAddr)
+
+    def write_byte_data(self, I2CAddr, register, value):
+        """ write a byte to a given register """
+        return self._transfer("write_byte_data", I2CAddr, register, value)
+
+    def read_i2c_block_data(self, I2CAddr, register, length):
+        """ read a block of byte data from a given register """
+        return self._transfer("read_i2c_block_data", I2CAddr, register, length)
+
+    def write_read_block_data(self, I2CAddr, write_register, write_value, register, length):
+        """ write a byte to a register, then read a block of byte data, \
+            as one transfer if the bus supports it (i2c_rdwr.I2CRdwr), else as two transactions
+            """
+        if self.combined:   # known from the first open, a closed bus is opened again by _transfer
+            return self._transfer("write_read_block_data", I2CAddr, write_register, write_value, register, length)
+        self.write_byte_data(I2CAddr, write_register, write_value)
+        return self.read_i2c_block_data(I2CAddr, register, length)
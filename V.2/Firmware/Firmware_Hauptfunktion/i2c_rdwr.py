@@ -0,0 +1,148 @@
+"""V1.0
+Module for low-level i2c-access via I2C_RDWR ioctl used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Every transfer (e.g. register-pointer write + read with repeated start) is sent
+to the kernel as one I2C_RDWR message batch, so one transfer is one syscall.
+The device address is part of each message, no I2C_SLAVE ioctl is needed when
+switching between devices. Message structures and buffers are allocated once.
+
+I2CRdwr can be used as bus_class of i2c_bus.I2CBus (smbus-like functions) and
+as i2c-object of actuator.Actuator (busio.I2C-like functions).
+"""
+
+
+#################### import section ####################
+
+import ctypes
+import fcntl
+import os
+import threading
+
+
+#################### variables section ####################
+
+I2C_RDWR = 0x0707   # ioctl: combined read/write transfer (linux/i2c-dev.h)
+I2C_M_RD = 0x0001   # message flag: read data from slave
+
+
+class i2c_msg(ctypes.Structure):
+    """ struct i2c_msg of linux/i2c.h """
+    _fields_ = [
+        ("addr", ctypes.c_uint16),
+        ("flags", ctypes.c_uint16),
+        ("len", ctypes.c_uint16),
+        ("buf", ctypes.POINTER(ctypes.c_uint8)),
+        ]
+
+
+class i2c_rdwr_ioctl_data(ctypes.Structure):
+    """ struct i2c_rdwr_ioctl_data of linux/i2c-dev.h """
+    _fields_ = [
+        ("msgs", ctypes.POINTER(i2c_msg)),
+        ("nmsgs", ctypes.c_uint32),
+        ]
+
+
+class I2CRdwr:
+    """ i2c-bus with one I2C_RDWR ioctl per transfer and preallocated buffers """
+
+    # constants
+    MAX_MSGS = 3   # maximum number of messages per transfer
+    MAX_LENGTH = 32   # maximum length of one message [bytes]
+
+    def __init__(self, I2CPort=1):
+        self.I2CPort = I2CPort   # I2C(1), /dev/i2c-1, pins 3/5
+        self.fd = os.open(f"/dev/i2c-{I2CPort}", os.O_RDWR)
+        self.ioctls = 0   # number of ioctl calls
+        self.lock = threading.Lock()   # bus lock of busio-like functions (several threads)
+
+        # preallocated messages, every message has its own buffer
+        self.buffers = [(ctypes.c_uint8 * self.MAX_LENGTH)() for _ in range(self.MAX_MSGS)]
+        self.views = [memoryview(buf).cast("B") for buf in self.buffers]   # byte views for reading
+        self.msgs = (i2c_msg * self.MAX_MSGS)()
+        for n in range(self.MAX_MSGS):
+            self.msgs[n].buf = self.buffers[n]
+        self.data = i2c_rdwr_ioctl_data(self.msgs, 0)
+
+
+    #################### Function Section ####################
+
+    def close(self):
+        """ close bus """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def transfer(self, addr, writes=(), read_length=0):
+        """ send all write messages and an optional read message as one batch \
+            (repeated start between messages), returns memoryview of read data
+            """
+        n = 0
+        for data in writes:
+            length = len(data)
+            self.buffers[n][:length] = data
+            self.msgs[n].addr = addr
+            self.msgs[n].flags = 0
+            self.msgs[n].len = length
+            n = n + 1
+        if read_length > 0:
+            self.msgs[n].addr = addr
+            self.msgs[n].flags = I2C_M_RD
+            self.msgs[n].len = read_length
+            n = n + 1
+        self.data.nmsgs = n
+        fcntl.ioctl(self.fd, I2C_RDWR, self.data)
+        self.ioctls = self.ioctls + 1
+        if read_length > 0:
+            return self.views[n - 1][:read_length]
+        return None
+
+
+    ### smbus-like functions (i2c_bus.I2CBus) ###
+
+    def write_quick(self, addr):
+        """ zero-length write, throws IOError if device does not answer """
+        self.transfer(addr, (b"",))
+
+    def write_byte_data(self, addr, register, value):
+        self.transfer(addr, ((register, value),))
+
+    def read_i2c_block_data(self, addr, register, length):
+        return list(self.transfer(addr, ((register,),), length))
+
+    def write_read_block_data(self, addr, write_register, write_value, register, length):
+        """ write a byte to a register and read a block in one transfer (e.g. trigger + read) """
+        return list(self.transfer(addr, ((write_register, write_value), (register,)), length))
+
+
+    ### busio.I2C-like functions (actuator.Actuator, adafruit drivers) ###
+
+    def try_lock(self):
+        return self.lock.acquire(blocking=False)
+
+    def unlock(self):
+        self.lock.release()
+
+    def scan(self):
+        found = []
+        for addr in range(0x08, 0x78):
+            try:
+                self.write_quick(addr)
+                found.append(addr)
+            except OSError:
+                pass
+        return found
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self.transfer(address, (buffer[start:end],))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        buffer[start:end] = self.transfer(address, (), end - start)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *,
+                              out_start=0, out_end=None, in_start=0, in_end=None):
+        in_end = len(buffer_in) if in_end is None else in_end
+        buffer_in[in_start:in_end] = self.transfer(
+            address, (buffer_out[out_start:out_end],), in_end - in_start)
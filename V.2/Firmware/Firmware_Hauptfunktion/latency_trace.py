@@ -0,0 +1,101 @@
+"""V1.0
+Module for the sensor-to-vibration latency trace used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Trace points of one feedback path:
+capture   time of the measurement (sample.Sample.t_capture, set by the sensor)
+fusion    feedback value calculated from the sample (data_procession.getFeedback)
+stage     new stage decided (actuator.Actuator.set_actuator), in continuous
+          mode new pulse rate or amplitude taken over (rtp_stream.RtpStream)
+commit    register writes of the new stage sent to the DRVs (end of the batch),
+          in continuous mode the first RTP write after the take-over
+stage and commit of the continuous mode are called by the thread of the rtp
+stream, the trace points are protected by a lock.
+A change of stage records the intervals between the points and the end-to-end
+latency capture -> commit into fixed-size histograms (histogram.Histogram), so
+tracing costs only a few microseconds per main loop iteration. report() gives
+percentiles, main.py prints it on SIGUSR1 and at shutdown.
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import histogram
+
+
+#################### variables section ####################
+
+INTERVALS = ("capture-fusion", "fusion-stage", "stage-commit", "capture-commit")
+
+
+class LatencyTrace:
+    """ trace points of the feedback path and histograms of their intervals """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock   # time source [s], same as t_capture of the samples
+        self.histograms = {name: histogram.Histogram(name) for name in INTERVALS}
+        self.t_capture = None   # capture of the sample of the last fusion, None if no valid sample
+        self.t_fusion = None   # time of the last fusion
+        self.t_stage = None   # time of the stage decision, None if no change of stage is pending
+        self.stage_fusion = (None, None)   # fusion and capture time of the stage decision
+        self.lock = threading.Lock()   # protects the trace points (rtp stream thread and main loop)
+
+
+    #################### Function Section ####################
+
+    def fusion(self, t_capture):
+        """ trace point fusion: feedback value of a sample captured at t_capture (None -> no valid sample) """
+        with self.lock:
+            self.t_fusion = self.clock()
+            self.t_capture = t_capture
+
+    def stage(self):
+        """ trace point stage: change of stage decided (on the feedback value of the last fusion) """
+        with self.lock:
+            self.t_stage = self.clock()
+            self.stage_fusion = (self.t_fusion, self.t_capture)
+
+    def commit(self):
+        """ trace point commit: writes of the new stage are sent, record the intervals of this path """
+        with self.lock:
+            if self.t_stage is None:
+                return
+            t_commit = self.clock()
+            t_fusion, t_capture = self.stage_fusion
+            self.histograms["stage-commit"].record(t_commit - self.t_stage)
+            if t_fusion is not None:
+                self.histograms["fusion-stage"].record(self.t_stage - t_fusion)
+                if t_capture is not None:
+                    self.histograms["capture-fusion"].record(t_fusion - t_capture)
+                    self.histograms["capture-commit"].record(t_commit - t_capture)
+            self.t_stage = None
+
+    def percentiles(self, name, ps=(50, 90, 99, 99.9)):
+        """ percentiles [s] of interval name """
+        return [self.histograms[name].percentile(p) for p in ps]
+
+    def report(self):
+        """ percentiles of all intervals as text lines (end-to-end first) """
+        lines = [self.histograms["capture-commit"].summary()]
+        for name in INTERVALS[:-1]:
+            lines.append(self.histograms[name].summary())
+        return lines
+
+
+#################### Test program ####################
+
+if __name__ == "__main__":
+
+    # report of one change of stage 33 ms after the capture (tests: Firmware_Unittest/test_latency_trace.py)
+    now = [10.0]
+    trace = LatencyTrace(clock=lambda: now[0])
+    trace.fusion(9.97)   # sample captured 30 ms before fusion
+    now[0] = 10.001
+    trace.stage()
+    now[0] = 10.003
+    trace.commit()
+    for line in trace.report():
+        print(line)
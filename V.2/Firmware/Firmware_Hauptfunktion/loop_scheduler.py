@@ -0,0 +1,121 @@
+"""V1.0
+Module for the fixed-rate scheduler of the main loop used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The main loop runs once per period of the control rate. Deadlines are
+multiples of the period from the start (no drift), the loop sleeps until the
+next deadline instead of spinning. An iteration which ends after the next
+deadline is an overrun, the missed deadlines are counted and skipped. Wakeup
+jitter (wakeup - deadline), CPU time of the loop and the duration of each
+phase of an iteration are recorded.
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import time
+
+import rt_profile
+
+
+class LoopPhase:
+    """ statistics of one phase of the main loop """
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0   # number of executions
+        self.busy = 0.0   # accumulated duration [s]
+        self.busy_max = 0.0   # worst-case duration [s]
+
+    def record(self, duration):
+        """ add one execution """
+        self.runs = self.runs + 1
+        self.busy = self.busy + duration
+        if duration > self.busy_max:
+            self.busy_max = duration
+
+
+class LoopScheduler:
+    """ deadline-driven scheduler of a periodic loop """
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep, cpu_clock=time.thread_time, name="main"):
+        self.name = name   # name of the thread for rt_profile
+        self.period = 1 / rate   # [s]
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.sleep = sleep
+        self.cpu_clock = cpu_clock   # cpu time of the loop thread [s]
+        self.phases = {}   # name -> LoopPhase, in order of first use
+        self.t_start = None   # first deadline
+        self.t_deadline = None   # deadline of running iteration
+        self.n = 0   # number of running iteration (deadline = t_start + n * period)
+        self.cpu_start = 0.0
+        self.loops = 0   # number of finished iterations
+        self.overruns = 0   # iterations which ended after the next deadline
+        self.missed = 0   # skipped deadlines
+        self.jitter_sum = 0.0   # accumulated wakeup jitter [s]
+        self.jitter_max = 0.0   # worst-case wakeup jitter [s]
+
+
+    #################### Function Section ####################
+
+    def start(self):
+        """ first deadline is now """
+        self.t_start = self.clock()
+        self.t_deadline = self.t_start
+        self.n = 0
+        self.cpu_start = self.cpu_clock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ measure the duration of a phase of the iteration """
+        if name not in self.phases:
+            self.phases[name] = LoopPhase(name)
+        t_begin = self.clock()
+        try:
+            yield
+        finally:
+            self.phases[name].record(self.clock() - t_begin)
+
+    def wait(self):
+        """ end of iteration: sleep until the next deadline, returns the number of missed deadlines """
+        if self.t_start is None:
+            self.start()
+            return 0
+        self.loops = self.loops + 1
+        self.n = self.n + 1
+        now = self.clock()
+        missed = 0
+        if now > self.t_start + self.n * self.period:   # overrun, next deadline in the future
+            missed = int((now - self.t_start) / self.period) - self.n + 1
+            self.overruns = self.overruns + 1
+            self.missed = self.missed + missed
+            self.n = self.n + missed
+        self.t_deadline = self.t_start + self.n * self.period
+        t_wait = self.t_deadline - now
+        if t_wait > 0:
+            self.sleep(t_wait)
+        jitter = self.clock() - self.t_deadline
+        rt_profile.record(self.name, jitter)
+        self.jitter_sum = self.jitter_sum + jitter
+        if jitter > self.jitter_max:
+            self.jitter_max = jitter
+        return missed
+
+    def cpu_load(self):
+        """ cpu time of the loop thread / elapsed time since start """
+        if self.t_start is None:
+            return 0.0
+        return (self.cpu_clock() - self.cpu_start) / max(self.clock() - self.t_start, 1e-9)
+
+    def report(self):
+        """ return loop rate, cpu load, jitter, missed deadlines and phase durations as text lines """
+        t_total = max(self.clock() - self.t_start, 1e-9) if self.t_start is not None else 1e-9
+        jitter_mean = self.jitter_sum / self.loops if self.loops else 0.0
+        lines = [f"main loop: {self.loops / t_total:.1f}/s (target {1 / self.period:.1f}/s), cpu "
+                 f"{100 * self.cpu_load():.1f} %, jitter mean {jitter_mean * 1000:.2f} ms, max "
+                 f"{self.jitter_max * 1000:.2f} ms, {self.overruns} overrun(s), {self.missed} missed deadline(s)"]
+        for phase in self.phases.values():
+            busy_mean = phase.busy / phase.runs if phase.runs else 0.0
+            lines.append(f"  {phase.name}: mean {busy_mean * 1000:.3f} ms, max {phase.busy_max * 1000:.3f} ms")
+        return lines
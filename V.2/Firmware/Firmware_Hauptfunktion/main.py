@@ -11,25 +11,28 @@ import time
 import datetime
 import os
 import threading
+import signal
 
-import RPi.GPIO as GPIO
-import board
-import busio
-
-import adafruit_drv2605
-import adafruit_tca9548a
+import hal
+import hal_sim
 
 import actuator  # written by MW
 import button  # written by MW
 import switch # written by MW
 import sensors # written by TE
+import i2c_bus
+import bus_scheduler
+import loop_scheduler
+import wakeup
+import acquisition
+import sample
+import rt_profile
+import latency_trace
 import data_procession # written by TE
 
 
 #################### variables section ####################
 
-GPIO.setmode(GPIO.BCM)
-
 ACTUATOR_NO = [1, 1]   # channel of Actuators (global)
 ACTUATOR_TYPE = [2414, 2414]   # type of actuator: 2608 (Grewus EXS 2608L-03A) or \
 # 2414 (Grewus EXS 241408W B)
@@ -41,43 +44,34 @@ BUTTON_PIN = [17, 27]   # Pins for Mute-Mode [0] and Distance-Mode [1]: pressed
 
 SWITCH_PIN = [23, 24, 25]   # pins of turning switch, 0 = active, 1 = inactive
 
-run = True
+LIDAR_CONTINUOUS = False   # True -> TF-Luna free-runs at LIDAR_FRAME_RATE, no trigger per sample
+LIDAR_FRAME_RATE = 100   # frame rate of TF-Luna in continuous mode [Hz] (above 50 Hz polling rate)
+SENSOR_DEADLINE = 0.01   # maximum bus time of one sensor read [s]
+USE_I2C_RDWR = True   # True -> one I2C_RDWR ioctl per transfer (i2c_rdwr), False -> smbus / busio
+USE_SEQUENCER = False   # True -> pulses of stage 1-4 timed by waveform sequencer of DRV2605L, \
+# False -> every pulse started by pattern engine
+USE_BROADCAST = False   # True -> equal register writes to all DRV2605L with one transfer (TCA9548A \
+# channels enabled together), reads per channel
+CONTINUOUS_FEEDBACK = False   # True -> pulse rate and amplitude follow the feedback value (rtp_stream), \
+# False -> 6 stages (Actuator.set_actuator)
+LOOP_RATE = 50   # iterations of the main loop per second (lidar samples at 50 Hz)
+EVENT_DRIVEN = False   # True -> main loop runs on new samples, button and switch events (wakeup), \
+# False -> main loop runs at LOOP_RATE
+ACQUISITION_PROCESS = False   # True -> sensors polled by an own process, samples in shared memory \
+# (acquisition), main loop runs at LOOP_RATE
+RT_PROFILE = False   # True -> SCHED_FIFO priorities, cores and locked memory for the threads (rt_profile), \
+# normal priority if not permitted
+HAL_BACKEND = os.environ.get("SMARTCANE_HAL", "pi")   # "pi" -> RPi.GPIO, i2c-1, uart, DRV2605L (hal), \
+# "sim" -> in-memory devices (hal_sim), e.g. SMARTCANE_HAL=sim python3 main.py on a Linux machine
+SIM_LATENCY = float(os.environ.get("SMARTCANE_SIM_LATENCY", "0.0005"))   # duration of one simulated \
+# i2c-transaction [s]
+SIM_MOVE_PERIOD = 4.0   # period of the simulated obstacle 30 -> 200 -> 30 cm [s]
+
 value = 0
 ultrasonic_exception = None   # Exception for ultrasonic thread
 lidar_exception = None   # Exception for lidar thread
 
 
-#################### GPIO declaration ####################
-
-GPIO.setup(   # Declaration of Button 0 with internal pull up resistor
-    BUTTON_PIN[0],
-    GPIO.IN,
-    pull_up_down=GPIO.PUD_UP
-    )
-GPIO.setup(      # Declaration of Button 1 with internal pull up resistor
-    BUTTON_PIN[1],
-    GPIO.IN,
-    pull_up_down=GPIO.PUD_UP
-    )
-#
-GPIO.setup(   # Declaration of switch-state 0 with internal pull up resistor
-    SWITCH_PIN[0],
-    GPIO.IN,
-    pull_up_down=GPIO.PUD_UP
-    )
-GPIO.setup(   # Declaration of switch-state 1 with internal pull up resistor
-    SWITCH_PIN[1],
-    GPIO.IN,
-    pull_up_down=GPIO.PUD_UP
-    )
-GPIO.setup(   # Declaration of switch-state 2 with internal pull up resistor
-    SWITCH_PIN[2],
-    GPIO.IN,
-    pull_up_down=GPIO.PUD_UP
-    )
-
-
-
 #################### Function section ####################
 
 def erase_button_edges():
@@ -97,78 +91,154 @@ def cb_button_time(pin):
 
 
     if pin == BUTTON_PIN[0]:
-        if GPIO.input(pin):
+        if gpio.input(pin):
             button_edge[0][1] = time.monotonic()
             #print("Timestamp rising edge Button 1: ", button_edge[0][1]
         else:
             button_edge[0][0] = time.monotonic()
             #print("Timestamp falling edge Button 1: ", button_edge[0][0])
     elif pin == BUTTON_PIN[1]:
-        if GPIO.input(pin):
+        if gpio.input(pin):
             button_edge[1][1] = time.monotonic()
             #print("Timestamp rising edge Button 2: ", button_edge[1][1]
         else:
             button_edge[1][0] = time.monotonic()
             #print("Timestamp falling edge Button 2: ", button_edge[1][0])
+    wakeup_events.signal("button")   # main loop handles the edge
 
 
-# lock for i2c communication
-i2c_lock = threading.Lock()
+def cb_switch(pin):
+    """ Callback Function for a change of the turning switch """
+    wakeup_events.signal("switch")
 
 
-## class section for threads ##
-class ultrasonicThread(threading.Thread):
-    """ Thread for ultrasonic sensor """
+def print_trace(signum=None, frame=None):
+    """ print percentiles of the sensor-to-vibration latency (signal handler of SIGUSR1) """
+    for line in trace.report():
+        print(line)
 
-    def __init__(self):
-        threading.Thread.__init__(self)
-        self.sensor_1 = sensors.URM09()
-
-    def run(self):
-        while run:
-            i2c_lock.acquire()   # lock i2c-communication
-            self.sensor_1.getDistance()
-            i2c_lock.release()   # unlock i2c-communication
-            if self.sensor_1.distance == -1:   # no sensor connection, create exception for shutdown
-                global ultrasonic_exception
-                ultrasonic_exception = IOError("[Errno 121] Remote I/O error")   # no connection to i2c device
-            time.sleep(0.05)   # 20 Hz cycle
-
-class lidarThread(threading.Thread):
-    """ Thread for lidar sensor """
 
-    def __init__(self):
-        threading.Thread.__init__(self)
-        self.sensor_2 = sensors.TfLuna()
+def print_sensor_latency(*sensor_list):
+    """ print worst-case read latency and missed deadlines of sensors \
+        (split-phase sensors: also worst-case of the trigger and collect phase)
+        """
+    for sensor in sensor_list:
+        phase = ""
+        if hasattr(sensor, "phase_latency_max"):
+            phase = f" (phase {sensor.phase_latency_max * 1000:.2f} ms)"
+        print(f"{type(sensor).__name__}: worst-case read latency "
+              f"{sensor.latency_max * 1000:.2f} ms{phase}, {sensor.timeouts} missed deadline(s)")
 
-    def run(self):
-        while run:
-            i2c_lock.acquire()   # lock i2c-communication
-            self.sensor_2.getDistance()
-            i2c_lock.release()   # unlock i2c-communication
-            if self.sensor_2.distance == -1:   # no sensor connection, create exception for shutdown
-                global lidar_exception
-                lidar_exception = IOError("[Errno 121] Remote I/O error")   # no connection to i2c device
-            time.sleep(0.02)   # 50 Hz cycle
 
+## class section for sensor polls (executed by bus scheduler) ##
+class ultrasonicPoll:
+    """ Time slots of ultrasonic sensor: trigger at 20 Hz, collect after conversion """
 
-#################### Interrupt-Handler ####################
+    PERIOD = 0.05   # 20 Hz cycle
+    OFFSET = 0.005   # time slot between two lidar polls
 
-# Button 0 Interrupt service routine
-GPIO.add_event_detect(
-    BUTTON_PIN[0],
-    GPIO.BOTH,
-    callback = cb_button_time,
-    bouncetime = 50
-    )
+    def __init__(self):
+        self.sensor_1 = sensors.URM09(bus=sensor_bus)
+
+    def trigger(self):
+        """ slot 1: start measurement, bus is free for other clients during conversion """
+        status = self.sensor_1.triggerDistance(time.monotonic() + SENSOR_DEADLINE)
+        if status == sensors.STA_OK:   # slot 2: read result after conversion
+            scheduler.submit(
+                "ultrasonic",
+                self.collect,
+                priority=bus_scheduler.PRIO_SENSOR,
+                t_due=time.monotonic() + self.sensor_1.CONVERSION_TIME
+                )
+        self.check(status)
+
+    def collect(self):
+        """ slot 2: read result of measurement """
+        self.check(self.sensor_1.collectDistance(time.monotonic() + SENSOR_DEADLINE))
+
+    def check(self, status):
+        if status == sensors.STA_ERR_DATA:   # no sensor connection, create exception for shutdown
+            global ultrasonic_exception
+            ultrasonic_exception = IOError("[Errno 121] Remote I/O error")   # no connection to i2c device
+
+class lidarPoll:
+    """ Time slots of lidar sensor: read at 50 Hz """
+
+    PERIOD = 0.02   # 50 Hz cycle
+    OFFSET = 0.0
 
-# Button 1 Interrupt service routine
-GPIO.add_event_detect(
-    BUTTON_PIN[1],
-    GPIO.BOTH,
-    callback = cb_button_time,
-    bouncetime = 50
-    )
+    def __init__(self):
+        self.sensor_2 = sensors.TfLuna(
+            bus=sensor_bus,
+            continuous=LIDAR_CONTINUOUS,
+            frame_rate=LIDAR_FRAME_RATE
+            )
+
+    def poll(self):
+        status = self.sensor_2.getDistance(time.monotonic() + SENSOR_DEADLINE)
+        if status == sensors.STA_ERR_DATA:   # no sensor connection, create exception for shutdown
+            global lidar_exception
+            lidar_exception = IOError("[Errno 121] Remote I/O error")   # no connection to i2c device
+
+
+#################### GPIO declaration and Interrupt-Handler ####################
+
+def setup_gpio():
+    """ declaration of buttons and switch-states, interrupt service routines (called by main program) """
+
+    gpio.setmode(gpio.BCM)
+
+    gpio.setup(   # Declaration of Button 0 with internal pull up resistor
+        BUTTON_PIN[0],
+        gpio.IN,
+        pull_up_down=gpio.PUD_UP
+        )
+    gpio.setup(      # Declaration of Button 1 with internal pull up resistor
+        BUTTON_PIN[1],
+        gpio.IN,
+        pull_up_down=gpio.PUD_UP
+        )
+    #
+    gpio.setup(   # Declaration of switch-state 0 with internal pull up resistor
+        SWITCH_PIN[0],
+        gpio.IN,
+        pull_up_down=gpio.PUD_UP
+        )
+    gpio.setup(   # Declaration of switch-state 1 with internal pull up resistor
+        SWITCH_PIN[1],
+        gpio.IN,
+        pull_up_down=gpio.PUD_UP
+        )
+    gpio.setup(   # Declaration of switch-state 2 with internal pull up resistor
+        SWITCH_PIN[2],
+        gpio.IN,
+        pull_up_down=gpio.PUD_UP
+        )
+
+    # Button 0 Interrupt service routine
+    gpio.add_event_detect(
+        BUTTON_PIN[0],
+        gpio.BOTH,
+        callback = cb_button_time,
+        bouncetime = 50
+        )
+
+    # Button 1 Interrupt service routine
+    gpio.add_event_detect(
+        BUTTON_PIN[1],
+        gpio.BOTH,
+        callback = cb_button_time,
+        bouncetime = 50
+        )
+
+    # Turning switch Interrupt service routine (wakeup of event-driven main loop)
+    for pin in SWITCH_PIN:
+        gpio.add_event_detect(
+            pin,
+            gpio.BOTH,
+            callback = cb_switch,
+            bouncetime = 50
+            )
 
 
 
@@ -176,14 +246,69 @@ GPIO.add_event_detect(
 #################### main program ####################
 
 if __name__ == "__main__":
+
+    t_boot = time.monotonic()   # start of initialisation (boot-to-ready time)
+
+
+    ### Hardware ### -> created here, nothing is opened at import of this module
+
+    # hardware of the firmware: Raspberry Pi or in-memory devices with simulated bus latency
+    if HAL_BACKEND == "sim":
+        board_hal = hal.select(hal_sim.Simulated(latency=SIM_LATENCY))
+    else:
+        board_hal = hal.select(hal.RaspberryPi(i2c_rdwr=USE_I2C_RDWR))
+
+    gpio = board_hal.gpio()   # RPi.GPIO-like object, pins are declared by setup_gpio()
+
+    # single owner of the i2c-bus: executes sensor polls and actuator writes in time slots
+    scheduler = bus_scheduler.BusScheduler()
+
+    # main loop: one iteration per period of LOOP_RATE, sleeps until the next deadline
+    loop = loop_scheduler.LoopScheduler(LOOP_RATE)
+
+    # main loop in event-driven mode: sleeps until a new sample, button or switch event arrives
+    wakeup_events = wakeup.Wakeup()
+
+    # sensor-to-vibration latency: capture -> fusion -> stage -> commit (printed on SIGUSR1 and at shutdown)
+    trace = latency_trace.LatencyTrace()
+
+    # i2c-bus session of the sensors, only used by the bus scheduler (I2C_RDWR or smbus of the hal backend)
+    sensor_bus = i2c_bus.I2CBus(1, board_hal.smbus)
+
     try:
 
+        setup_gpio()
+
+        if RT_PROFILE:   # before any thread is started, threads apply their settings at start
+            rt_profile.enable()
+
+        if ACQUISITION_PROCESS:   # fork before the threads of this process are started
+            acq = acquisition.AcquisitionProcess(
+                bus_class=board_hal.smbus,
+                continuous=LIDAR_CONTINUOUS,
+                frame_rate=LIDAR_FRAME_RATE
+                )
+            acq.start()
+
+        if HAL_BACKEND == "sim":   # moving obstacle -> changing stages
+            board_hal.move(SIM_MOVE_PERIOD)
+
+        scheduler.start()   # owner of the i2c-bus from now on
+
+
         ### Actuator initialisation ###
-        my_actuator = actuator.Actuator(ACTUATOR_NO)
+        actuator_i2c = board_hal.i2c(1)   # I2C_RDWR or busio of the hal backend
+        my_actuator = actuator.Actuator(   # all actuator transactions are executed by the scheduler
+            ACTUATOR_NO,
+            bus_scheduler.ScheduledI2C(actuator_i2c, scheduler),
+            sequencer=USE_SEQUENCER,
+            broadcast=USE_BROADCAST,
+            trace=trace
+            )
 
         my_actuator.config_drv_to_lra()
 
-        my_actuator.autocalibration(ACTUATOR_TYPE)
+        my_actuator.calibrate(ACTUATOR_TYPE, board_hal.cache_file)   # from calibration cache, auto-calibration if needed
 
         my_actuator.set_drv_open_loop()
 
@@ -195,57 +320,122 @@ if __name__ == "__main__":
 
         ### Switch initialisation ###
 
-        my_switch = switch.Switch()
+        my_switch = switch.Switch(gpio)
 
 
         ### Sensor initialisation ###
 
         data = data_procession.DataProcession()
-        ultrasonic_thread = ultrasonicThread()
-        lidar_thread = lidarThread()
-        ultrasonic_thread.start()
-        lidar_thread.start()
+        data.trace = trace
+        if ACQUISITION_PROCESS:   # latest samples of the acquisition process (shared memory)
+            if not acq.wait_ready():   # first samples, "never measured" would be taken for a dead sensor
+                raise RuntimeError("no samples of the acquisition process")
+            sensor_1 = acq.sensor_1
+            sensor_2 = acq.sensor_2
+        else:
+            ultrasonic_poll = scheduler.call("ultrasonic", ultrasonicPoll, priority=bus_scheduler.PRIO_SENSOR)
+            lidar_poll = scheduler.call("lidar", lidarPoll, priority=bus_scheduler.PRIO_SENSOR)
+            scheduler.add_periodic("ultrasonic", ultrasonic_poll.trigger, ultrasonicPoll.PERIOD, ultrasonicPoll.OFFSET)
+            scheduler.add_periodic("lidar", lidar_poll.poll, lidarPoll.PERIOD, lidarPoll.OFFSET)
+            sensor_1 = ultrasonic_poll.sensor_1
+            sensor_2 = lidar_poll.sensor_2
+            jitter = acquisition.SamplingJitter()   # sampling jitter of the sensor polls in this process
+            sample.listeners.append(jitter.on_sample)
+        event_driven = EVENT_DRIVEN and not ACQUISITION_PROCESS   # samples of the process do not wake up
 
 
         ### Loop program ###
 
+        print(f"boot-to-ready: {time.monotonic() - t_boot:.2f} s "
+              f"(calibration {my_actuator.calibration_time:.2f} s)")
         print("Hey ho, let's go!")
 
-        while 1:
+        signal.signal(signal.SIGUSR1, print_trace)   # kill -USR1 <pid>: latency report while running
+        loop.start()
+        if event_driven:
+            wakeup_events.subscribe()   # new samples of the sensors wake up the main loop
 
-            value = data.getFeedback(
-                        ultrasonic_thread.sensor_1.distance,
-                        lidar_thread.sensor_2.distance
-                        )
+        while 1:
 
+            with loop.phase("feedback"):
+                value = data.getFeedback(   # latest published samples, stale samples are ignored
+                            sensor_1.sample,
+                            sensor_2.sample
+                            )
+
+            if ACQUISITION_PROCESS:   # no sensor connection or process ended, exception for shutdown
+                if sensor_1.sample.status == sensors.STA_ERR_DATA:
+                    ultrasonic_exception = IOError("[Errno 121] Remote I/O error")
+                if sensor_2.sample.status == sensors.STA_ERR_DATA:
+                    lidar_exception = IOError("[Errno 121] Remote I/O error")
+                if not acq.is_alive():
+                    raise RuntimeError("acquisition process stopped")
             if ultrasonic_exception:   # throw exception for shutdown
                 raise ultrasonic_exception
             if lidar_exception:
                 raise lidar_exception
 
-            button_mode[0] = my_button.but_func(0, "distance", my_actuator, button_edge)
-            button_mode[1] = my_button.but_func(1, "mute", my_actuator, button_edge)
+            with loop.phase("buttons"):
+                button_mode[0] = my_button.but_func(0, "distance", my_actuator, button_edge)
+                button_mode[1] = my_button.but_func(1, "mute", my_actuator, button_edge)
 
-            erase_button_edges()
+                erase_button_edges()
 
-            switch_state = my_switch.set_switch_state(SWITCH_PIN)
-            my_actuator.set_freq_state(switch_state)
+            with loop.phase("switch"):
+                switch_state = my_switch.set_switch_state(SWITCH_PIN)
+                my_actuator.set_freq_state(switch_state)
 
 
             data.setMode(button_mode[0])
             data.setSensor(switch_state)
 
 
-            my_actuator.set_actuator(value)
+            with loop.phase("actuator"):
+                if CONTINUOUS_FEEDBACK:
+                    my_actuator.set_continuous(value)
+                else:
+                    my_actuator.set_actuator(value)
+
+            if event_driven:   # sleep until the next event, latest when samples get stale
+                wakeup_events.wait(data.MAX_AGE)
+            else:
+                loop.wait()   # sleep until the next deadline
 
     except KeyboardInterrupt:
         print("Porgram terminated by user!")
-        run = False
-        ultrasonic_thread.join()
-        lidar_thread.join()
-        print("Threads stopped!")
         my_actuator.set_vib_const(0)
-        GPIO.cleanup()
+        my_actuator.close()
+        scheduler.stop()
+        scheduler.join()
+        sensor_bus.close()
+        print("Bus scheduler stopped!")
+        if ACQUISITION_PROCESS:
+            acq.stop()
+            jitter = acq.jitter
+            for line in acq.latency_lines:
+                print(line)
+        else:
+            print_sensor_latency(sensor_1, sensor_2)
+        if jitter is not None:
+            for line in jitter.lines():   # histograms of the sampling jitter
+                print(line)
+        for line in scheduler.report():   # bus utilization and queueing delay per client
+            print(line)
+        print(f"TCA9548A: {my_actuator.tca.switch_rate():.1f} channel switches/s, "
+              f"{my_actuator.tca.selects_saved} selects saved")
+        if event_driven:
+            print(f"main loop: {wakeup_events.rate():.1f} wakeups/s ({wakeup_events.wakeups} by events, "
+                  f"{wakeup_events.timeouts} by timeout), cpu {100 * loop.cpu_load():.1f} %")
+            for line in loop.report()[1:]:   # phase durations
+                print(line)
+        else:
+            for line in loop.report():   # loop rate, cpu load, jitter, missed deadlines, phase durations
+                print(line)
+        print(f"maximum sensor-to-feedback age: {data.age_max * 1000:.1f} ms")
+        print_trace()   # percentiles of the sensor-to-vibration latency
+        for line in rt_profile.report():   # settings and wakeup latency per thread
+            print(line)
+        board_hal.cleanup()
 
     except Exception as e:
         print("Program terminated by exception")
@@ -258,11 +448,20 @@ if __name__ == "__main__":
         f.write("{},{},{},{}".format(a,b,c,d))
         f.write("\n")
         f.close()
-        run = False
-        ultrasonic_thread.join()
-        lidar_thread.join()
         my_actuator.set_vib_const(0)
-        GPIO.cleanup()
+        my_actuator.close()
+        scheduler.stop()
+        scheduler.join()
+        sensor_bus.close()
+        if ACQUISITION_PROCESS:
+            acq.stop()
+            for line in acq.latency_lines:
+                print(line)
+        else:
+            print_sensor_latency(sensor_1, sensor_2)
+        print_trace()
+        board_hal.cleanup()
         print("Done!")
-        os.system("sudo shutdown now")   # shutdown system
+        if HAL_BACKEND == "pi":
+            os.system("sudo shutdown now")   # shutdown system
         
@@ -0,0 +1,182 @@
+""" V1.0
+Module of main firmware with asyncio runtime used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Same function as main.py, but sensor polling, pattern engine, buttons, turning
+switch, main loop and logging are tasks of one event loop (async_runtime),
+blocking i2c transfers are executed by a small executor.
+"""
+
+#################### import section ####################
+
+import asyncio
+import time
+import datetime
+import os
+
+import hal
+import hal_sim
+
+import actuator  # written by MW
+import sensors # written by TE
+import i2c_bus
+import async_runtime
+import latency_trace
+import data_procession # written by TE
+
+
+#################### variables section ####################
+
+ACTUATOR_NO = [1, 1]   # channel of Actuators (global)
+ACTUATOR_TYPE = [2414, 2414]   # type of actuator: 2608 (Grewus EXS 2608L-03A) or \
+# 2414 (Grewus EXS 241408W B)
+
+BUTTON_PIN = [17, 27]   # Pins for Mute-Mode [0] and Distance-Mode [1]: pressed = 0, not pressed = 1
+SWITCH_PIN = [23, 24, 25]   # pins of turning switch, 0 = active, 1 = inactive
+
+LIDAR_CONTINUOUS = False   # True -> TF-Luna free-runs at LIDAR_FRAME_RATE, no trigger per sample
+LIDAR_FRAME_RATE = 100   # frame rate of TF-Luna in continuous mode [Hz] (above 50 Hz polling rate)
+USE_I2C_RDWR = True   # True -> one I2C_RDWR ioctl per transfer (i2c_rdwr), False -> smbus / busio
+USE_SEQUENCER = False   # True -> pulses of stage 1-4 timed by waveform sequencer of DRV2605L, \
+# False -> every pulse started by pattern engine
+USE_BROADCAST = False   # True -> equal register writes to all DRV2605L with one transfer (TCA9548A \
+# channels enabled together), reads per channel
+LOG_FILE = "runtime_log.csv"   # status lines of the runtime (date, time, wakeups/s, latency, age, pulses)
+HAL_BACKEND = os.environ.get("SMARTCANE_HAL", "pi")   # "pi" -> RPi.GPIO, i2c-1, DRV2605L (hal), \
+# "sim" -> in-memory devices (hal_sim), e.g. SMARTCANE_HAL=sim python3 main_async.py on a Linux machine
+SIM_LATENCY = float(os.environ.get("SMARTCANE_SIM_LATENCY", "0.0005"))   # duration of one simulated \
+# i2c-transaction [s]
+SIM_MOVE_PERIOD = 4.0   # period of the simulated obstacle 30 -> 200 -> 30 cm [s]
+
+
+#################### GPIO declaration ####################
+
+def setup_gpio():
+    """ declaration of buttons and switch-states (called by main program) """
+    gpio.setmode(gpio.BCM)
+    for pin in BUTTON_PIN + SWITCH_PIN:   # Declaration of buttons and switch-states with internal pull up resistor
+        gpio.setup(
+            pin,
+            gpio.IN,
+            pull_up_down=gpio.PUD_UP
+            )
+
+
+#################### Function section ####################
+
+def print_sensor_latency(*sensor_list):
+    """ print worst-case read latency and missed deadlines of sensors """
+    for sensor in sensor_list:
+        print(f"{type(sensor).__name__}: worst-case read latency "
+              f"{sensor.latency_max * 1000:.2f} ms, {sensor.timeouts} missed deadline(s)")
+
+
+async def main():
+    """ initialisation (i2c in the executor) and tasks of the firmware until exception or cancel """
+
+    t_boot = time.monotonic()   # start of initialisation (boot-to-ready time)
+
+    # tasks of the firmware, GPIO callbacks are registered by runtime.start()
+    runtime = async_runtime.AsyncRuntime(gpio, BUTTON_PIN, SWITCH_PIN, log_file=LOG_FILE)
+    runtime.start()
+
+    # sensor-to-vibration latency: capture -> fusion -> stage -> commit (printed at shutdown)
+    trace = latency_trace.LatencyTrace()
+
+    if HAL_BACKEND == "sim":   # moving obstacle -> changing stages
+        board_hal.move(SIM_MOVE_PERIOD)
+
+
+    ### Actuator initialisation ###
+    actuator_i2c = board_hal.i2c(1)   # I2C_RDWR or busio of the hal backend
+    my_actuator = actuator.Actuator(   # pulses are played by a task of the runtime
+        ACTUATOR_NO,
+        actuator_i2c,
+        sequencer=USE_SEQUENCER,
+        broadcast=USE_BROADCAST,
+        pattern_engine=runtime.pattern_engine,
+        trace=trace
+        )
+
+    try:
+        await runtime.io(my_actuator.config_drv_to_lra)
+
+        await runtime.io(my_actuator.calibrate, ACTUATOR_TYPE, board_hal.cache_file)   # from calibration cache, auto-calibration if needed
+
+        await runtime.io(my_actuator.set_drv_open_loop)
+
+
+        ### Sensor initialisation ###
+
+        data = data_procession.DataProcession()
+        data.trace = trace
+        sensor_bus = i2c_bus.I2CBus(1, board_hal.smbus)   # I2C_RDWR or smbus of the hal backend
+        try:
+            sensor_1 = await runtime.io(lambda: sensors.URM09(bus=sensor_bus))
+            sensor_2 = await runtime.io(lambda: sensors.TfLuna(
+                bus=sensor_bus,
+                continuous=LIDAR_CONTINUOUS,
+                frame_rate=LIDAR_FRAME_RATE
+                ))
+
+
+            ### Tasks ###
+
+            print(f"boot-to-ready: {time.monotonic() - t_boot:.2f} s "
+                  f"(calibration {my_actuator.calibration_time:.2f} s)")
+            print("Hey ho, let's go!")
+
+            try:
+                await runtime.run(my_actuator, data, sensor_1, sensor_2)
+            finally:
+                print_sensor_latency(sensor_1, sensor_2)
+                for line in runtime.report():   # wakeups and event-to-wakeup latency of the main loop
+                    print(line)
+                print(f"maximum sensor-to-feedback age: {data.age_max * 1000:.1f} ms")
+                for line in trace.report():   # percentiles of the sensor-to-vibration latency
+                    print(line)
+
+        finally:
+            sensor_bus.close()
+
+    finally:
+        await runtime.shutdown(my_actuator)
+        print("Actuators stopped!")
+
+
+#################### main program ####################
+
+if __name__ == "__main__":
+
+    # hardware of the firmware: Raspberry Pi or in-memory devices with simulated bus latency \
+        # (selected here, nothing is opened at import of this module)
+    if HAL_BACKEND == "sim":
+        board_hal = hal.select(hal_sim.Simulated(latency=SIM_LATENCY))
+    else:
+        board_hal = hal.select(hal.RaspberryPi(i2c_rdwr=USE_I2C_RDWR))
+
+    gpio = board_hal.gpio()   # RPi.GPIO-like object, pins are declared by setup_gpio()
+
+    try:
+        setup_gpio()
+        asyncio.run(main())
+
+    except KeyboardInterrupt:
+        print("Program terminated by user!")
+        board_hal.cleanup()
+
+    except Exception as e:
+        print("Program terminated by exception")
+        x = datetime.datetime.now()
+        a = x.strftime("%Y-%m-%d")
+        b = x.strftime("%H:%M:%S:%f")[:-3]
+        c = type(e).__name__    # exception name
+        d = str(e)   # exception message
+        f = open("exception_log.csv", "a")
+        f.write("{},{},{},{}".format(a,b,c,d))
+        f.write("\n")
+        f.close()
+        board_hal.cleanup()
+        print("Done!")
+        if HAL_BACKEND == "pi":
+            os.system("sudo shutdown now")   # shutdown system
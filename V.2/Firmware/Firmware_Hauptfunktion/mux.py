@@ -0,0 +1,253 @@
+"""V1.1
+Module for the TCA9548A multiplexer used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+MuxManager replaces adafruit_tca9548a.TCA9548A (same use: mux[channel] is a
+busio.I2C-like object for one channel). It remembers the enabled channels and
+writes the control register only if other channels are needed, channels stay
+enabled after a transfer. The devices behind the mux (DRV2605L at 0x5A) must
+not share an address with devices on the main bus.
+The control register has one bit per channel, several channels can be enabled
+at the same time. A write to an address then reaches every device with this
+address on the enabled channels in the same transfer (BroadcastChannel), e.g.
+the same register value for all DRV2605L. Reads are not possible this way (all
+devices answer, the bus is a wired-AND), they are done on one channel.
+Inside "with mux.batch():" writes are queued and sent ordered by channel, one
+channel switch per channel instead of one per interleaved access. The order of
+the writes of one channel is kept, a read or a broadcast ends the reordering.
+"""
+
+
+#################### import section ####################
+
+import contextlib
+import threading
+import time
+
+
+#################### variables section ####################
+
+MUX_ADDR = 0x70   # I2C-address of TCA9548A
+
+
+class MuxManager:
+    """ TCA9548A with cached channel selection and batched writes """
+
+    def __init__(self, i2c, address=MUX_ADDR, cache=True, reorder=True):
+        self.i2c = i2c   # busio.I2C-like bus object
+        self.address = address
+        self.cache = cache   # False -> select before and deselect after every transfer (like adafruit)
+        self.reorder = reorder   # False -> batch() has no effect, writes are sent at once
+        self.selected = None   # mask of enabled channels, None = unknown
+        self.switches = 0   # number of control register writes
+        self.selects_saved = 0   # selections skipped, channels already enabled
+        self.local = threading.local()   # queue of batched writes per thread
+        self.channels = {}   # channel -> MuxChannel
+        self.t_rate = time.monotonic()   # start of measurement of switch_rate
+        self.switches_rate = 0
+
+
+    #################### Function Section ####################
+
+    def __getitem__(self, channel):
+        """ busio.I2C-like object of one channel """
+        if not 0 <= channel <= 7:
+            raise IndexError("Channel must be an integer in the range: 0-7.")
+        if channel not in self.channels:
+            self.channels[channel] = MuxChannel(self, 1 << channel)
+        return self.channels[channel]
+
+    def broadcast(self, channels):
+        """ busio.I2C-like object for writes to several channels at once """
+        return BroadcastChannel(self, sum(1 << channel for channel in set(channels)))
+
+    def lock(self):
+        """ lock the bus (waits) """
+        while not self.i2c.try_lock():
+            time.sleep(0)
+
+    def select(self, mask):
+        """ enable the channels of mask, bus must be locked """
+        if self.cache and mask == self.selected:
+            self.selects_saved = self.selects_saved + 1
+            return
+        self.selected = None   # unknown if the write fails
+        self.i2c.writeto(self.address, bytes([mask]))
+        self.selected = mask
+        self.switches = self.switches + 1
+
+    def release(self):
+        """ disable all channels, bus must be locked """
+        if not self.cache:
+            self.select(0x00)
+
+    def deselect(self):
+        """ disable all channels (e.g. before other devices use the bus) """
+        self.lock()
+        try:
+            self.selected = None
+            self.select(0x00)
+        finally:
+            self.i2c.unlock()
+
+    def switch_rate(self):
+        """ channel switches per second since the last call """
+        now = time.monotonic()
+        rate = (self.switches - self.switches_rate) / max(now - self.t_rate, 1e-9)
+        self.t_rate = now
+        self.switches_rate = self.switches
+        return rate
+
+    def queue(self):
+        """ queue of batched writes of the calling thread, None outside of batch() """
+        return getattr(self.local, "queue", None)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """ queue writes of the calling thread, sent channel by channel at the end """
+        if self.queue() is not None or not self.reorder:   # already batching
+            yield
+            return
+        self.local.queue = []
+        try:
+            yield
+        finally:
+            self.flush()
+            self.local.queue = None
+
+    def flush(self):
+        """ send queued writes, grouped by channel in order of first use \
+            (the enabled channel first), order of the writes of one channel is kept
+            """
+        queue = self.queue()
+        if not queue:
+            return
+        self.local.queue = []
+        masks = list(dict.fromkeys(mask for mask, _, _ in queue))
+        if self.selected in masks:
+            masks.remove(self.selected)
+            masks.insert(0, self.selected)
+        self.lock()
+        try:
+            for mask in masks:
+                self.select(mask)
+                for m, address, data in queue:
+                    if m == mask:
+                        self.i2c.writeto(address, data)
+            self.release()
+        finally:
+            self.i2c.unlock()
+
+
+class MuxChannel:
+    """ busio.I2C-like object of channels of the TCA9548A (like adafruit_tca9548a.TCA9548A_Channel) """
+
+    def __init__(self, mux, mask):
+        self.mux = mux   # MuxManager
+        self.mask = mask   # channel bits of the control register
+
+    def try_lock(self):
+        """ lock the bus and enable the channels (nothing to do in batch, writes are queued) """
+        if self.mux.queue() is not None:
+            return True
+        self.mux.lock()
+        try:
+            self.mux.select(self.mask)
+        except BaseException:
+            self.mux.i2c.unlock()
+            raise
+        return True
+
+    def unlock(self):
+        """ disable channels if not cached and unlock the bus """
+        if self.mux.queue() is not None:
+            return None
+        try:
+            self.mux.release()
+        finally:
+            self.mux.i2c.unlock()
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        """ write buffer to the device at address (queued in batch) """
+        if address == self.mux.address:
+            raise ValueError("Device address must be different than TCA9548A address.")
+        queue = self.mux.queue()
+        if queue is not None:
+            queue.append((self.mask, address, bytes(buffer[start:end])))
+            return None
+        return self.mux.i2c.writeto(address, buffer, start=start, end=end)
+
+    def readfrom_into(self, address, buffer, **kwargs):
+        """ read from the device at address, queued writes are sent before """
+        if address == self.mux.address:
+            raise ValueError("Device address must be different than TCA9548A address.")
+        with self.direct():
+            return self.mux.i2c.readfrom_into(address, buffer, **kwargs)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, **kwargs):
+        """ write then read with repeated start, queued writes are sent before """
+        if address == self.mux.address:
+            raise ValueError("Device address must be different than TCA9548A address.")
+        with self.direct():
+            return self.mux.i2c.writeto_then_readfrom(address, buffer_out, buffer_in, **kwargs)
+
+    @contextlib.contextmanager
+    def direct(self):
+        """ bus access now, also in batch (queued writes are sent first) """
+        if self.mux.queue() is None:   # bus is locked by try_lock
+            yield
+            return
+        self.mux.flush()
+        self.mux.lock()
+        try:
+            self.mux.select(self.mask)
+            yield
+            self.mux.release()
+        finally:
+            self.mux.i2c.unlock()
+
+    def scan(self):
+        """ perform an i2c device scan """
+        return self.mux.i2c.scan()
+
+    def probe(self, address):
+        """ check if a device is at address on the bus """
+        if hasattr(self.mux.i2c, "probe"):
+            return self.mux.i2c.probe(address)
+        return address in self.scan()
+
+
+class BroadcastChannel(MuxChannel):
+    """ several channels of the TCA9548A enabled together, writes only """
+
+    def __init__(self, mux, mask):
+        MuxChannel.__init__(self, mux, mask)
+        self.transfers = 0   # number of broadcast writes (statistics)
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        """ write buffer to the devices at address on all channels, not queued in batch \
+            (queued writes are sent before, the order to the single channels is kept)
+            """
+        if address == self.mux.address:
+            raise ValueError("Device address must be different than TCA9548A address.")
+        self.transfers = self.transfers + 1
+        with self.direct():
+            return self.mux.i2c.writeto(address, buffer, start=start, end=end)
+
+    def readfrom_into(self, address, buffer, **kwargs):
+        """ not possible, several devices would answer """
+        raise ValueError("No reads on a broadcast channel, read from a single TCA9548A channel.")
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, **kwargs):
+        """ not possible, several devices would answer """
+        raise ValueError("No reads on a broadcast channel, read from a single TCA9548A channel.")
+
+    def write_registers(self, address, register, values):
+        """ write values from register on (address auto-increment) to all devices at address, \
+            one transfer
+            """
+        self.try_lock()
+        try:
+            self.writeto(address, bytes([register] + list(values)))
+        finally:
+            self.unlock()
@@ -0,0 +1,118 @@
+"""V1.0
+Module for the vibration pattern engine used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A thread plays pulse trains: pulse() is called once per period of the pulse
+rate, in fixed time slots without drift. A new rate is accepted at any time and
+used from the next pulse on, so the main loop never waits for the actuators.
+Only set_rate(0) waits for a pulse which is already running, so a stop written
+afterwards is really the last write. play_once() plays a single pulse after a
+delay (haptic feedback of the buttons).
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import rt_profile
+
+
+class PatternEngine(threading.Thread):
+    """ plays pulse trains in its own thread """
+
+    def __init__(self, pulse):
+        threading.Thread.__init__(self, name="pattern_engine", daemon=True)
+        self.pulse = pulse   # function which starts one pulse (e.g. play of all DRVs)
+        self.cond = threading.Condition()   # protects rate and time slots, wakes up the thread
+        self.rate = 0   # pulse rate [Hz], 0 = no pulses
+        self.t_next = None   # time slot of next pulse (time.monotonic), None if no pulses
+        self.t_last = None   # time slot of last pulse
+        self.single = False   # True -> pending time slot is a single pulse of play_once
+        self.busy = False   # True while pulse() of a taken time slot runs
+        self.running = True
+        self.pulses = 0   # number of played pulses
+        self.late_max = 0.0   # worst-case delay of a pulse against its time slot [s]
+        self.error = None   # last exception of pulse()
+
+
+    #################### Function Section ####################
+
+    def set_rate(self, rate, restart=False):
+        """ change pulse rate, 0 stops the pulse train. \
+            A running pattern is switched immediately: the next pulse follows the last one
+            after the new period, or at once if this time has already passed (or restart is set)
+            """
+        with self.cond:
+            if rate == self.rate and not restart and not self.single:
+                return
+            self.rate = rate
+            self.single = False
+            if rate > 0:
+                now = time.monotonic()
+                if self.t_last is None or restart:
+                    self.t_next = now
+                else:
+                    self.t_next = max(now, self.t_last + 1 / rate)
+            else:
+                self.t_next = None
+            self.cond.notify_all()
+            while rate == 0 and self.busy and threading.current_thread() is not self:   # running pulse
+                self.cond.wait()
+
+    def play_once(self, delay=0.0):
+        """ stop the pulse train and play a single pulse after delay [s], returns immediately """
+        with self.cond:
+            self.rate = 0
+            self.single = True
+            self.t_next = time.monotonic() + delay
+            self.cond.notify_all()
+
+    def stop(self):
+        """ stop thread after the running pulse """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def run(self):
+        rt_profile.enter(self.name)
+        while True:
+            with self.cond:
+                while self.running:
+                    if self.t_next is None:
+                        self.cond.wait()
+                        continue
+                    t_wait = self.t_next - time.monotonic()
+                    if t_wait <= 0:
+                        break
+                    self.cond.wait(t_wait)
+                if not self.running:
+                    break
+                t_due = self.t_next
+                rate = self.rate
+                self.t_last = t_due
+                if self.single:   # single pulse of play_once
+                    self.single = False
+                    self.t_next = None
+                else:
+                    self.t_next = t_due + 1 / self.rate   # next time slot, without drift
+                self.busy = True   # set_rate(0) waits until the pulse is sent
+
+            late = time.monotonic() - t_due
+            rt_profile.record(self.name, late)
+            if late > self.late_max:
+                self.late_max = late
+            try:
+                self.pulse()
+                self.pulses = self.pulses + 1
+            except Exception as e:
+                self.error = e
+
+            with self.cond:   # overrun, skip missed slots (not after a change of rate)
+                self.busy = False
+                self.cond.notify_all()
+                now = time.monotonic()
+                if self.rate == rate and self.t_next is not None and self.t_next < now:
+                    period = 1 / rate
+                    self.t_next = self.t_next + period * ((now - self.t_next) // period + 1)
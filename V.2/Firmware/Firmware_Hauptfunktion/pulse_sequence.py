@@ -0,0 +1,70 @@
+"""V1.0
+Module for pulse trains in the waveform sequencer of the DRV2605L used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The rhythm of a stage (pulse rate) is compiled into the 8 slots of the waveform
+sequencer (registers 0x04...0x0B): effect, wait slot(s) (bit 7 set, wait time
+in 10 ms steps), effect, ... The chip times the pulses of one sequence itself.
+The sequencer has no loop function, so the sequence is played again by the GO
+bit once per sequence (rate / pulses) -> see Actuator.set_vib_sequence.
+Source: TI Documentation SLOS854D 8.6.5 (Waveform Sequencer)
+"""
+
+
+#################### variables section ####################
+
+SLOTS = 8   # number of slots of the waveform sequencer
+REG_WAVESEQ1 = 0x04   # register of first slot
+WAIT = 0x80   # bit 7 set -> slot is a wait time
+WAIT_UNIT = 10   # wait time per step [ms]
+WAIT_MAX = 0x7F   # maximum steps of one wait slot (1.27 s)
+EFFECT_TIME = 30   # playback time of the effect (strong click) [ms] -> check with oscilloscope
+
+
+#################### Function section ####################
+
+def wait_slots(time_ms):
+    """ wait slots for time_ms, rounded to WAIT_UNIT """
+    steps = int(time_ms / WAIT_UNIT + 0.5)
+    slots = []
+    while steps > 0:
+        slots.append(WAIT | min(steps, WAIT_MAX))
+        steps = steps - min(steps, WAIT_MAX)
+    return slots
+
+
+def compile_rhythm(frq, effect=1, effect_time=EFFECT_TIME):
+    """ compile pulse rate frq [Hz] into sequencer slots, \
+        returns list of SLOTS values (terminated by 0) and number of pulses per sequence
+        """
+    period = 1000 / frq   # [ms]
+    if period < effect_time:
+        raise ValueError(f"pulse rate {frq} Hz too high for effect time {effect_time} ms")
+    waits = wait_slots(period - effect_time)
+    if len(waits) + 1 > SLOTS:
+        raise ValueError(f"pulse rate {frq} Hz too low for waveform sequencer")
+
+    # the wait after the last pulse is timed by the next GO -> not part of the sequence
+    pulses = min((SLOTS - 1 + len(waits)) // (len(waits) + 1), SLOTS - 1)
+    slots = []
+    for n in range(pulses):
+        slots.append(effect)
+        if n < pulses - 1:
+            slots.extend(waits)
+    return slots + [0] * (SLOTS - len(slots)), pulses
+
+
+def register_image(slots):
+    """ register address -> value of the sequencer slots """
+    return {REG_WAVESEQ1 + n: value for n, value in enumerate(slots)}
+
+
+#################### Test program ####################
+
+if __name__ == "__main__":
+
+    # register images of the stage rhythms of Actuator.set_actuator (tests: Firmware_Unittest/test_pulse_sequence.py)
+    for frq in (3, 5, 8, 13):
+        slots, pulses = compile_rhythm(frq)
+        image = " ".join(f"{register:#04x}:{value:#04x}" for register, value in register_image(slots).items())
+        print(f"{frq:>3} Hz, {pulses} pulses per sequence: {image}")
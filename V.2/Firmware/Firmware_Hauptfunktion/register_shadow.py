@@ -0,0 +1,122 @@
+"""V1.0
+Module for a register shadow of the DRV2605L used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The configuration registers of one DRV2605L are read once (burst read) and kept
+in memory. Reads of these registers are answered from the shadow, writes are
+only sent to the device if the value changes. Status and result registers which
+are changed by the device itself are always read from the device.
+The shadow replaces _read_u8 / _write_u8 of the adafruit_drv2605.DRV2605 object,
+so the functions and properties of the library are using it as well.
+"""
+
+
+#################### variables section ####################
+
+REG_FIRST = 0x01   # first shadowed register (MODE)
+REG_LAST = 0x20   # last shadowed register (CONTROL5 / OL_LRA_PERIOD)
+REG_MODE = 0x01   # bit 7: DEV_RESET -> all registers return to default
+REG_GO = 0x0C   # GO bit is cleared by the device
+VOLATILE = (0x00, REG_GO, 0x21, 0x22)   # STATUS, GO, VBAT, LRA_PERIOD: changed by the device
+CALIBRATION = (0x18, 0x19, 0x1A)   # A_CAL_COMP, A_CAL_BEMF, FEEDBACK[1:0]: written by auto-calibration
+
+
+class RegisterShadow:
+    """ register shadow of one DRV2605L """
+
+    def __init__(self, drv, verify_every=0):
+        self.drv = drv   # adafruit_drv2605.DRV2605 object
+        self.verify_every = verify_every   # compare shadow and device every n writes, 0 = off
+        self.reg = [None] * (REG_LAST + 1)   # shadowed register values, None = not shadowed
+        self.read_u8 = drv._read_u8   # original access functions of the driver
+        self.write_u8 = drv._write_u8
+        self.reads = 0   # register reads sent to the device
+        self.writes = 0   # register writes sent to the device
+        self.reads_saved = 0   # reads answered from the shadow
+        self.writes_saved = 0   # writes skipped, value unchanged
+        self.mismatches = 0   # differences found by verify()
+        self.writes_since_verify = 0
+        self.load()
+        drv._read_u8 = self.read   # all register access of the driver through the shadow
+        drv._write_u8 = self.write
+
+
+    #################### Function Section ####################
+
+    def load(self):
+        """ fill shadow with one burst read (register address auto-increment) """
+        buffer = bytearray([REG_FIRST]) + bytearray(REG_LAST - REG_FIRST + 1)
+        with self.drv._device as i2c:
+            i2c.write_then_readinto(buffer, buffer, out_end=1, in_start=1)
+        self.reads = self.reads + 1
+        for register in range(REG_FIRST, REG_LAST + 1):
+            if register not in VOLATILE:
+                self.reg[register] = buffer[1 + register - REG_FIRST]
+
+    def reload(self, *registers):
+        """ read registers again from device (e.g. after auto-calibration) """
+        for register in registers:
+            self.reg[register] = self.read_u8(register)
+            self.reads = self.reads + 1
+
+    def read(self, register):
+        """ read register, from shadow if possible """
+        if register <= REG_LAST and self.reg[register] is not None:
+            self.reads_saved = self.reads_saved + 1
+            return self.reg[register]
+        self.reads = self.reads + 1
+        return self.read_u8(register)
+
+    def write(self, register, value):
+        """ write register, skipped if the device already has this value """
+        value = value & 0xFF
+        if register <= REG_LAST and self.reg[register] == value:
+            self.writes_saved = self.writes_saved + 1
+            return
+        self.write_u8(register, value)
+        self.writes = self.writes + 1
+        if register == REG_MODE and value & 0x80:   # device reset, registers return to default
+            self.load()
+        elif register <= REG_LAST and self.reg[register] is not None:
+            self.reg[register] = value
+
+        if self.verify_every > 0:
+            self.writes_since_verify = self.writes_since_verify + 1
+            if self.writes_since_verify >= self.verify_every:
+                self.verify()
+
+    def written(self, register, values):
+        """ update shadow after a burst write to the device (register address auto-increment) """
+        for n, value in enumerate(values):
+            if register + n <= REG_LAST and self.reg[register + n] is not None:
+                self.reg[register + n] = value & 0xFF
+        self.writes = self.writes + 1
+
+    def holds(self, register, values):
+        """ True if the device already has values from register on (all registers shadowed) """
+        return all(register + n <= REG_LAST and self.reg[register + n] == value & 0xFF
+                   for n, value in enumerate(values))
+
+    def update_bits(self, register, mask, value):
+        """ set the bits of mask in register to value with one write """
+        self.write(register, (self.read(register) & ~mask) | (value & mask))
+
+    def verify(self):
+        """ compare shadow with device, correct the shadow and return list of \
+            (register, shadow, device) for every difference
+            """
+        self.writes_since_verify = 0
+        differences = []
+        for register in range(REG_FIRST, REG_LAST + 1):
+            if self.reg[register] is not None:
+                value = self.read_u8(register)
+                self.reads = self.reads + 1
+                if value != self.reg[register]:
+                    differences.append((register, self.reg[register], value))
+                    self.reg[register] = value
+        self.mismatches = self.mismatches + len(differences)
+        return differences
+
+    def saved(self):
+        """ number of register accesses which were not sent to the device """
+        return self.reads_saved + self.writes_saved
@@ -0,0 +1,155 @@
+"""V1.0
+Module for the real-time profile of the firmware threads used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Opt-in (main.RT_PROFILE): enable() locks the memory of the process (mlockall
+via ctypes) and pre-faults the heap, so page faults do not delay the threads.
+The heap is kept by malloc (mallopt: no mmap for large blocks, no trimming),
+otherwise the pre-faulted block would be returned to the system on free.
+Stacks of threads started afterwards are mapped and locked at creation
+(MCL_FUTURE), their size is limited to STACK_SIZE. Every thread of the
+firmware calls enter(name) at its start and gets a SCHED_FIFO priority and a
+set of cores of PRIORITIES / CPUS. Without permission (no root, no
+CAP_SYS_NICE, RLIMIT_MEMLOCK) the step is skipped and the thread runs with
+normal priority, the reason is shown in report().
+Wakeup latency (wakeup - deadline) is recorded per thread with record(), also
+without profile, so the gain can be measured on every Linux machine.
+"""
+
+
+#################### import section ####################
+
+import ctypes
+import ctypes.util
+import os
+import threading
+
+import histogram
+
+
+#################### variables section ####################
+
+PRIORITIES = {   # SCHED_FIFO priority per thread (1...99), higher runs first
+    "bus_scheduler": 60,   # sensor polls and actuator transfers (also in the acquisition process)
+    "pattern_engine": 55,
+    "rtp_stream": 55,
+    "main": 50,   # main loop
+    }
+CPUS = {   # cores per thread, cores which do not exist are ignored (Raspberry Pi: 0...3)
+    "bus_scheduler": {3},
+    "pattern_engine": {2},
+    "rtp_stream": {2},
+    "main": {2},
+    }
+PREFAULT_HEAP = 8 * 1024 * 1024   # heap pre-faulted by enable() [byte]
+STACK_SIZE = 512 * 1024   # stack of threads started after enable() [byte] (locked completely)
+MCL_CURRENT = 1   # mlockall flags of <sys/mman.h>
+MCL_FUTURE = 2
+M_TRIM_THRESHOLD = -1   # mallopt parameters of <malloc.h> (glibc)
+M_MMAP_MAX = -4
+
+active = None   # RtProfile of enable(), None -> threads keep their normal priority
+latency = {}   # thread name -> histogram.Histogram of wakeup latency (record)
+
+
+def record(name, value):
+    """ wakeup latency [s] of thread name (time of wakeup - deadline) """
+    h = latency.get(name)
+    if h is None:
+        h = latency[name] = histogram.Histogram(f"{name} wakeup latency")
+    h.record(value)
+
+
+def enter(name):
+    """ called by a thread at its start: real-time priority and cores of name if a profile is active """
+    if active is not None:
+        active.setup_thread(name)
+
+
+class RtProfile:
+    """ memory locking, priorities and cores of the firmware threads """
+
+    def __init__(self, priorities=PRIORITIES, cpus=CPUS, lock_memory=True, prefault=PREFAULT_HEAP):
+        self.priorities = priorities
+        self.cpus = cpus
+        self.lock_memory = lock_memory
+        self.prefault = prefault
+        self.memory = "not locked"   # result of mlockall
+        self.threads = {}   # thread name -> result of setup_thread
+        self.allowed = os.sched_getaffinity(0)   # cores of the process (threads inherit the cores of their creator)
+
+
+    #################### Function Section ####################
+
+    def setup_process(self):
+        """ lock current and future memory of the process and pre-fault the heap """
+        if not self.lock_memory:
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        except (OSError, AttributeError) as e:   # no permission or no mlockall
+            self.memory = f"not locked ({e})"
+            return False
+        threading.stack_size(STACK_SIZE)   # stacks of new threads are locked completely (MCL_FUTURE)
+        self.memory = "locked"
+        if self.prefault > 0:
+            try:   # freed blocks stay in the heap: no mmap per block, heap is never trimmed
+                if libc.mallopt(M_MMAP_MAX, 0) != 1 or libc.mallopt(M_TRIM_THRESHOLD, -1) != 1:
+                    raise OSError("mallopt failed")
+            except (OSError, AttributeError) as e:   # no glibc malloc
+                self.memory = f"locked, heap not pre-faulted ({e})"
+                return True
+            block = bytearray(self.prefault)   # pages of the heap are mapped and stay locked
+            for n in range(0, self.prefault, 4096):
+                block[n] = 1
+            del block
+            self.memory = f"locked, {self.prefault // 1024} kB heap pre-faulted"
+        return True
+
+    def setup_thread(self, name):
+        """ SCHED_FIFO priority and cores of name for the calling thread, returns True if both are set """
+        result = []
+        ok = True
+        cpus = self.cpus.get(name, set()) & self.allowed
+        if cpus:
+            try:
+                os.sched_setaffinity(0, cpus)   # 0 -> calling thread
+                result.append(f"cpus {sorted(cpus)}")
+            except OSError as e:
+                result.append(f"cpus not set ({e.strerror})")
+                ok = False
+        if name in self.priorities:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priorities[name]))
+                result.append(f"SCHED_FIFO {self.priorities[name]}")
+            except (OSError, AttributeError) as e:   # no permission, fallback: normal priority
+                result.append(f"SCHED_OTHER ({getattr(e, 'strerror', None) or e})")
+                ok = False
+        self.threads[name] = ", ".join(result) if result else "unchanged"
+        return ok
+
+    def report(self):
+        """ return memory locking and settings of the threads as text lines """
+        lines = [f"rt profile: memory {self.memory}"]
+        for name, result in self.threads.items():
+            lines.append(f"  {name}: {result}")
+        return lines
+
+
+def enable(**kwargs):
+    """ activate the real-time profile for this process and the main thread, returns RtProfile """
+    global active
+    active = RtProfile(**kwargs)
+    active.setup_process()
+    active.setup_thread("main")
+    return active
+
+
+def report():
+    """ profile settings (if active) and wakeup latency of all threads as text lines """
+    lines = active.report() if active is not None else ["rt profile: off"]
+    for h in latency.values():
+        lines.append(h.summary())
+    return lines
@@ -0,0 +1,184 @@
+"""V1.0
+Module for continuous vibration feedback in real-time playback used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Instead of 6 stages (Actuator.get_stage) the feedback value (0...1000) is mapped
+to a pulse rate and an amplitude (RTP_INPUT) by a lookup table, which is
+computed once. Rate and amplitude rise smoothly with the feedback value, from
+VALUE_CONST on the vibration is constant (like stage 5).
+A thread plays the pulses with the DRVs in MODE_REALTIME: the amplitude at the
+start of a pulse, 0 after PULSE_TIME. New feedback values are taken over at most
+UPDATE_RATE times per second and the DRVs are only written at the edges of a
+pulse, so the bus load depends on the pulse rate, not on the main loop.
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import rt_profile
+
+
+#################### variables section ####################
+
+VALUE_MIN = 10   # feedback values below: no vibration (like stage 0 of stage_classifier)
+VALUE_CONST = 800   # feedback values from here on: constant vibration (like stage 5)
+VALUE_MAX = 1000   # maximum feedback value
+LUT_STEP = 5   # resolution of the lookup table [feedback value]
+RATE_MIN = 2.0   # pulse rate at VALUE_MIN [Hz]
+RATE_MAX = 15.0   # pulse rate just below VALUE_CONST [Hz]
+AMP_MIN = 60   # amplitude at VALUE_MIN (RTP_INPUT, 0...127)
+AMP_MAX = 127   # amplitude of constant vibration
+PULSE_TIME = 0.03   # duration of one pulse [s]
+UPDATE_RATE = 20   # maximum number of new feedback values per second
+
+
+#################### Function section ####################
+
+def build_lut(step=LUT_STEP):
+    """ lookup table feedback value // step -> (pulse rate [Hz], amplitude), \
+        pulse rate 0 = no pulses (amplitude 0: off, AMP_MAX: constant vibration).
+        The pulse rate rises geometrically (same ratio per step), the amplitude linear
+        """
+    lut = []
+    for value in range(0, VALUE_MAX + 1, step):
+        if value < VALUE_MIN:
+            lut.append((0.0, 0))
+        elif value >= VALUE_CONST:
+            lut.append((0.0, AMP_MAX))
+        else:
+            x = (value - VALUE_MIN) / (VALUE_CONST - VALUE_MIN)   # 0...1
+            lut.append((RATE_MIN * pow(RATE_MAX / RATE_MIN, x), int(AMP_MIN + (AMP_MAX - AMP_MIN) * x + 0.5)))
+    return lut
+
+
+def lookup(lut, value, step=LUT_STEP):
+    """ pulse rate and amplitude of a feedback value """
+    value = min(max(int(value), 0), VALUE_MAX)
+    return lut[value // step]
+
+
+class RtpStream(threading.Thread):
+    """ plays pulses of rate and amplitude of the latest feedback value in its own thread """
+
+    def __init__(self, write, lut=None, update_rate=UPDATE_RATE, pulse_time=PULSE_TIME, trace=None):
+        threading.Thread.__init__(self, name="rtp_stream", daemon=True)
+        self.write = write   # function which writes the RTP value to all DRVs
+        self.lut = lut if lut is not None else build_lut()
+        self.update_period = 1 / update_rate   # minimum time between two new feedback values [s]
+        self.pulse_time = pulse_time
+        self.trace = trace   # latency_trace.LatencyTrace -> trace points stage (take-over) and commit, None = off
+        self.cond = threading.Condition()   # protects value, wakes up the thread
+        self.value = 0   # latest feedback value of the main loop
+        self.pending = False   # True -> value not taken over yet
+        self.running = True
+        self.rate = 0.0   # pulse rate in use [Hz]
+        self.amplitude = 0   # amplitude in use
+        self.level = None   # last written RTP value, None = unknown
+        self.t_update = 0.0   # earliest time of next take-over of value
+        self.t_on = None   # start of next pulse, None if no pulses
+        self.t_off = None   # end of running pulse, None if no pulse is running
+        self.t_last = None   # start of last pulse
+        self.updates = 0   # number of taken over feedback values
+        self.writes = 0   # number of RTP writes
+        self.error = None   # last exception of write()
+
+
+    #################### Function Section ####################
+
+    def set_value(self, value):
+        """ new feedback value, returns immediately (called every main loop) """
+        with self.cond:
+            if value == self.value:
+                return
+            self.value = value
+            self.pending = True
+            self.cond.notify()
+
+    def stop(self):
+        """ stop thread, the vibration is not switched off """
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def output(self, level):
+        """ write RTP value, only if it changes """
+        if level != self.level:
+            try:
+                self.write(level)
+                self.level = level
+                self.writes = self.writes + 1
+            except Exception as e:
+                self.error = e
+                return
+        if self.trace is not None and level == self.amplitude:   # trace point: amplitude of the take-over is written
+            self.trace.commit()
+
+    def update(self, value, now):
+        """ take over pulse rate and amplitude of value """
+        rate, amplitude = lookup(self.lut, value)
+        if self.trace is not None and (rate, amplitude) != (self.rate, self.amplitude):
+            self.trace.stage()   # trace point: new pulse rate or amplitude decided
+        self.amplitude = amplitude
+        self.updates = self.updates + 1
+        if rate == 0:   # off or constant vibration
+            self.t_on = None
+            self.t_off = None
+            self.output(self.amplitude)
+        elif self.rate == 0 or self.t_last is None:   # start of pulses
+            self.t_on = now
+        else:   # new period from the last pulse on
+            self.t_on = max(now, self.t_last + 1 / rate)
+        self.rate = rate
+
+    def run(self):
+        rt_profile.enter(self.name)
+        while True:
+            with self.cond:
+                while self.running:
+                    now = time.monotonic()
+                    if self.pending and now >= self.t_update:
+                        break
+                    events = [t for t in (self.t_on, self.t_off) if t is not None]
+                    if self.pending:
+                        events.append(self.t_update)
+                    if events and min(events) <= now:
+                        break
+                    self.cond.wait(min(events) - now if events else None)
+                if not self.running:
+                    break
+                value = self.value if self.pending and now >= self.t_update else None
+                if value is not None:
+                    self.pending = False
+                    self.t_update = now + self.update_period
+
+            if value is not None:
+                self.update(value, now)
+            if self.t_off is not None and self.t_off <= now:   # end of pulse
+                self.t_off = None
+                self.output(0)
+            if self.t_on is not None and self.t_on <= now:   # start of pulse
+                rt_profile.record(self.name, now - self.t_on)
+                self.output(self.amplitude)
+                self.t_last = self.t_on
+                self.t_off = now + self.pulse_time
+                period = 1 / self.rate
+                self.t_on = self.t_on + period * ((now - self.t_on) // period + 1)   # skip missed pulses
+
+
+#################### Test program ####################
+
+if __name__ == "__main__":
+
+    table = build_lut()
+    assert len(table) == VALUE_MAX // LUT_STEP + 1
+    assert lookup(table, 0) == (0.0, 0) and lookup(table, VALUE_MIN - 1) == (0.0, 0)
+    assert lookup(table, VALUE_CONST) == (0.0, AMP_MAX) and lookup(table, 5000) == (0.0, AMP_MAX)
+    assert lookup(table, -5) == (0.0, 0)
+    pulsed = [entry for entry in table if entry[0] > 0]
+    assert abs(pulsed[0][0] - RATE_MIN) < 1e-9 and pulsed[0][1] == AMP_MIN
+    assert all(a[0] < b[0] and a[1] <= b[1] for a, b in zip(pulsed, pulsed[1:]))   # smooth, rising
+    assert pulsed[-1][0] < RATE_MAX and pulsed[-1][1] <= AMP_MAX
+    print(f"lookup table ok: {len(pulsed)} pulse rates {pulsed[0][0]:.1f}...{pulsed[-1][0]:.1f} Hz")
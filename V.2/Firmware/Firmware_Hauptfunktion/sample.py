@@ -0,0 +1,50 @@
+"""V1.0
+Module for published sensor samples used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Every sensor thread publishes its measurements as Sample objects. A sample is
+never changed after publishing, a new measurement replaces the reference.
+Functions in listeners are called after every publish (e.g. wakeup of the main loop).
+"""
+
+
+#################### import section ####################
+
+import time
+
+
+#################### status of a read (same values as in measprotocol) ####################
+STA_OK = 0x00   # new valid value
+STA_ERR_DATA = 0x05   # no data, sensor not answering
+STA_TIMEOUT = 0x06   # deadline passed before the read was finished, value not updated
+STA_STALE = 0x07   # no new frame since last read, value not updated
+
+listeners = []   # functions called with (sensor, old sample, new sample) after every publish
+
+
+
+class Sample:
+    """ one published measurement of a sensor, never changed after publishing """
+
+    __slots__ = ("value", "t_capture", "seq", "strength", "status")
+
+    def __init__(self, value=9999, t_capture=0.0, seq=0, strength=0, status=STA_ERR_DATA):
+        self.value = value   # distance in mm, -1 if sensor is not answering, 9999 if never measured
+        self.t_capture = t_capture   # time of capture (time.monotonic) [s]
+        self.seq = seq   # sequence number, 0 -> never measured
+        self.strength = strength   # signal strength (TF-Luna only, 0 otherwise)
+        self.status = status   # STA_OK or STA_ERR_DATA
+
+    def age(self, now=None):
+        """ age of the sample [s] """
+        if now is None:
+            now = time.monotonic()
+        return now - self.t_capture
+
+
+def publish(sensor, value, t_capture, strength=0, status=STA_OK):
+    """ publish a new sample of sensor, replacing the reference is atomic for reading threads """
+    old = sensor.sample
+    sensor.sample = Sample(value, t_capture, old.seq + 1, strength, status)
+    for listener in listeners:
+        listener(sensor, old, sensor.sample)
@@ -1,7 +1,25 @@
 ### import section ###
-import serial
 import time
-from smbus import SMBus
+import hal
+import i2c_bus
+
+from sample import Sample, publish, STA_OK, STA_ERR_DATA, STA_TIMEOUT, STA_STALE
+
+
+def deadline_passed(deadline):
+    """ True if the absolute deadline (time.monotonic) has passed, None means no deadline """
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def record_read(sensor, t_start, status):
+    """ record latency and timeouts of a read, returns status """
+    sensor.latency = time.monotonic() - t_start
+    if sensor.latency > sensor.latency_max:   # keep worst-case latency
+        sensor.latency_max = sensor.latency
+    if status == STA_TIMEOUT:
+        sensor.timeouts = sensor.timeouts + 1
+    return status
+
 
 class Me007ys:
 
@@ -13,43 +31,98 @@ class Me007ys:
     # https://makersportal.com/blog/distance-detection-with-the-tf-luna-lidar-and-raspberry-pi
     
     # variables
-    distance = 9999
+    sample = Sample()   # last published sample, replaced by publish()
+    latency = 0.0   # duration of last read [s]
+    latency_max = 0.0   # worst-case duration of a read [s]
+    timeouts = 0   # number of reads which missed their deadline
     # constants
     DISTANCE_MIN = 280
     DISTANCE_MAX = 4500
+    FRAME_HEADER = 0xFF   # first byte of every frame: header, data_high, data_low, checksum
+    FRAME_LENGTH = 4
+    BUFFER_SIZE = 256   # capacity of receive buffer [bytes], oldest bytes are dropped on overflow
+    READ_TIMEOUT = 0.1   # maximum time a read waits for the first byte [s]
+    FRAME_TIMEOUT = 0.2   # deadline of getDistance without deadline: two frame periods (10 Hz) [s]
     
+    @property
+    def distance(self):
+        """ distance of last published sample [mm] """
+        return self.sample.value
+
     def __init__(self,port="/dev/serial0",baudrate=9600):
         #serial interface
         self.port = port
         self.baudrate = baudrate
-        self.ser = serial.Serial(port, baudrate, timeout=0)   # real UART, baud rate = 9600
+        self.ser = hal.backend().uart(port, baudrate, timeout=self.READ_TIMEOUT)   # UART of the hal backend, baud rate = 9600, blocking read
+        self.rx_buffer = bytearray()   # received bytes which are not parsed yet
+        self.frames = 0   # number of valid frames
+        self.checksum_errors = 0   # number of frames with wrong checksum
     
     
-    def getDistance(self):
+    def getDistance(self, deadline=None):
+        """ wait for at least one new valid frame and publish the newest one, \
+            returns STA_TIMEOUT if no valid frame was received until deadline (default: FRAME_TIMEOUT)
+            """
+        t_start = time.monotonic()
+        if deadline is None:   # a silent sensor must not block the caller forever
+            deadline = t_start + self.FRAME_TIMEOUT
+        while not self.update(deadline):
+            if deadline_passed(deadline):
+                return record_read(self, t_start, STA_TIMEOUT)
+        return record_read(self, t_start, STA_OK)
+
+    def update(self, deadline=None):
+        """ read all available bytes and parse them, returns True if a new valid frame was received """
         if self.ser.isOpen() == False:
-            self.ser.open()   # open serial port if not open
-        while True:  
-            counter = self.ser.in_waiting   # count the number of bytes of the serial port
-            if counter > 3:
-                bytes_serial = self.ser.read(4)   # read 4 bytes
-                self.ser.reset_input_buffer()   # reset buffer 
-                if bytes_serial[0] == 0xFF:   # check header
-                    distance = bytes_serial[2] + (bytes_serial[1]*256)   # data_low + data_high
-                    checksum = (bytes_serial[0] + bytes_serial[1] + bytes_serial[2]) & 0x00FF   # calculation checksum
-                    if checksum != bytes_serial[3]:
-                        #checksum error
-                        #print("checksum error")
-                        continue # remeasurement
-                    if distance > self.DISTANCE_MAX:   # measured value is outside the measuring range
-                        distance = self.DISTANCE_MAX
-                    if distance < self.DISTANCE_MIN:   # measured values smaller than DISTANCE_MIN are incorrect measurements
-                        distance = self.DISTANCE_MAX
-                        #continue #remeasurement
-                    if distance == self.DISTANCE_MIN:   # measured value is outside the measuring range
-                        distance = 0
-                    self.distance = distance
-                    break   # successfull measurement, break loop
-        self.ser.close()   # close serial port
+            self.ser.open()   # open serial port if not open, port stays open afterwards
+        timeout = self.READ_TIMEOUT
+        if deadline is not None:
+            timeout = max(0, min(timeout, deadline - time.monotonic()))   # never wait beyond deadline
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+        data = self.ser.read(self.ser.in_waiting or 1)   # read everything available, wait max. timeout for one byte
+        if not data:
+            return False
+        t_capture = time.monotonic()
+        self.rx_buffer += data
+        if len(self.rx_buffer) > self.BUFFER_SIZE:   # drop oldest bytes
+            del self.rx_buffer[:len(self.rx_buffer) - self.BUFFER_SIZE]
+        distance = self._parse()
+        if distance is None:
+            return False
+        if distance > self.DISTANCE_MAX:   # measured value is outside the measuring range
+            distance = self.DISTANCE_MAX
+        if distance < self.DISTANCE_MIN:   # measured values smaller than DISTANCE_MIN are incorrect measurements
+            distance = self.DISTANCE_MAX
+        if distance == self.DISTANCE_MIN:   # measured value is outside the measuring range
+            distance = 0
+        publish(self, distance, t_capture)
+        return True
+
+    def _parse(self):
+        """ check all complete frames in the receive buffer, returns distance of newest valid frame or None """
+        buf = self.rx_buffer
+        distance = None
+        pos = buf.find(self.FRAME_HEADER)   # resync on header
+        if pos < 0:
+            pos = len(buf)
+        while 0 <= pos <= len(buf) - self.FRAME_LENGTH:
+            checksum = (buf[pos] + buf[pos + 1] + buf[pos + 2]) & 0x00FF   # calculation checksum
+            if checksum == buf[pos + 3]:
+                distance = buf[pos + 2] + (buf[pos + 1]*256)   # data_low + data_high
+                self.frames = self.frames + 1
+                pos = pos + self.FRAME_LENGTH
+            else:
+                self.checksum_errors = self.checksum_errors + 1
+                pos = pos + 1   # header was a data byte, resync on next header
+            next_pos = buf.find(self.FRAME_HEADER, pos)
+            pos = len(buf) if next_pos < 0 else next_pos
+        del buf[:min(pos, len(buf))]   # keep incomplete frame for next call
+        return distance
+
+    def close(self):
+        """ close serial port """
+        self.ser.close()
 
 
 class TfLuna:
@@ -59,44 +132,81 @@ class TfLuna:
     # https://github.com/budryerson/TFLuna-I2C_python/blob/main/tfli2c.py
     
     # variables
-    distance = 9999
+    sample = Sample()   # last published sample, replaced by publish()
+    latency = 0.0   # duration of last read [s]
+    latency_max = 0.0   # worst-case duration of a read [s]
+    timeouts = 0   # number of reads which missed their deadline
+    tick = None   # device timestamp of the last frame, None if no frame was read
+    fresh = False   # True if the last call of getDistance delivered a new frame
     # constants
     DISTANCE_MIN = 200
     DISTANCE_MAX = 8000
     # register
+    TFL_TICK_L    = 0x06   # R  --  device timestamp of frame, low byte
     TFL_SET_MODE  = 0x23   # W/R -- 0-continuous, 1-trigger
     TFL_TRIGGER   = 0x24   # W  --  1-trigger once
+    TFL_FPS_L     = 0x26   # W/R -- frame rate in continuous mode, low byte
+    TFL_FPS_H     = 0x27   # W/R -- frame rate in continuous mode, high byte
     
-    def __init__(self, I2CAddr=0x10, I2CPort=1):
+    @property
+    def distance(self):
+        """ distance of last published sample [mm] """
+        return self.sample.value
+
+    def __init__(self, I2CAddr=0x10, I2CPort=1, bus=None, continuous=False, frame_rate=100):
         self.I2CAddr = I2CAddr   # Device address in Hex 
         self.I2CPort = I2CPort   # I2C(1), /dev/i2c-1, pins 3/5
-        self.bus = SMBus(I2CPort)   # create new bus object for communication
+        self.continuous = continuous   # True -> device free-runs at frame_rate, False -> trigger mode
+        self.frame_rate = frame_rate   # frames per second in continuous mode (should be above polling rate)
+        if bus is None:
+            bus = i2c_bus.I2CBus(I2CPort)   # create own bus session if no shared one is delivered
+        self.bus = bus   # long-lived bus session, stays open between samples
         try:
-            self.bus.open(self.I2CPort)   # open a given i2c bus
             self.bus.write_quick(self.I2CAddr)   # peform quick transaction, throws IOError if unsuccesfull
-            # Set device to single-shot/trigger mode
-            self.bus.write_byte_data(self.I2CAddr, self.TFL_SET_MODE, 1)   # write a byte to a given register (addr,register,value)
+            if self.continuous:
+                # Set frame rate and device to continuous mode
+                self.bus.write_byte_data(self.I2CAddr, self.TFL_FPS_L, self.frame_rate & 0xFF)
+                self.bus.write_byte_data(self.I2CAddr, self.TFL_FPS_H, self.frame_rate >> 8)
+                self.bus.write_byte_data(self.I2CAddr, self.TFL_SET_MODE, 0)
+            else:
+                # Set device to single-shot/trigger mode
+                self.bus.write_byte_data(self.I2CAddr, self.TFL_SET_MODE, 1)   # write a byte to a given register (addr,register,value)
         except IOError:
             print("Verbindung fehlgeschlagen")
-        self.bus.close()
     
-    def getDistance(self):
+    def getDistance(self, deadline=None):
+        """ read distance, returns STA_OK if a new frame was read \
+            (STA_STALE: no new frame, STA_TIMEOUT: deadline passed, STA_ERR_DATA: no connection)
+            """
+        t_start = time.monotonic()
+        self.fresh = False
         try:
-            self.bus.open(self.I2CPort)   # open a given i2c bus
-            # Trigger a one-shot data sample
-            self.bus.write_byte_data(self.I2CAddr, self.TFL_TRIGGER, 1)
-            # Read the first six registers
-            frame = self.bus.read_i2c_block_data(self.I2CAddr, 0, 6)   # read a block of byte data from a given register (addr,start register,length)
+            if deadline_passed(deadline):   # no bus transaction after deadline
+                return record_read(self, t_start, STA_TIMEOUT)
+            if self.continuous:
+                # Read distance, strength, temperature and timestamp of the latest frame (no trigger needed)
+                t_capture = time.monotonic()
+                frame = self.bus.read_i2c_block_data(self.I2CAddr, 0, 8)
+                tick = frame[self.TFL_TICK_L] + (frame[self.TFL_TICK_L + 1] << 8)
+                if tick == self.tick:   # same timestamp -> no new frame since last call
+                    return record_read(self, t_start, STA_STALE)
+                self.tick = tick
+            else:
+                # Trigger a one-shot data sample and read the first six registers (one transfer with I2C_RDWR)
+                t_capture = time.monotonic()
+                frame = self.bus.write_read_block_data(self.I2CAddr, self.TFL_TRIGGER, 1, 0, 6)
             distance = (frame[ 0] + ( frame[ 1] << 8))*10   # distance_low + distance_high
             strength = frame[ 2] + ( frame[ 3] << 8)   # strength_low + strength_high
             if distance < self.DISTANCE_MIN:   # measured value below measuring range
                 distance = 0
             if strength < 100:   # measured value is unreliable if signal strength < 100
                 distance = self.DISTANCE_MAX
-            self.distance = distance 
-            self.bus.close()
+            publish(self, distance, t_capture, strength)
+            self.fresh = True
+            return record_read(self, t_start, STA_OK)
         except:
-            self.distance = -1
+            publish(self, -1, time.monotonic(), status=STA_ERR_DATA)
+            return record_read(self, t_start, STA_ERR_DATA)
 
 
 class URM09:
@@ -109,7 +219,12 @@ class URM09:
     # https://github.com/budryerson/TFLuna-I2C_python/blob/main/tfli2c.py
     
     # variables
-    distance = 9999
+    sample = Sample()   # last published sample, replaced by publish()
+    latency = 0.0   # duration of last read [s], getDistance: trigger, conversion and collect
+    latency_max = 0.0   # worst-case duration of a read [s]
+    timeouts = 0   # number of reads which missed their deadline
+    phase_latency = 0.0   # duration of last trigger or collect phase [s]
+    phase_latency_max = 0.0   # worst-case duration of a phase [s]
     # constants
     DISTANCE_MIN = 20
     DISTANCE_MAX = 5000
@@ -119,38 +234,94 @@ class URM09:
     DISTANCE_VALUE_L = 0x04   # distance value low-order bits
     MODE = 0x07   # 0x20 -> passive mode + maximum range = 5000 mm (highest sensitivity)
     COMMAND = 0x08
+    # time between trigger and valid distance registers: time-of-flight for \
+    # 300 cm range (2 * 3 m / 343 m/s = 17.5 ms) plus margin
+    CONVERSION_TIME = 0.03
+    t_trigger = 0.0   # time of last trigger (time.monotonic) [s]
+
+    @property
+    def distance(self):
+        """ distance of last published sample [mm] """
+        return self.sample.value
 
-    def __init__(self, I2CAddr=0x11, I2CPort=1):
+    def __init__(self, I2CAddr=0x11, I2CPort=1, bus=None):
         self.I2CAddr = I2CAddr   # Device address in Hex
         self.I2CPort = I2CPort   # I2C(1), /dev/i2c-1, pins 3/5
-        self.bus = SMBus(I2CPort)   # create new bus object for communication
+        if bus is None:
+            bus = i2c_bus.I2CBus(I2CPort)   # create own bus session if no shared one is delivered
+        self.bus = bus   # long-lived bus session, stays open between samples
         try:
-            self.bus.open(self.I2CPort)   # open a given i2c bus
             self.bus.write_quick(self.I2CAddr)   # peform quick transaction, throws IOError if unsuccesfull
             # Set device to trigger mode; set range 0x00 -> 150 cm  0x10 -> 300 cm  0x20 -> 500 cm   
             self.bus.write_byte_data(self.I2CAddr, self.MODE, 0x10)   # write a byte to a given register (addr,register,value)
         except IOError:
             print("Verbindung fehlgeschlagen")
-        self.bus.close()
         
-    def getDistance(self):
+    def getDistance(self, deadline=None):
+        """ trigger a measurement, wait for the conversion and read the distance. \
+            Blocks CONVERSION_TIME (30 ms) longer than the former one-shot read, which returned the result
+            of the previous measurement. Callers with a cycle use triggerDistance / collectDistance.
+            latency covers the whole sequence, phase_latency the trigger and collect phase alone
+            """
+        t_start = time.monotonic()
+        status = self._trigger(deadline)
+        if status == STA_OK:
+            if deadline is not None and time.monotonic() + self.CONVERSION_TIME > deadline:
+                status = STA_TIMEOUT   # result would be too late
+            else:
+                time.sleep(self.CONVERSION_TIME)
+                status = self._collect(deadline)
+        return record_read(self, t_start, status)
+
+    def triggerDistance(self, deadline=None):
+        """ first phase: trigger a one-shot data sample, result is valid after CONVERSION_TIME """
+        t_start = time.monotonic()
+        return record_read(self, t_start, self._trigger(deadline))
+
+    def collectDistance(self, deadline=None):
+        """ second phase: read the distance of the last triggered measurement """
+        t_start = time.monotonic()
+        return record_read(self, t_start, self._collect(deadline))
+
+    def _record_phase(self, t_start, status):
+        """ record latency of a trigger or collect phase, returns status """
+        self.phase_latency = time.monotonic() - t_start
+        if self.phase_latency > self.phase_latency_max:
+            self.phase_latency_max = self.phase_latency
+        return status
+
+    def _trigger(self, deadline):
+        t_start = time.monotonic()
         try:
-            self.bus.open(self.I2CPort)   # open a given i2c bus
-            # Trigger a one-shot data sample
+            if deadline_passed(deadline):   # no bus transaction after deadline
+                return self._record_phase(t_start, STA_TIMEOUT)
             self.bus.write_byte_data(self.I2CAddr, self.COMMAND, 0x01)
+            self.t_trigger = time.monotonic()
+            return self._record_phase(t_start, STA_OK)
+        except:
+            publish(self, -1, time.monotonic(), status=STA_ERR_DATA)
+            return self._record_phase(t_start, STA_ERR_DATA)
+
+    def _collect(self, deadline):
+        t_start = time.monotonic()
+        try:
+            if deadline_passed(deadline):   # no bus transaction after deadline
+                return self._record_phase(t_start, STA_TIMEOUT)
             #  Read register for distance value
             frame = self.bus.read_i2c_block_data(self.I2CAddr, self.DISTANCE_VALUE_H, 2)   # read a block of byte data from a given register (addr,start register,length)
             distance = (frame[ 0] + frame[ 1])*10
             if distance < self.DISTANCE_MIN:   # measured value below measuring range
                 distance = 0
-            self.distance = distance
-            self.bus.close()
+            publish(self, distance, self.t_trigger)
+            return self._record_phase(t_start, STA_OK)
         except:
-            self.distance = -1
+            publish(self, -1, time.monotonic(), status=STA_ERR_DATA)
+            return self._record_phase(t_start, STA_ERR_DATA)
 
 if __name__ == "__main__":
-    sensor_1 = URM09()
-    sensor_2 = TfLuna()
+    bus = i2c_bus.I2CBus(1)   # one bus session for both sensors
+    sensor_1 = URM09(bus=bus)
+    sensor_2 = TfLuna(bus=bus)
     i = 1
     while i < 30:
         sensor_1.getDistance()
@@ -0,0 +1,134 @@
+"""V1.0
+Module for sensor samples in shared memory used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+A SampleRing is a ring buffer of samples in multiprocessing.shared_memory with
+one writing process (acquisition) and any number of reading processes. Every
+slot is protected by a sequence lock: while sample n is written the counter of
+its slot is 2n+1, afterwards 2n+2. A reader unpacks the fields directly from
+the shared buffer (no pipe, no pickling) and retries if the counter was odd or
+changed meanwhile, a larger counter means the slot was overwritten. The head
+counter (number of written samples) is updated after the slot, so a reader
+never sees a slot before it is complete.
+"""
+
+
+#################### import section ####################
+
+import struct
+from multiprocessing import shared_memory
+
+from sample import Sample
+
+
+#################### variables section ####################
+
+RING_SLOTS = 64   # samples per ring (> 1 s of TF-Luna at 50 Hz)
+READ_RETRIES = 100   # attempts of a reader while the writer changes the slot
+HEAD = struct.Struct("<Q")   # number of written samples
+LOCK = struct.Struct("<Q")   # sequence lock of a slot, odd -> slot is being written
+FIELDS = struct.Struct("<ddQii")   # value, t_capture, seq, strength, status
+SLOT_SIZE = LOCK.size + FIELDS.size
+
+
+class SampleRing:
+    """ ring buffer of samples in shared memory, one writer, lock-free readers """
+
+    def __init__(self, name=None, slots=RING_SLOTS):
+        self.owner = name is None   # creating process unlinks the memory at close
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=HEAD.size + slots * SLOT_SIZE)
+        self.buf = self.shm.buf
+        self.slots = slots
+        self.retries = 0   # number of repeated reads (writer was active)
+
+
+    #################### Function Section ####################
+
+    @property
+    def name(self):
+        """ name of the shared memory (attach with SampleRing(name)) """
+        return self.shm.name
+
+    def written(self):
+        """ number of written samples """
+        return HEAD.unpack_from(self.buf, 0)[0]
+
+    def write(self, value, t_capture, seq, strength, status):
+        """ add a sample (only one writing process) """
+        head = self.written()
+        offset = HEAD.size + (head % self.slots) * SLOT_SIZE
+        LOCK.pack_into(self.buf, offset, 2 * head + 1)   # odd: slot is being written
+        FIELDS.pack_into(self.buf, offset + LOCK.size, value, t_capture, seq, strength, status)
+        LOCK.pack_into(self.buf, offset, 2 * head + 2)   # sample number head is complete
+        HEAD.pack_into(self.buf, 0, head + 1)
+
+    def read(self, n):
+        """ fields of sample number n (value, t_capture, seq, strength, status), \
+            None if it is not written yet or already overwritten
+            """
+        offset = HEAD.size + (n % self.slots) * SLOT_SIZE
+        if n >= self.written():
+            return None
+        for _ in range(READ_RETRIES):
+            lock = LOCK.unpack_from(self.buf, offset)[0]
+            if lock > 2 * n + 2:   # slot is (being) overwritten by a newer sample
+                return None
+            if lock == 2 * n + 2:
+                fields = FIELDS.unpack_from(self.buf, offset + LOCK.size)
+                if LOCK.unpack_from(self.buf, offset)[0] == lock:   # not changed while reading
+                    return fields
+            self.retries = self.retries + 1
+        return None
+
+    def latest(self):
+        """ latest sample as sample.Sample, None if nothing is written """
+        head = self.written()
+        while head > 0:
+            fields = self.read(head - 1)
+            if fields is not None:
+                return Sample(*fields)
+            head = self.written()   # overwritten meanwhile, read the newer one
+        return None
+
+    def close(self):
+        """ detach from the shared memory, the creating process also removes it """
+        self.buf.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingSensor:
+    """ latest sample of a sensor of another process, same sample attribute as the sensors """
+
+    def __init__(self, ring, name=""):
+        self.ring = ring
+        self.name = name
+        self.head = 0   # number of written samples at the last read
+        self.cached = Sample()   # never measured
+
+    @property
+    def sample(self):
+        """ latest published sample, a new Sample object only if the ring has a new one """
+        head = self.ring.written()
+        if head != self.head:
+            latest = self.ring.latest()
+            if latest is not None:
+                self.cached = latest
+                self.head = head
+        return self.cached
+
+
+#################### Test program ####################
+
+if __name__ == "__main__":
+
+    # ring of 4 slots, written 6 times (tests: Firmware_Unittest/test_shm_ring.py)
+    ring = SampleRing(slots=4)
+    reader = RingSensor(SampleRing(ring.name, slots=4))
+    for n in range(1, 7):
+        ring.write(100 * n, 0.02 * n, n, 1000, 0)
+        print(f"written {ring.written()}, reader: value {reader.sample.value}, seq {reader.sample.seq}")
+    print(f"oldest sample in the ring: {ring.read(2)}, overwritten: {ring.read(1)}")
+    reader.ring.close()
+    ring.close()
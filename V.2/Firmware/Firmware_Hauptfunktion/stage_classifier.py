@@ -0,0 +1,117 @@
+"""V1.0
+Module for the vibration stage classifier used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The feedback value (0...1000) is classified into stages 0...5 by a table of
+thresholds (lower limit of stage 1...5), searched with bisect. Without more, a
+value sitting on a threshold toggles between two stages with the sensor noise
+and the DRVs are written again every time. StageClassifier therefore keeps the
+current stage until the value passes the threshold by the hysteresis of this
+threshold, and a falling stage is only accepted after the minimum dwell time in
+the current stage. A rising stage (obstacle comes closer) is never delayed,
+except dwell_rising is set.
+"""
+
+
+#################### import section ####################
+
+import bisect
+import time
+
+
+#################### variables section ####################
+
+VALUE_MIN = 0   # minimum feedback value
+VALUE_MAX = 1000   # maximum feedback value
+THRESHOLDS = (10, 200, 400, 600, 800)   # lower limit of stage 1...5 (stage 0 below 10 -> measurement failures)
+HYSTERESIS = (5, 20, 20, 20, 20)   # distance of the value to each threshold to leave the stage \
+# [feedback value], below 5 at threshold 10: "no obstacle" (0) reaches stage 0 again
+MIN_DWELL = 0.3   # minimum time in a stage before a falling stage is accepted [s]
+
+
+#################### Function section ####################
+
+def classify(value, thresholds=THRESHOLDS):
+    """ stage of value without hysteresis (number of thresholds <= value) """
+    return bisect.bisect_right(thresholds, value)
+
+
+def getStage(sensVal, S0, S1, S2, S3, S4):
+    """ stage of sensVal with thresholds S0...S4, same results as getStage of V.1 \
+        (MW_Vibration): None outside of 0...1000
+        """
+    if not VALUE_MIN <= sensVal <= VALUE_MAX:
+        return None
+    return classify(sensVal, (S0, S1, S2, S3, S4))
+
+
+class StageClassifier:
+    """ stage of the feedback value with hysteresis per threshold and minimum dwell time """
+
+    def __init__(self, thresholds=THRESHOLDS, hysteresis=HYSTERESIS, min_dwell=MIN_DWELL,
+                 dwell_rising=False, clock=time.monotonic):
+        self.thresholds = tuple(thresholds)   # lower limit of stage 1...n, rising
+        if isinstance(hysteresis, (int, float)):   # same hysteresis for all thresholds
+            hysteresis = [hysteresis] * len(self.thresholds)
+        if len(hysteresis) != len(self.thresholds):
+            raise ValueError("one hysteresis per threshold needed")
+        if any(b <= a for a, b in zip(self.thresholds, self.thresholds[1:])):
+            raise ValueError("thresholds must be rising")
+        if any(ha + hb >= b - a for a, b, ha, hb in
+               zip(self.thresholds, self.thresholds[1:], hysteresis, hysteresis[1:])):
+            raise ValueError("hysteresis bands of neighbouring thresholds overlap")
+        if self.thresholds[0] - hysteresis[0] <= VALUE_MIN:
+            raise ValueError("hysteresis of first threshold too big, stage 0 is not reached again")
+        self.hysteresis = tuple(hysteresis)
+        self.min_dwell = min_dwell
+        self.dwell_rising = dwell_rising   # True -> minimum dwell time also before a rising stage
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.stage = None   # current stage, None before the first value
+        self.t_change = None   # time of the last change of stage
+        self.transitions = 0   # number of changes of stage
+
+
+    #################### Function Section ####################
+
+    def update(self, value, now=None):
+        """ classify value, returns the current stage """
+        if now is None:
+            now = self.clock()
+        stage = classify(value, self.thresholds)
+        if self.stage is None:   # first value
+            self.stage = stage
+            self.t_change = now
+            return stage
+        if stage == self.stage:
+            return stage
+
+        if stage > self.stage:   # value has to pass the upper threshold by its hysteresis
+            if value < self.thresholds[self.stage] + self.hysteresis[self.stage]:
+                return self.stage
+            dwell = self.dwell_rising
+        else:   # value has to pass the lower threshold by its hysteresis
+            if value >= self.thresholds[self.stage - 1] - self.hysteresis[self.stage - 1]:
+                return self.stage
+            dwell = True
+        if dwell and now - self.t_change < self.min_dwell:
+            return self.stage
+
+        self.stage = stage
+        self.t_change = now
+        self.transitions = self.transitions + 1
+        return stage
+
+    def reset(self):
+        """ forget the current stage (next value is accepted at once) """
+        self.stage = None
+        self.t_change = None
+
+
+#################### Test program ####################
+
+if __name__ == "__main__":
+
+    # noisy value around threshold 400 (tests: Firmware_Unittest/test_stage_classifier.py)
+    c = StageClassifier()
+    for n, value in enumerate((390, 405, 395, 410, 420, 395, 370, 370)):
+        print(f"t = {n * 0.1:.1f} s, value {value}: stage {classify(value)} without, {c.update(value, n * 0.1)} with hysteresis")
@@ -4,7 +4,7 @@ h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
 created by Marian Weickert
 on 25.08.2023
 """
-import RPi.GPIO as GPIO
+import hal
 
 
 ### Variables Section ###
@@ -12,7 +12,7 @@ import RPi.GPIO as GPIO
 
 ### Test program variables ###
 
-GPIO.setmode(GPIO.BCM)
+SWITCH_PIN = [23, 24, 25]
 
 
 class Switch:
@@ -20,15 +20,18 @@ class Switch:
 
     swi_state = 1
 
+    def __init__(self, gpio=None):
+        self.gpio = gpio if gpio is not None else hal.backend().gpio()   # RPi.GPIO-like object of the hal backend
+
     #################### Function Section ####################
 
     def set_switch_state(self, sw_pin):
         """ Returning value of 0...2 in dependence on selected GPIO-Pin """
-        if GPIO.input(sw_pin[0]) == 0:
+        if self.gpio.input(sw_pin[0]) == 0:
             self.swi_state = 0
-        elif GPIO.input(sw_pin[1]) == 0:
+        elif self.gpio.input(sw_pin[1]) == 0:
             self.swi_state = 1
-        elif GPIO.input(sw_pin[2]) == 0:
+        elif self.gpio.input(sw_pin[2]) == 0:
             self.swi_state = 2
         return self.swi_state
 
@@ -37,11 +40,15 @@ class Switch:
 
 if __name__ == "__main__":
     try:
-        test_switch = Switch()
+        gpio = hal.backend().gpio()
+        gpio.setmode(gpio.BCM)
+        for pin in SWITCH_PIN:
+            gpio.setup(pin, gpio.IN, pull_up_down=gpio.PUD_UP)
+        test_switch = Switch(gpio)
 
         test_state = test_switch.set_switch_state(SWITCH_PIN)
 
         print("Active switch-state is ", test_state)
 
     except KeyboardInterrupt:
-        GPIO.cleanup()
+        hal.backend().cleanup()
@@ -0,0 +1,103 @@
+"""V1.0
+Module for the event-driven wakeup of the main loop used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+The main loop sleeps on a condition variable until an event is signalled: a
+new sensor sample (sample.listeners), a button edge or a change of the turning
+switch (GPIO callbacks). Events which arrive while the main loop is working
+are collected and handled by one wakeup. A sample only wakes the main loop if
+its status changed or its distance moved by at least DEADBAND since the last
+reported sample of this sensor, so a static scene causes no wakeups. A timeout
+of wait() covers timed events (stale samples, end of button feedback).
+"""
+
+
+#################### import section ####################
+
+import threading
+import time
+
+import rt_profile
+import sample
+
+
+#################### variables section ####################
+
+DEADBAND = 10   # minimum change of distance which wakes the main loop [mm]
+
+
+def changed(last, new, deadband=DEADBAND):
+    """ True if sample new differs from last reported sample (status or distance >= deadband) """
+    return last is None or new.status != last.status or abs(new.value - last.value) >= deadband
+
+
+class Wakeup:
+    """ events of sensors, buttons and switch for the main loop """
+
+    def __init__(self, deadband=DEADBAND, clock=time.monotonic, name="main"):
+        self.name = name   # name of the waiting thread for rt_profile
+        self.deadband = deadband
+        self.clock = clock   # time source [s], can be replaced by a simulated clock
+        self.cond = threading.Condition()   # protects events, wakes up the main loop
+        self.events = set()   # sources of events since the last wakeup
+        self.reported = {}   # sensor -> last sample which woke the main loop
+        self.t_start = clock()
+        self.signals = 0   # number of signalled events
+        self.wakeups = 0   # number of returns of wait() with events
+        self.timeouts = 0   # number of returns of wait() without events
+        self.t_signal = None   # time of the first event since the last wakeup
+        self.latency_sum = 0.0   # accumulated time from first event to wakeup [s]
+        self.latency_max = 0.0   # worst-case time from first event to wakeup [s]
+
+
+    #################### Function Section ####################
+
+    def signal(self, source):
+        """ event of source (e.g. "button"), wakes up the main loop (thread-safe, GPIO callbacks) """
+        with self.cond:
+            if not self.events:
+                self.t_signal = self.clock()
+            self.events.add(source)
+            self.signals = self.signals + 1
+            self.cond.notify()
+
+    def on_sample(self, sensor, old, new):
+        """ listener of sample.publish: signal if status or distance changed """
+        if not changed(self.reported.get(sensor), new, self.deadband):
+            return
+        self.reported[sensor] = new
+        self.signal(type(sensor).__name__)
+
+    def subscribe(self):
+        """ wake up on samples of all sensors """
+        if self.on_sample not in sample.listeners:
+            sample.listeners.append(self.on_sample)
+
+    def unsubscribe(self):
+        if self.on_sample in sample.listeners:
+            sample.listeners.remove(self.on_sample)
+
+    def wait(self, timeout=None):
+        """ sleep until an event is signalled or timeout [s] passed, \
+            returns the set of event sources (empty after timeout)
+            """
+        with self.cond:
+            if not self.events:
+                self.cond.wait(timeout)
+            events = self.events
+            self.events = set()
+            t_signal = self.t_signal
+        if events:
+            latency = self.clock() - t_signal
+            rt_profile.record(self.name, latency)
+            self.latency_sum = self.latency_sum + latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+            self.wakeups = self.wakeups + 1
+        else:
+            self.timeouts = self.timeouts + 1
+        return events
+
+    def rate(self):
+        """ wakeups of the main loop per second since creation (with events and timeouts) """
+        return (self.wakeups + self.timeouts) / max(self.clock() - self.t_start, 1e-9)
@@ -0,0 +1,39 @@
+"""V1.0
+Test configuration for the firmware of Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+
+Makes the modules of Firmware_Hauptfunktion importable. The fixture sim selects
+the simulated hal backend (hal_sim), so the tests run on every Linux machine
+without RPi.GPIO, smbus, busio, serial or adafruit_drv2605. test_vib.py and
+actuator_test.py are the interactive user-feedback test on the hardware and are
+not collected.
+Start with: python3 -m pytest V.2/Firmware/Firmware_Unittest
+"""
+
+
+#################### import section ####################
+
+import os
+import sys
+
+import pytest
+
+
+# make modules of Firmware_Hauptfunktion importable for all tests
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Firmware_Hauptfunktion")
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+import hal
+import hal_sim
+
+
+collect_ignore = ["test_vib.py", "actuator_test.py"]   # interactive test on the hardware (RPi.GPIO, DRV2605L)
+
+
+@pytest.fixture
+def sim():
+    """ simulated hal backend without transaction time, deselected after the test """
+    hardware = hal.select(hal_sim.Simulated(latency=0.0))
+    yield hardware
+    hal.select(None)
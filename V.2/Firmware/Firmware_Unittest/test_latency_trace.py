@@ -0,0 +1,68 @@
+"""V1.0
+Tests of the sensor-to-vibration latency trace (latency_trace) used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+"""
+
+
+#################### import section ####################
+
+import time
+
+import actuator
+from latency_trace import LatencyTrace
+
+
+#################### variables section ####################
+
+ACTUATOR_NO = [0, 1]   # channels of the simulated DRV2605L
+WAIT_TIMEOUT = 1.0   # maximum time until the rtp stream has written the new amplitude [s]
+
+
+#################### test section ####################
+
+def test_intervals_of_one_change():
+    now = [10.0]
+    trace = LatencyTrace(clock=lambda: now[0])
+    trace.commit()   # no stage decision -> nothing recorded
+    assert all(h.n == 0 for h in trace.histograms.values())
+    trace.fusion(9.97)   # sample captured 30 ms before fusion
+    now[0] = 10.001
+    trace.stage()
+    now[0] = 10.003
+    trace.commit()
+    assert trace.histograms["capture-commit"].n == 1
+    assert abs(trace.histograms["capture-commit"].max - 0.033) < 1e-9
+    assert abs(trace.histograms["stage-commit"].max - 0.002) < 1e-9
+    trace.commit()   # commit without new decision is not recorded twice
+    assert trace.histograms["capture-commit"].n == 1
+
+
+def test_fusion_after_stage_belongs_to_next_change():
+    now = [10.0]
+    trace = LatencyTrace(clock=lambda: now[0])
+    trace.fusion(9.99)
+    now[0] = 10.01
+    trace.stage()
+    now[0] = 10.02
+    trace.fusion(10.015)   # newer sample before the commit (continuous mode: main loop keeps running)
+    now[0] = 10.03
+    trace.commit()
+    assert abs(trace.histograms["fusion-stage"].max - 0.01) < 1e-9
+    assert abs(trace.histograms["capture-commit"].max - 0.04) < 1e-9
+
+
+def test_continuous_mode_is_traced(sim):
+    """ set_continuous on the simulated DRV2605L: the rtp stream records the trace points """
+    trace = LatencyTrace()
+    act = actuator.Actuator(ACTUATOR_NO, trace=trace)
+    try:
+        act.config_drv_to_lra()
+        trace.fusion(time.monotonic())
+        act.set_continuous(900)   # constant vibration, written at the take-over
+        t_end = time.monotonic() + WAIT_TIMEOUT
+        while trace.histograms["capture-commit"].n == 0 and time.monotonic() < t_end:
+            time.sleep(0.005)
+        assert trace.histograms["capture-commit"].n == 1
+        assert trace.histograms["stage-commit"].n == 1
+    finally:
+        act.close()
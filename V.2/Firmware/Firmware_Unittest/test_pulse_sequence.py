@@ -0,0 +1,64 @@
+"""V1.0
+Tests of the waveform sequencer rhythms (pulse_sequence) used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+"""
+
+
+#################### import section ####################
+
+import pytest
+
+import actuator
+import pulse_sequence
+from stage_classifier import StageClassifier
+
+
+#################### variables section ####################
+
+ACTUATOR_NO = [0, 1]   # channels of the simulated DRV2605L
+# stage rhythms of Actuator.set_actuator: frequence [Hz] -> wait slot after each 30 ms effect
+STAGE_WAIT = {3: 0x9E, 5: 0x91, 8: 0x8A, 13: 0x85}   # 300 ms, 170 ms, 100 ms (95 rounded), 50 ms (47 rounded)
+STAGE_VALUE = {1: (100, 3), 2: (300, 5), 3: (500, 8), 4: (700, 13)}   # stage -> sensor value, frequence [Hz]
+
+
+#################### test section ####################
+
+@pytest.mark.parametrize("frq, wait", STAGE_WAIT.items())
+def test_stage_rhythm(frq, wait):
+    slots, pulses = pulse_sequence.compile_rhythm(frq)
+    assert pulses == 4
+    assert pulse_sequence.register_image(slots) == {0x04: 0x01, 0x05: wait, 0x06: 0x01, 0x07: wait,
+                                                    0x08: 0x01, 0x09: wait, 0x0A: 0x01, 0x0B: 0x00}
+
+
+def test_long_period_chains_wait_slots():
+    slots, pulses = pulse_sequence.compile_rhythm(0.5)   # 2000 ms -> 30 ms effect + 1270 ms + 700 ms wait
+    assert pulses == 3
+    assert slots == [0x01, 0xFF, 0xC6, 0x01, 0xFF, 0xC6, 0x01, 0x00]
+
+
+def test_effect_without_wait():
+    slots, pulses = pulse_sequence.compile_rhythm(20, effect=47, effect_time=50)
+    assert slots == [47, 47, 47, 47, 47, 47, 47, 0] and pulses == 7
+
+
+@pytest.mark.parametrize("frq", [0.01, 40])   # wait longer than 7 slots, period shorter than effect
+def test_rhythm_out_of_range(frq):
+    with pytest.raises(ValueError):
+        pulse_sequence.compile_rhythm(frq)
+
+
+def test_set_actuator_writes_register_image(sim):
+    """ sequencer mode on the simulated DRV2605L: sequencer registers of all DRVs = compiled image """
+    act = actuator.Actuator(ACTUATOR_NO, sequencer=True, classifier=StageClassifier(min_dwell=0.0))
+    try:
+        act.config_drv_to_lra()
+        act.set_drv_open_loop()
+        for stage, (value, frq) in STAGE_VALUE.items():
+            act.set_actuator(value)
+            assert act.stage == stage
+            image = pulse_sequence.register_image(pulse_sequence.compile_rhythm(frq)[0])
+            for n in ACTUATOR_NO:
+                assert {register: sim.drvs[n].reg[register] for register in image} == image
+    finally:
+        act.close()
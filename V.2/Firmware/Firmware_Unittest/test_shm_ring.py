@@ -0,0 +1,78 @@
+"""V1.0
+Tests of the sample rings in shared memory (shm_ring, acquisition) used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+"""
+
+
+#################### import section ####################
+
+import multiprocessing
+
+import acquisition
+import sensors
+from shm_ring import SampleRing, RingSensor
+
+
+#################### variables section ####################
+
+WRITES = 20000   # samples written by the writer process of the consistency test
+
+
+def write_samples(name):
+    """ writer process: value, strength and capture time follow the sequence number """
+    ring = SampleRing(name, slots=4)
+    for n in range(1, WRITES + 1):
+        ring.write(100 * n, 0.02 * n, n, n % 1000, 0)
+    ring.close()
+
+
+#################### test section ####################
+
+def test_ring_wraps_around():
+    ring = SampleRing(slots=4)
+    reader = RingSensor(SampleRing(ring.name, slots=4))
+    try:
+        assert ring.latest() is None and reader.sample.seq == 0   # "never measured"
+        for n in range(1, 7):
+            ring.write(100 * n, 0.02 * n, n, 1000, 0)
+        assert ring.written() == 6
+        assert reader.sample.value == 600 and reader.sample.seq == 6
+        assert ring.read(1) is None   # overwritten
+        assert ring.read(2)[2] == 3 and ring.read(6) is None
+    finally:
+        reader.ring.close()
+        ring.close()
+
+
+def test_reader_never_sees_a_torn_sample():
+    ring = SampleRing(slots=4)
+    writer = multiprocessing.Process(target=write_samples, args=(ring.name,))
+    reader = RingSensor(SampleRing(ring.name, slots=4))
+    try:
+        writer.start()
+        last = 0
+        while writer.is_alive() or reader.sample.seq < WRITES:
+            s = reader.sample
+            assert (s.value, s.t_capture, s.strength) == (100 * s.seq, 0.02 * s.seq, s.seq % 1000) or s.seq == 0
+            assert s.seq >= last   # newest sample, never an older one
+            last = s.seq
+        writer.join()
+        assert reader.sample.seq == WRITES
+    finally:
+        reader.ring.close()
+        ring.close()
+
+
+def test_acquisition_process_on_sim(sim):
+    """ sensors of the simulated backend polled by the acquisition process, samples read from the rings """
+    acq = acquisition.AcquisitionProcess(bus_class=sim.smbus)
+    acq.start()
+    try:
+        assert acq.wait_ready()
+        for sensor in (acq.sensor_1, acq.sensor_2):
+            assert sensor.sample.seq > 0
+            assert sensor.sample.status == sensors.STA_OK
+            assert sensor.sample.value == 1500   # 150 cm of hal_sim.Simulated
+    finally:
+        acq.stop()
+    assert not acq.is_alive()
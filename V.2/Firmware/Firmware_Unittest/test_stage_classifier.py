@@ -0,0 +1,98 @@
+"""V1.0
+Tests of the vibration stage classifier (stage_classifier) used in Masterthesis SmartCane V.2
+h_da FBEIT, Prof. Dr. Carsten Zahout-Heil
+"""
+
+
+#################### import section ####################
+
+import pytest
+
+import actuator
+from stage_classifier import StageClassifier, classify, getStage
+
+
+#################### variables section ####################
+
+ACTUATOR_NO = [0, 1]   # channels of the simulated DRV2605L
+
+
+def stage_v1(value):
+    """ stage of getStage of V.1 (MW_Vibration) and the if/elif chain of Actuator.get_stage """
+    if 0 <= value < 10:
+        return 0
+    elif 10 <= value < 200:
+        return 1
+    elif 200 <= value < 400:
+        return 2
+    elif 400 <= value < 600:
+        return 3
+    elif 600 <= value < 800:
+        return 4
+    elif 800 <= value <= 1000:
+        return 5
+    return None
+
+
+#################### test section ####################
+
+def test_same_stages_as_v1():
+    for value in list(range(-5, 1006)) + [9.99, 10.0, 199.5, 800.0]:
+        v1 = stage_v1(value)
+        assert getStage(value, 10, 200, 400, 600, 800) == v1, value
+        if v1 is not None:
+            assert classify(value) == v1, value
+
+
+def test_hysteresis_and_dwell_time():
+    c = StageClassifier(min_dwell=0.3)
+    assert c.update(390, 0.0) == 2   # first value at once
+    assert c.update(405, 0.1) == 2   # above threshold 400, but inside hysteresis
+    assert c.update(420, 0.15) == 3   # rising: at once
+    assert c.update(395, 0.2) == 3   # inside hysteresis
+    assert c.update(370, 0.3) == 3   # below hysteresis, but dwell time not over
+    assert c.update(370, 0.46) == 2   # dwell time over
+    assert c.update(0, 0.5) == 2 and c.update(0, 0.77) == 0   # falling over several stages
+    assert c.transitions == 3
+
+
+def test_hysteresis_per_threshold():
+    c = StageClassifier(hysteresis=(0, 5, 10, 15, 20), min_dwell=0.0)
+    assert [c.update(v, 0) for v in (0, 10, 204, 205, 200, 195, 194)] == [0, 1, 1, 2, 2, 2, 1]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"hysteresis": (5, 20, 20, 20)},   # one hysteresis per threshold
+    {"thresholds": (10, 200, 150, 600, 800)},   # not rising
+    {"hysteresis": (5, 100, 100, 20, 20)},   # bands of 200 and 400 overlap
+    {"hysteresis": (10, 20, 20, 20, 20)},   # stage 0 is not reached again
+    ])
+def test_invalid_table(kwargs):
+    with pytest.raises(ValueError):
+        StageClassifier(**kwargs)
+
+
+def test_noise_on_threshold_writes_drvs_once(sim):
+    """ set_actuator on the simulated DRV2605L: sensor noise around 400 does not toggle the stage """
+    now = [0.0]
+    act = actuator.Actuator(ACTUATOR_NO, classifier=StageClassifier(min_dwell=0.3, clock=lambda: now[0]))
+    try:
+        act.config_drv_to_lra()
+        act.set_actuator(390)
+        assert act.stage == 2
+        writes = act.writes
+        for value in (405, 395, 410, 398, 415, 385):   # inside the hysteresis of threshold 400
+            now[0] = now[0] + 0.02
+            act.set_actuator(value)
+            assert act.stage == 2
+        assert act.writes == writes   # DRVs not written again
+        act.set_actuator(450)   # rising: at once
+        assert act.stage == 3
+        now[0] = now[0] + 0.1
+        act.set_actuator(370)   # falling: dwell time not over
+        assert act.stage == 3
+        now[0] = now[0] + 0.3
+        act.set_actuator(370)
+        assert act.stage == 2
+    finally:
+        act.close()